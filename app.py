@@ -1,16 +1,18 @@
-import streamlit as st
-import base64
 import os
-import builders.item_builder as item_builder
-import builders.synergy_builder as synergy_builder
-
-
-CHAMPION_IMAGE_FOLDER = "assets/images/champions"
-ITEM_IMAGE_FOLDER = "assets/images/items"
+from contextlib import nullcontext
+import streamlit as st
+from builders import tracing
+from builders.assets import (
+    CHAMPION_IMAGE_FOLDER,
+    ITEM_IMAGE_FOLDER,
+    LOGO_IMAGE_FOLDER,
+    AssetCache,
+    load_templates,
+    render_grid,
+)
+from builders.registry import BundleRegistry
+from builders.name_resolver import AUTO_ACCEPT_SCORE
 
-# Load configs
-config = item_builder.load_config()
-config_items = item_builder.load_config_items()
 
 # Setting the browser title
 st.set_page_config(
@@ -20,49 +22,124 @@ st.set_page_config(
 )
 
 
-def get_image_b64_string(image_path):
-    with open(image_path, "rb") as img_file:
-        return base64.b64encode(img_file.read()).decode("utf-8")
+@st.cache_resource
+def get_registry():
+    # Shared across sessions and reruns, so artifacts are loaded once per process
+    registry = BundleRegistry.from_env()
+    # Otherwise faiss and the index are loaded by the first synergy search
+    if os.getenv("PREWARM") == "1":
+        registry.prewarm()
+    # Newer patches are loaded on a background thread, not by a rerun
+    registry.start()
+    return registry
 
 
-# Get the logo base64 strings
-logo_path = "assets/images/logo/Teamfight_Tactics.png"
-github_logo_path = "assets/images/logo/github-mark-white.png"
-logo_b64 = get_image_b64_string(logo_path)
-github_logo_b64 = get_image_b64_string(github_logo_path)
+registry = get_registry()
+
+
+@st.cache_resource
+def get_trace_sinks():
+    # The sinks are process-wide, so they are configured once like the engine
+    return tracing.configure()
 
 
-def get_html_template():
-    with open("template/template.html") as f:
-        return f.read()
+get_trace_sinks()
+# Shows the spans of each rerun in a "Debug: timings" expander
+debug_timings = os.getenv("TRACE_DEBUG") == "1"
 
 
-html_template = get_html_template()
+@st.cache_resource
+def get_assets():
+    # Every image is base64-encoded once per process instead of on every rerun
+    return AssetCache(), load_templates()
+
+
+assets, (grid_template, card_template) = get_assets()
+
+# Get the logo base64 strings
+logo_b64 = assets.get(LOGO_IMAGE_FOLDER, "Teamfight_Tactics")
+github_logo_b64 = assets.get(LOGO_IMAGE_FOLDER, "github-mark-white")
 
 
 def display_images(data_names, folder, category=None):
-    selected = None
-    for i in range(0, len(data_names), 5):
-        row_data = data_names[i : i + 5]
-        columns = st.columns(len(row_data))
-        for data, column in zip(row_data, columns):
-            try:
-                data = data.replace("/","-") # For K/DA Akali
-                with open(os.path.join(folder, f"{data}.png"), "rb") as f:
-                    img_data = base64.b64encode(f.read()).decode()
-            except FileNotFoundError:
-                st.error(f"Image not found for {data}")
-                continue
-            html = html_template.format(img_data=img_data, item=data)
-            column.markdown(html, unsafe_allow_html=True)
-            if category and column.button("Get Items", key=data + category):
-                selected = data
-    return selected
-
-
-def display_champion_synergies(champion_names):
-    config = synergy_builder.load_config()
-    result = synergy_builder.main(config, champion_names)
+    html, missing = render_grid(
+        data_names, folder, assets, grid_template, card_template
+    )
+    for data in missing:
+        st.error(f"Image not found for {data}")
+    st.markdown(html, unsafe_allow_html=True)
+
+    if category:
+        return st.selectbox(
+            "Get Items",
+            [data for data in data_names if data not in missing],
+            index=None,
+            placeholder="Choose a champion",
+            key="get_items_" + category,
+        )
+    return None
+
+
+def resolve_champions(text):
+    matches, unresolved = engine.champ_resolver.parse(text, AUTO_ACCEPT_SCORE)
+
+    corrected = [(token, name) for token, name, score in matches if score < 1.0]
+    if corrected:
+        st.info(
+            "Showing results for "
+            + ", ".join(f"{name} (you typed '{token}')" for token, name in corrected)
+        )
+    for token, suggestions in unresolved:
+        if suggestions:
+            st.warning(
+                f"Unknown champion '{token}'. Did you mean "
+                + " or ".join(name for name, _ in suggestions[:3])
+                + "?"
+            )
+        else:
+            st.warning(f"Unknown champion '{token}'.")
+
+    return [name for _, name, _ in matches]
+
+
+# How the selected champions are combined into one search
+QUERY_CHOICES = {
+    "Team average": None,
+    "Cost-weighted average": {"weighting": "cost"},
+    "Each champion, rank fusion": {"mode": "multi"},
+    "Each champion, cost-weighted rank fusion": {"mode": "multi", "weighting": "cost"},
+}
+
+
+def display_filters():
+    filter_expander = st.expander("Filters", expanded=False)
+    with filter_expander:
+        query_choice = st.selectbox("Combine the team by", list(QUERY_CHOICES), key="query_mode")
+        min_cost, max_cost = st.slider(
+            "Cost", min_value=1, max_value=5, value=(1, 5), key="filter_cost"
+        )
+        required_traits = st.multiselect(
+            "Has any of these traits", engine.traits.names, key="filter_required"
+        )
+        excluded_traits = st.multiselect(
+            "Has none of these traits", engine.traits.names, key="filter_excluded"
+        )
+
+    # Only the fields that narrow the results, so the default query stays on the unfiltered path
+    filters = {}
+    if min_cost > 1:
+        filters["min_cost"] = min_cost
+    if max_cost < 5:
+        filters["max_cost"] = max_cost
+    if required_traits:
+        filters["required_traits"] = required_traits
+    if excluded_traits:
+        filters["excluded_traits"] = excluded_traits
+    return filters or None, QUERY_CHOICES[query_choice]
+
+
+def display_champion_synergies(champion_names, filters=None, query=None):
+    result = engine.synergies(champion_names, filters=filters, query=query)
 
     if result is None:
         st.write(
@@ -93,7 +170,7 @@ def display_champion_synergies(champion_names):
 
 
 def display_item_images_for_champ(champion_name):
-    top_items = item_builder.main(config, config_items, [champion_name])
+    top_items = engine.items([champion_name])
 
     if top_items:
         item_expander = st.expander(f"Top items for {champion_name}", expanded=True)
@@ -101,6 +178,58 @@ def display_item_images_for_champ(champion_name):
             display_images(top_items, ITEM_IMAGE_FOLDER)
 
 
+def display_team_compositions(champion_names):
+    if engine.canonical_team(champion_names) is None:
+        return
+
+    composition_expander = st.expander("Full Team Composition", expanded=False)
+    with composition_expander:
+        size_column, budget_column = st.columns(2)
+        board_size = size_column.number_input(
+            "Board size", min_value=7, max_value=9, value=8
+        )
+        gold_budget = budget_column.number_input(
+            "Gold budget for added champions (0 for no limit)", min_value=0, value=0
+        )
+
+        try:
+            boards = engine.compose(
+                champion_names, board_size, gold_budget or None, top_n=3
+            )
+        except ValueError as e:
+            st.write(str(e))
+            return
+
+        if not boards:
+            st.write("No composition fits this board size and gold budget.")
+            return
+
+        for board in boards:
+            traits = ", ".join(
+                f"{count} {trait}" for trait, count in board["traits"].items()
+            )
+            st.markdown(f"**{board['cost']} gold** · {traits}")
+            display_images(board["board"], CHAMPION_IMAGE_FOLDER)
+
+
+def display_debug_timings(spans):
+    debug_expander = st.expander("Debug: timings", expanded=False)
+    with debug_expander:
+        if not spans:
+            st.write("Nothing was traced on this rerun.")
+            return
+        st.table(
+            [
+                {
+                    "span": span.name,
+                    "ms": round(span.ms, 3),
+                    "details": " ".join(f"{key}={value}" for key, value in span.attrs.items()),
+                }
+                for span in sorted(spans, key=lambda span: span.start)
+            ]
+        )
+
+
 # Display logo
 st.markdown(
     f'<div style="text-align: center"><img src="data:image/png;base64,{logo_b64}" alt="TFT logo" width="300"></div>',
@@ -111,20 +240,36 @@ st.markdown(
 # Main UI
 st.title("TFT Embedded Synergy Builder")
 
+set_names = sorted(registry.sets())
+selected_set = None
+if len(set_names) > 1:
+    selected_set = st.selectbox(
+        "Set", set_names, index=set_names.index(registry.default_set), key="set_name"
+    )
+# Held for the whole rerun, so a newly swapped-in patch is used from the next one
+engine = registry.engine(selected_set)
+
 champion_names_input = st.text_input(
     "Enter the champion name(s) separated by comma (e.g. K/DA Akali) or (Kai'Sa, Illaoi):"
 )
 
 if champion_names_input:
-    champion_names = champion_names_input.split(", ")
-    selected_champ_cost, selected_champ_distance = display_champion_synergies(
-        champion_names
-    )
+    with tracing.recording() if debug_timings else nullcontext() as spans:
+        champion_names = resolve_champions(champion_names_input)
+        filters, query = display_filters()
+        selected_champ_cost, selected_champ_distance = display_champion_synergies(
+            champion_names, filters, query
+        )
+
+        if selected_champ_cost:
+            display_item_images_for_champ(selected_champ_cost)
+        if selected_champ_distance:
+            display_item_images_for_champ(selected_champ_distance)
+
+        display_team_compositions(champion_names)
 
-    if selected_champ_cost:
-        display_item_images_for_champ(selected_champ_cost)
-    if selected_champ_distance:
-        display_item_images_for_champ(selected_champ_distance)
+    if debug_timings:
+        display_debug_timings(spans)
 
 # Footer
 st.write("---")
@@ -0,0 +1,69 @@
+# bench_batch.py
+"""
+Measures synergy and item throughput of one query per call against one
+batched faiss call per index, for B = 1, 64 and 4096 random saved teams.
+
+    python -m benchmarks.bench_batch
+"""
+import json
+import random
+import time
+from builders.engine import RecommendationEngine
+
+CONFIG = {
+    "champ_data_pkl": "data/champ_data.pkl",
+    "champ_data_json": "data/champ_data.json",
+    "embeddings": "embeddings/champs.faiss",
+}
+CONFIG_ITEMS = {
+    "item_data_pkl": "data/item_data.pkl",
+    "item_data_json": "data/item_data.json",
+    "i_embeddings": "embeddings/items.faiss",
+}
+# The result cache would answer the repeated teams, measure the search itself
+NO_CACHE = {"max_size": 0, "ttl": 0, "check_interval": 2}
+BATCH_SIZES = (1, 64, 4096)
+
+
+def random_teams(names, count, seed=0):
+    rng = random.Random(seed)
+    return [rng.sample(names, rng.randint(1, 4)) for _ in range(count)]
+
+
+def throughput(fn, teams, min_seconds=0.5):
+    """
+    Returns teams per second, repeating fn(teams) for at least min_seconds
+    """
+    fn(teams)  # warm-up
+    calls = 0
+    start = time.perf_counter()
+    while True:
+        fn(teams)
+        calls += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            return calls * len(teams) / elapsed
+
+
+def main():
+    engine = RecommendationEngine(CONFIG, CONFIG_ITEMS, NO_CACHE)
+    report = []
+
+    for batch_size in BATCH_SIZES:
+        teams = random_teams(engine.champ_id_map.names, batch_size)
+        report.append(
+            {
+                "batch_size": batch_size,
+                "synergies_loop_qps": throughput(
+                    lambda ts: [engine.synergies(t) for t in ts], teams
+                ),
+                "synergies_batch_qps": throughput(engine.synergies_batch, teams),
+                "items_batch_qps": throughput(engine.items_batch, teams),
+            }
+        )
+
+    print(json.dumps(report, indent=4))
+
+
+if __name__ == "__main__":
+    main()
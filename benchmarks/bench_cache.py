@@ -0,0 +1,63 @@
+# bench_cache.py
+"""
+Measures synergy latency with the result cache off and on, for a
+Streamlit-like workload where every rerun repeats the same team, and for
+a skewed stream of random teams in random order and casing.
+
+    python -m benchmarks.bench_cache
+"""
+import json
+import random
+import time
+from builders.engine import RecommendationEngine
+from builders.result_cache import load_cache_config
+from benchmarks.bench_batch import CONFIG, CONFIG_ITEMS, NO_CACHE, random_teams
+
+QUERIES = 20000
+DISTINCT_TEAMS = 1000
+
+
+def skewed_stream(names, seed=0):
+    """
+    Popular teams come up far more often, each time shuffled and re-cased
+    """
+    rng = random.Random(seed)
+    teams = random_teams(names, DISTINCT_TEAMS, seed)
+    weights = [1 / rank for rank in range(1, len(teams) + 1)]
+    stream = []
+    for team in rng.choices(teams, weights, k=QUERIES):
+        team = rng.sample(team, len(team))
+        stream.append([name.lower() if rng.random() < 0.5 else name for name in team])
+    return stream
+
+
+def mean_us(engine, teams):
+    start = time.perf_counter()
+    for team in teams:
+        engine.synergies(team)
+    return (time.perf_counter() - start) / len(teams) * 1e6
+
+
+def main():
+    workloads = {}
+    names = RecommendationEngine(CONFIG, CONFIG_ITEMS, NO_CACHE).champ_id_map.names
+    workloads["rerun"] = [["Ahri", "Teemo"]] * QUERIES
+    workloads["skewed"] = skewed_stream(names)
+
+    report = []
+    for label, teams in workloads.items():
+        for cache_config in (NO_CACHE, load_cache_config()):
+            engine = RecommendationEngine(CONFIG, CONFIG_ITEMS, cache_config)
+            report.append(
+                {
+                    "workload": label,
+                    "cache_size": cache_config["max_size"],
+                    "mean_us": mean_us(engine, teams),
+                    "hit_rate": engine.cache.stats()["hit_rate"],
+                }
+            )
+    print(json.dumps(report, indent=4))
+
+
+if __name__ == "__main__":
+    main()
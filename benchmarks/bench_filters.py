@@ -0,0 +1,127 @@
+# bench_filters.py
+"""
+Measures filtered synergy search latency as the filter keeps fewer rows:
+the saved champion set with real cost / trait filters, and a synthetic
+100k row flat index with random masks from 100% down to 0.1% of the rows.
+Every query must still return k hits whenever k rows pass the filter.
+
+    python -m benchmarks.bench_filters
+"""
+import json
+import time
+import numpy as np
+from builders.engine import RecommendationEngine
+from builders.filters import filter_mask
+from builders.id_map import IdMap
+from builders.index_factory import build_index, normalize
+from builders.synergy_builder import search_batch
+from benchmarks.bench_batch import CONFIG, CONFIG_ITEMS, NO_CACHE, random_teams
+
+TOP_K = 10
+BATCH_SIZE = 64
+SYNTHETIC_ROWS = 100_000
+SYNTHETIC_DIMENSION = 256
+SELECTIVITIES = (1.0, 0.5, 0.1, 0.01, 0.001)
+
+
+def median_ms(fn, repeats=20):
+    fn()  # warm-up
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings) * 1000)
+
+
+def saved_set(engine):
+    """
+    Real filters on the saved champion set, one team at a time
+    """
+    names = engine.champ_id_map.names
+    teams = random_teams(names, BATCH_SIZE)
+    trait_names = engine.traits.names
+    cases = {
+        "none": None,
+        "cost 1-3": {"max_cost": 3},
+        "cost 4-5": {"min_cost": 4},
+        "one trait": {"required_traits": trait_names[:1]},
+        "cost 5, one trait": {"min_cost": 5, "required_traits": trait_names[:1]},
+    }
+
+    report = []
+    for label, filters in cases.items():
+        results = engine.synergies_batch(teams, TOP_K, TOP_K, filters)
+        allowed = filter_mask(filters or {}, engine.champ_id_map, engine.costs, engine.traits)
+        report.append(
+            {
+                "filter": label,
+                "allowed_rows": int(allowed.sum()),
+                "min_hits": min(len(by_distance) for _, by_distance in results),
+                "batch_ms": median_ms(
+                    lambda: engine.synergies_batch(teams, TOP_K, TOP_K, filters)
+                ),
+            }
+        )
+    return report
+
+
+def synthetic_set():
+    """
+    Random masks of decreasing density on a synthetic flat index
+    """
+    rng = np.random.default_rng(0)
+    vectors = normalize(
+        rng.standard_normal((SYNTHETIC_ROWS, SYNTHETIC_DIMENSION), dtype=np.float32)
+    )
+    index = build_index(vectors)
+    names = [f"champ{row}" for row in range(SYNTHETIC_ROWS)]
+    id_map = IdMap(names)
+    champion_data = {name: {"cost": int(rng.integers(1, 6))} for name in names}
+
+    team = [names[0]]
+    queries = np.repeat(vectors[:1], BATCH_SIZE, axis=0)
+    teams = [team] * BATCH_SIZE
+
+    report = []
+    for selectivity in SELECTIVITIES:
+        allowed = rng.random(SYNTHETIC_ROWS) < selectivity
+        results = search_batch(
+            queries, index, id_map, champion_data, teams, TOP_K, TOP_K, allowed, vectors
+        )
+        report.append(
+            {
+                "selectivity": selectivity,
+                "allowed_rows": int(allowed.sum()),
+                "min_hits": min(len(by_distance) for _, by_distance in results),
+                "batch_ms": median_ms(
+                    lambda: search_batch(
+                        queries,
+                        index,
+                        id_map,
+                        champion_data,
+                        teams,
+                        TOP_K,
+                        TOP_K,
+                        allowed,
+                        vectors,
+                    ),
+                    repeats=5,
+                ),
+            }
+        )
+    return report
+
+
+def main():
+    engine = RecommendationEngine(CONFIG, CONFIG_ITEMS, NO_CACHE)
+    print(
+        json.dumps(
+            {"saved_set": saved_set(engine), "synthetic_100k": synthetic_set()},
+            indent=4,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+# bench_load.py
+"""
+Compares startup time and resident memory of the legacy pickled dict of
+float64 embeddings against the memory-mapped float32 .npy matrix.
+
+Each loader runs in a fresh interpreter so the numbers are not skewed by
+already imported modules or warm allocator pools.
+
+    python -m benchmarks.bench_load
+    python -m benchmarks.bench_load --rows 20000
+"""
+import argparse
+import json
+import os
+import pickle
+import subprocess
+import sys
+import tempfile
+import numpy as np
+from builders.id_map import id_map_path, load_id_map
+from builders.vector_store import load_vectors, vectors_path
+
+INDEX_PATH = "embeddings/champs.faiss"
+
+LOADER = """
+import json, sys, time
+t0 = time.perf_counter()
+import numpy as np
+
+def rss_kb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+
+base = rss_kb()
+t1 = time.perf_counter()
+if sys.argv[1] == "pickle":
+    import pickle
+    with open(sys.argv[2], "rb") as f:
+        embeddings = pickle.load(f)["embeddings"]
+    # What the builders used to do before every search
+    matrix = np.array(list(embeddings.values()), dtype=np.float32)
+else:
+    matrix = np.load(sys.argv[2], mmap_mode="r")
+    # Touch one query row, as a synergy search does
+    matrix[0].sum()
+t2 = time.perf_counter()
+print(json.dumps({"load_ms": (t2 - t1) * 1000, "rss_delta_kb": rss_kb() - base}))
+"""
+
+
+def synthesize(vectors, rows):
+    """
+    Tiles the shipped vectors up to the requested number of rows
+    """
+    reps = -(-rows // len(vectors))
+    return np.tile(np.asarray(vectors), (reps, 1))[:rows]
+
+
+def run_loader(kind, path, repeats):
+    results = []
+    for _ in range(repeats):
+        out = subprocess.run(
+            [sys.executable, "-c", LOADER, kind, path],
+            check=True,
+            capture_output=True,
+            text=True,
+        )
+        results.append(json.loads(out.stdout))
+    return {
+        "load_ms": float(np.median([r["load_ms"] for r in results])),
+        "rss_delta_kb": int(np.median([r["rss_delta_kb"] for r in results])),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=0, help="synthetic row count")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    id_map = load_id_map(id_map_path(INDEX_PATH))
+    vectors = load_vectors(vectors_path(INDEX_PATH), id_map)
+    if args.rows:
+        vectors = synthesize(vectors, args.rows)
+    names = [f"champ_{i}" for i in range(len(vectors))]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pkl_path = os.path.join(tmp, "legacy.pkl")
+        npy_path = os.path.join(tmp, "vectors.npy")
+        with open(pkl_path, "wb") as f:
+            legacy = {name: np.asarray(v, dtype=np.float64) for name, v in zip(names, vectors)}
+            pickle.dump({"docs": {}, "embeddings": legacy}, f)
+        np.save(npy_path, np.ascontiguousarray(vectors, dtype=np.float32))
+
+        report = {
+            "rows": len(vectors),
+            "dim": int(vectors.shape[1]),
+            "pickle_float64": run_loader("pickle", pkl_path, args.repeats),
+            "npy_mmap_float32": run_loader("npy", npy_path, args.repeats),
+        }
+
+    print(json.dumps(report, indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+# bench_metadata.py
+"""
+Compares how long the champion metadata (names, costs, trait table and
+embeddings) takes to load from the json / id map / .npz / .npy sources,
+from one pickle of the same fields, and from the binary metadata file
+with the memory-mapped .npy matrix.
+
+Each loader runs in a fresh interpreter so the numbers are not skewed by
+already imported modules or warm allocator pools. Every loader ends with
+the same Metadata object and touches one embedding row.
+
+    python -m benchmarks.bench_metadata
+    python -m benchmarks.bench_metadata --rows 20000
+"""
+import os
+import sys
+import json
+import pickle
+import shutil
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+from builders.id_map import id_map_path, save_id_map
+from builders.metadata import build_metadata, index_metadata, metadata_path
+from builders.traits import TraitTable, save_trait_table, trait_path
+from builders.vector_store import save_vectors, vectors_path
+
+INDEX_PATH = "embeddings/champs.faiss"
+DATA_JSON = "data/champ_data.json"
+
+LOADER = """
+import json, sys, time
+import numpy as np
+from builders.metadata import Metadata, load_metadata, metadata_from_sources, metadata_path
+
+def rss_kb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+
+kind, index_path, data_json, pkl_path = sys.argv[1:5]
+base = rss_kb()
+t1 = time.perf_counter()
+if kind == "sources":
+    with open(data_json) as f:
+        metadata = metadata_from_sources(index_path, json.load(f))
+elif kind == "pickle":
+    import pickle
+    with open(pkl_path, "rb") as f:
+        metadata = Metadata(**pickle.load(f))
+else:
+    metadata = load_metadata(metadata_path(index_path))
+metadata.vectors[0].sum()
+t2 = time.perf_counter()
+print(json.dumps({"load_ms": (t2 - t1) * 1000, "rss_delta_kb": rss_kb() - base}))
+"""
+
+
+def synthesize(metadata, champion_data, rows, folder):
+    """
+    Writes the sources of a champion index tiled up to the requested rows
+
+    Returns:
+    tuple: (index path, champion json path) inside folder
+    """
+    reps = -(-rows // len(metadata.names))
+    names = [f"{name} {rep}" for rep in range(reps) for name in metadata.names][:rows]
+    sources = [name.rsplit(" ", 1)[0] for name in names]
+    index_path = os.path.join(folder, "champs.faiss")
+    data_json = os.path.join(folder, "champ_data.json")
+
+    save_id_map(names, id_map_path(index_path))
+    save_vectors(np.tile(np.asarray(metadata.vectors), (reps, 1))[:rows], vectors_path(index_path))
+    rows_of = {name: row for row, name in enumerate(metadata.names)}
+    traits = metadata.traits
+    save_trait_table(
+        TraitTable(
+            traits.names,
+            traits.breakpoints,
+            traits.masks[[rows_of[source] for source in sources]],
+            names,
+        ),
+        trait_path(index_path),
+    )
+    with open(data_json, "w") as f:
+        json.dump({name: champion_data[source] for name, source in zip(names, sources)}, f, indent=4)
+    return index_path, data_json
+
+
+def copy_sources(folder):
+    """
+    Copies the sources of the shipped champion index into a folder
+    """
+    index_path = os.path.join(folder, "champs.faiss")
+    data_json = os.path.join(folder, "champ_data.json")
+    shutil.copyfile(DATA_JSON, data_json)
+    for path in (id_map_path, vectors_path, trait_path):
+        shutil.copyfile(path(INDEX_PATH), path(index_path))
+    return index_path, data_json
+
+
+def run_loader(kind, index_path, data_json, pkl_path, repeats):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([os.getcwd(), os.environ.get("PYTHONPATH", "")]))
+    results = []
+    for _ in range(repeats):
+        out = subprocess.run(
+            [sys.executable, "-c", LOADER, kind, index_path, data_json, pkl_path],
+            check=True,
+            capture_output=True,
+            text=True,
+            env=env,
+        )
+        results.append(json.loads(out.stdout.splitlines()[-1]))
+    return {
+        "load_ms": float(np.median([r["load_ms"] for r in results])),
+        "rss_delta_kb": int(np.median([r["rss_delta_kb"] for r in results])),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=0, help="synthetic row count")
+    parser.add_argument("--repeats", type=int, default=7)
+    args = parser.parse_args()
+
+    with open(DATA_JSON) as f:
+        champion_data = json.load(f)
+    metadata = index_metadata(INDEX_PATH, DATA_JSON)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.rows:
+            index_path, data_json = synthesize(metadata, champion_data, args.rows, tmp)
+        else:
+            index_path, data_json = copy_sources(tmp)
+        # Written to the temporary folder, so the shipped file is left as is
+        build_metadata(index_path, data_json)
+        metadata = index_metadata(index_path, data_json)
+
+        pkl_path = os.path.join(tmp, "champs.pkl")
+        traits = metadata.traits
+        with open(pkl_path, "wb") as f:
+            pickle.dump(
+                {
+                    "names": metadata.names,
+                    "vectors": np.asarray(metadata.vectors),
+                    "costs": np.asarray(metadata.costs),
+                    "trait_names": traits.names,
+                    "breakpoints": traits.breakpoints,
+                    "masks": np.asarray(traits.masks),
+                },
+                f,
+            )
+
+        report = {
+            "rows": len(metadata.names),
+            "dim": int(metadata.vectors.shape[1]),
+            "bytes": {
+                "sources": sum(
+                    os.path.getsize(path)
+                    for path in (
+                        data_json,
+                        id_map_path(index_path),
+                        vectors_path(index_path),
+                        trait_path(index_path),
+                    )
+                ),
+                "pickle": os.path.getsize(pkl_path),
+                # The vectors stay in the .npy, which the binary file maps
+                "binary": os.path.getsize(metadata_path(index_path))
+                + os.path.getsize(vectors_path(index_path)),
+            },
+        }
+        for kind in ("sources", "pickle", "binary"):
+            report[kind] = run_loader(kind, index_path, data_json, pkl_path, args.repeats)
+
+    print(json.dumps(report, indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+# bench_parser.py
+"""
+Measures parsing the saved fixture pages (scripts/fixture_site.py) with the
+BeautifulSoup scraper code and with the single-pass page parser: the best
+parse time and the peak memory allocated during a parse (tracemalloc).
+
+    python -m benchmarks.bench_parser
+"""
+import os
+import json
+import shutil
+import timeit
+import tempfile
+import tracemalloc
+from scripts import champ_scraper, item_scraper
+from scripts.fixture_site import build_site
+
+REPEATS = 20
+
+
+def peak_kb(parse, content):
+    tracemalloc.start()
+    parse(content)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 1024
+
+
+def main():
+    work = tempfile.mkdtemp(prefix="bench-parser-")
+    try:
+        build_site(work)
+        pages = {}
+        for label, path, parse in (
+            ("champions", champ_scraper.CHAMPIONS_PAGE, champ_scraper.parse_champions_page),
+            ("items", item_scraper.ITEMS_PAGE, item_scraper.parse_items_page),
+        ):
+            with open(os.path.join(work, path), "rb") as f:
+                pages[label] = (f.read(), parse)
+    finally:
+        shutil.rmtree(work)
+
+    report = {}
+    for label, (content, parse) in pages.items():
+        report[label] = {"page_kb": len(content) / 1024}
+        results = {}
+        for parser in ("soup", "stream"):
+            results[parser] = parse(content, parser)
+            best = min(timeit.repeat(lambda: parse(content, parser), number=1, repeat=REPEATS))
+            report[label][parser] = {
+                "parse_ms": best * 1000,
+                "peak_kb": peak_kb(lambda page: parse(page, parser), content),
+            }
+        report[label]["same_result"] = results["soup"] == results["stream"]
+        report[label]["speedup"] = report[label]["soup"]["parse_ms"] / report[label]["stream"]["parse_ms"]
+    print(json.dumps(report, indent=4))
+
+
+if __name__ == "__main__":
+    main()
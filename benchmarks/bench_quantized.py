@@ -0,0 +1,136 @@
+# bench_quantized.py
+"""
+Evaluates the quantized index types against the exact IndexFlatIP: recall@k
+of team queries, index memory and search latency, for "sq8" and "pq" with
+and without re-ranking the candidates against the float32 vectors.
+
+Runs on the shipped champion and item embeddings, and with --rows on a
+synthetic corpus built from them (each row is a shipped vector plus noise),
+which is where the code size starts to dominate the index size.
+
+    python -m benchmarks.bench_quantized
+    python -m benchmarks.bench_quantized --rows 50000 --rerank 8
+"""
+import json
+import time
+import argparse
+import numpy as np
+from builders.id_map import IdMap
+from builders.index_factory import build_index, normalize, search_index
+from builders.metadata import index_metadata
+from builders.synergy_builder import team_queries
+from benchmarks.bench_batch import CONFIG, CONFIG_ITEMS, random_teams
+
+K_VALUES = (1, 10, 15)
+QUERY_COUNT = 512
+# Latency is measured on one service sized batch of the queries
+LATENCY_QUERIES = 64
+# Noise added to every shipped vector to spread a synthetic corpus
+SYNTHETIC_NOISE = 0.02
+
+
+def median_ms(fn, repeats=5):
+    fn()  # warm-up
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings) * 1000)
+
+
+def index_bytes(index):
+    import faiss
+
+    return int(faiss.serialize_index(index).nbytes)
+
+
+def recall(found, exact_scores, queries, vectors, k):
+    """
+    The mean share of the found top k rows that belong to the exact top k
+
+    A row scoring as high as the exact k-th row counts, so rows tied in
+    score (the members of a two champion team) are not counted as misses.
+    """
+    hits = []
+    for query, rows, scores in zip(queries, found, exact_scores):
+        rows = rows[:k][rows[:k] >= 0]
+        found_scores = vectors[rows] @ query
+        hits.append(int(np.sum(found_scores >= scores[k - 1] - 1e-5)))
+    return float(np.mean(hits) / k)
+
+
+def synthesize(vectors, rows, seed=0):
+    rng = np.random.default_rng(seed)
+    picks = rng.integers(0, len(vectors), rows)
+    noise = rng.standard_normal((rows, vectors.shape[1]), dtype=np.float32) * SYNTHETIC_NOISE
+    return normalize(np.asarray(vectors)[picks] + noise)
+
+
+def evaluate(vectors, rerank):
+    """
+    Recall, memory and latency of every variant on one corpus
+
+    Parameters:
+    vectors (np.array): The (n, d) normalized corpus
+    rerank (int): The re-ranking factor of the "+ rerank" variants
+
+    Returns:
+    dict: The report, keyed by variant
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    id_map = IdMap([f"row{row}" for row in range(len(vectors))])
+    queries, _ = team_queries(vectors, id_map, random_teams(id_map.names, QUERY_COUNT))
+    k = max(K_VALUES)
+
+    flat = build_index(vectors, "flat")
+    exact_scores, _ = flat.search(queries, k)
+    flat_bytes = index_bytes(flat)
+    batch = queries[:LATENCY_QUERIES]
+    flat_ms = median_ms(lambda: flat.search(batch, k))
+
+    report = {"rows": len(vectors), "dim": int(vectors.shape[1]), "queries": len(queries)}
+    variants = [("flat", "flat", 0)]
+    for index_type in ("sq8", "pq"):
+        variants += [(index_type, index_type, 0), (f"{index_type}+rerank{rerank}", index_type, rerank)]
+
+    indexes = {}
+    for label, index_type, factor in variants:
+        if index_type not in indexes:
+            start = time.perf_counter()
+            indexes[index_type] = (build_index(vectors, index_type), (time.perf_counter() - start) * 1000)
+        index, build_ms = indexes[index_type]
+        _, found = search_index(index, queries, k, vectors=vectors, rerank=factor)
+        search_ms = median_ms(lambda: search_index(index, batch, k, vectors=vectors, rerank=factor))
+        size = index_bytes(index)
+        report[label] = {
+            **{f"recall@{top}": recall(found, exact_scores, queries, vectors, top) for top in K_VALUES},
+            "code_bytes_per_vector": int(index.sa_code_size()),
+            "index_bytes": size,
+            "memory_saving": round(flat_bytes / size, 2),
+            "build_ms": build_ms,
+            "search_us_per_query": search_ms * 1000 / len(batch),
+            "speedup": round(flat_ms / search_ms, 2),
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=0, help="also evaluate a synthetic corpus of this many rows")
+    parser.add_argument("--rerank", type=int, default=4, help="candidates fetched per result when re-ranking")
+    args = parser.parse_args()
+
+    report = {
+        "champions": evaluate(index_metadata(CONFIG["embeddings"], CONFIG["champ_data_json"]).vectors, args.rerank),
+        "items": evaluate(index_metadata(CONFIG_ITEMS["i_embeddings"]).vectors, args.rerank),
+    }
+    if args.rows:
+        champions = index_metadata(CONFIG["embeddings"], CONFIG["champ_data_json"]).vectors
+        report["synthetic"] = evaluate(synthesize(champions, args.rows), args.rerank)
+
+    print(json.dumps(report, indent=4))
+
+
+if __name__ == "__main__":
+    main()
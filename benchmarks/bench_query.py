@@ -0,0 +1,60 @@
+# bench_query.py
+"""
+Measures the team query modes on a batch of random teams: the plain
+centroid, the cost-weighted centroid, and the multi-vector fusions, plus
+the multi-vector mode done as one faiss call per champion for comparison.
+
+    python -m benchmarks.bench_query
+"""
+import json
+import timeit
+import numpy as np
+from builders.engine import RecommendationEngine
+from builders.query_composer import fuse, member_depth, query_options, team_weights
+from benchmarks.bench_batch import CONFIG, CONFIG_ITEMS, NO_CACHE, random_teams
+
+TEAMS = 256
+REPEATS = 5
+QUERIES = {
+    "centroid": None,
+    "cost_weighted": {"weighting": "cost"},
+    "multi_rrf": {"mode": "multi"},
+    "multi_sum": {"mode": "multi", "fusion": "sum"},
+}
+
+
+def per_champion_loop(engine, teams):
+    """
+    The multi-vector rrf ranking with one faiss search per champion
+    """
+    options = query_options({"mode": "multi"})
+    results = []
+    for team in teams:
+        rows = [engine.champ_id_map.rows[name] for name in team]
+        weights = team_weights(team, options)
+        depth = member_depth(15, len(set(rows)))
+        ids = [engine.champ_index.search(engine.champ_vectors[[row]], depth)[1][0] for row in rows]
+        owners = np.zeros(len(rows), dtype=np.int64)
+        results.append(fuse(np.array(ids), None, owners, weights, 1, 15, [set(rows)]))
+    return results
+
+
+def main():
+    engine = RecommendationEngine(CONFIG, CONFIG_ITEMS, NO_CACHE)
+    engine.prewarm()
+    teams = random_teams(engine.champ_id_map.names, TEAMS)
+
+    report = {}
+    for label, query in QUERIES.items():
+        batch = min(
+            timeit.repeat(lambda: engine.synergies_batch(teams, query=query), number=1, repeat=REPEATS)
+        )
+        report[label] = {"batch_ms": batch * 1000, "per_team_us": batch / TEAMS * 1e6}
+
+    loop = min(timeit.repeat(lambda: per_champion_loop(engine, teams), number=1, repeat=REPEATS))
+    report["multi_rrf_per_champion_loop"] = {"batch_ms": loop * 1000, "per_team_us": loop / TEAMS * 1e6}
+    print(json.dumps(report, indent=4))
+
+
+if __name__ == "__main__":
+    main()
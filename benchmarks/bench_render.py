@@ -0,0 +1,83 @@
+# bench_render.py
+"""
+Measures the html generated per rerun for a typical query (15 + 10
+champions and 15 items): the legacy per-image read, base64 and template
+format against one render_grid call over the pre-encoded asset cache.
+
+    python -m benchmarks.bench_render
+"""
+import base64
+import json
+import os
+import time
+import numpy as np
+from builders.assets import (
+    CHAMPION_IMAGE_FOLDER,
+    ITEM_IMAGE_FOLDER,
+    AssetCache,
+    image_name,
+    load_templates,
+    render_grid,
+)
+
+STYLE_END = "</style>"
+
+
+def legacy_render(names, folder, template):
+    """
+    What display_images did per rerun: one read, encode and block per image
+    """
+    blocks = []
+    for name in names:
+        with open(os.path.join(folder, f"{image_name(name)}.png"), "rb") as f:
+            img_data = base64.b64encode(f.read()).decode()
+        blocks.append(template.format(img_data=img_data, item=image_name(name)))
+    return blocks
+
+
+def median_ms(fn, repeats=50):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return float(np.median(timings))
+
+
+def main():
+    grid_template, card_template = load_templates()
+    # The legacy template was the style block followed by a single card
+    legacy_template = grid_template[: grid_template.index(STYLE_END) + len(STYLE_END)]
+    legacy_template += "\n" + card_template
+
+    champions = sorted(os.path.splitext(f)[0] for f in os.listdir(CHAMPION_IMAGE_FOLDER))
+    items = sorted(os.path.splitext(f)[0] for f in os.listdir(ITEM_IMAGE_FOLDER))
+    grids = [
+        (champions[:15], CHAMPION_IMAGE_FOLDER),
+        (champions[15:25], CHAMPION_IMAGE_FOLDER),
+        (items[:15], ITEM_IMAGE_FOLDER),
+    ]
+
+    start = time.perf_counter()
+    assets = AssetCache()
+    startup_ms = (time.perf_counter() - start) * 1000
+
+    report = {
+        "asset_cache_startup_ms": startup_ms,
+        "legacy_ms_per_rerun": median_ms(
+            lambda: [legacy_render(names, folder, legacy_template) for names, folder in grids]
+        ),
+        "cached_ms_per_rerun": median_ms(
+            lambda: [
+                render_grid(names, folder, assets, grid_template, card_template)
+                for names, folder in grids
+            ]
+        ),
+        "legacy_markdown_blocks": sum(len(names) for names, _ in grids),
+        "cached_markdown_blocks": len(grids),
+    }
+    print(json.dumps(report, indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+# bench_resolver.py
+"""
+Measures name resolution per token: exact and alias keys, cold fuzzy
+matches (memo cleared) and warm ones, and parsing a whole input line
+with missing separators.
+
+    python -m benchmarks.bench_resolver
+"""
+import json
+import time
+from builders.id_map import id_map_path, load_id_map
+from builders.name_resolver import NameResolver, load_aliases
+from benchmarks.bench_batch import CONFIG
+
+REPEATS = 2000
+TOKENS = {
+    "exact": ["Ahri", "Kai'Sa", "Lee Sin"],
+    "normalized": ["kaisa", "LEE SIN", "chogath"],
+    "alias": ["cait", "voli", "lee"],
+    "fuzzy": ["teemoo", "aphelous", "caitlin"],
+}
+LINE = "ahri teemoo, kaisa and lee sin; volibaer"
+
+
+def mean_us(fn, repeats=REPEATS):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats * 1e6
+
+
+def main():
+    id_map = load_id_map(id_map_path(CONFIG["embeddings"]))
+    start = time.perf_counter()
+    resolver = NameResolver(id_map.names, load_aliases("champions"))
+    report = {"build_ms": (time.perf_counter() - start) * 1000}
+
+    for label, tokens in TOKENS.items():
+        def cold():
+            resolver.memo.clear()
+            for token in tokens:
+                resolver.suggest(token)
+
+        def warm():
+            for token in tokens:
+                resolver.suggest(token)
+
+        report[label] = {
+            "cold_us_per_token": mean_us(cold) / len(tokens),
+            "warm_us_per_token": mean_us(warm) / len(tokens),
+        }
+
+    resolver.memo.clear()
+    report["parse_line"] = {
+        "line": LINE,
+        "names": [name for _, name, _ in resolver.parse(LINE)[0]],
+        "warm_us": mean_us(lambda: resolver.parse(LINE)),
+    }
+    print(json.dumps(report, indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# bench_scraper.py
+"""
+Measures the icon downloads of both scrapers against the local stub server
+with a simulated network latency: one bare requests.get at a time (the old
+save_image loop), the pooled concurrent Fetcher on a cold manifest, and the
+same Fetcher again when every icon is answered with 304.
+
+    python -m benchmarks.bench_scraper
+"""
+import os
+import json
+import time
+import shutil
+import tempfile
+import requests
+from scripts import champ_scraper, item_scraper
+from scripts.fetcher import Fetcher, load_fetch_config
+from scripts.fixture_site import build_site
+from scripts.stub_server import serve
+
+DELAY_MS = 20
+
+
+def icon_jobs(fetcher, folder):
+    with open(champ_scraper.DATA_FILE) as f:
+        champions = json.load(f)
+    with open(item_scraper.DATA_FILE) as f:
+        items = json.load(f)
+    return champ_scraper.image_jobs(
+        fetcher, champions, os.path.join(folder, "champions")
+    ) + item_scraper.image_jobs(fetcher, items, os.path.join(folder, "items"))
+
+
+def sequential(jobs):
+    for url, file_name in jobs:
+        os.makedirs(os.path.dirname(file_name), exist_ok=True)
+        with open(file_name, "wb") as handler:
+            handler.write(requests.get(url).content)
+
+
+def timed(server, run):
+    server.counts.clear()
+    server.connections.clear()
+    start = time.perf_counter()
+    run()
+    return {
+        "ms": (time.perf_counter() - start) * 1000,
+        "responses": {str(status): count for status, count in server.counts.items()},
+        "connections": len(server.connections),
+    }
+
+
+def main():
+    work = tempfile.mkdtemp(prefix="bench-scraper-")
+    try:
+        server = serve(build_site(os.path.join(work, "site")), delay_ms=DELAY_MS)
+        config = dict(
+            load_fetch_config(),
+            base_url=server.base_url,
+            manifest_path=os.path.join(work, "manifest.json"),
+        )
+
+        report = {"delay_ms": DELAY_MS, "max_workers": config["max_workers"]}
+        with Fetcher(config) as fetcher:
+            jobs = icon_jobs(fetcher, os.path.join(work, "old"))
+            report["files"] = len(jobs)
+            report["sequential"] = timed(server, lambda: sequential(jobs))
+
+            jobs = icon_jobs(fetcher, os.path.join(work, "new"))
+            report["pooled_cold"] = timed(server, lambda: fetcher.download_all(jobs))
+            report["pooled_not_modified"] = timed(server, lambda: fetcher.download_all(jobs))
+
+        report["speedup_cold"] = report["sequential"]["ms"] / report["pooled_cold"]["ms"]
+        print(json.dumps(report, indent=4))
+        server.shutdown()
+    finally:
+        shutil.rmtree(work)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# bench_service.py
+"""
+Measures /synergies throughput and latency of the HTTP service when many
+keep-alive clients send single-team queries at once, with and without
+request coalescing (a batch window of 0 sends one engine call per query).
+
+    python -m benchmarks.bench_service
+"""
+import json
+import time
+import asyncio
+import numpy as np
+from aiohttp import ClientSession, TCPConnector, web
+from builders.engine import RecommendationEngine
+from builders.registry import ENV_SET, BundleRegistry
+from builders.service import RecommendationService, load_service_config
+from benchmarks.bench_batch import CONFIG, CONFIG_ITEMS, NO_CACHE, random_teams
+
+PORT = 18080
+REQUESTS = 4000
+CONCURRENCY = (1, 16, 128)
+
+
+async def drive(session, teams, concurrency):
+    """
+    Sends every team from concurrency clients, returns (seconds, latencies)
+    """
+    queue = list(reversed(teams))
+    latencies = []
+
+    async def client():
+        while queue:
+            team = queue.pop()
+            start = time.perf_counter()
+            async with session.post(
+                f"http://127.0.0.1:{PORT}/synergies", json={"champions": team}
+            ) as response:
+                await response.read()
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[client() for _ in range(concurrency)])
+    return time.perf_counter() - start, np.array(latencies) * 1000
+
+
+async def run(engine, batch_window_ms):
+    config = dict(load_service_config(), batch_window_ms=batch_window_ms)
+    registry = BundleRegistry(dict(BundleRegistry().config, default_set=ENV_SET))
+    registry.add(ENV_SET, engine)
+    service = RecommendationService(registry, config)
+    runner = web.AppRunner(service.make_app())
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", PORT).start()
+
+    teams = random_teams(engine.champ_id_map.names, REQUESTS)
+    report = []
+    async with ClientSession(connector=TCPConnector(limit=max(CONCURRENCY))) as session:
+        await drive(session, teams[:100], 8)  # warm-up
+        for concurrency in CONCURRENCY:
+            seconds, latencies = await drive(session, teams, concurrency)
+            report.append(
+                {
+                    "batch_window_ms": batch_window_ms,
+                    "concurrency": concurrency,
+                    "rps": len(teams) / seconds,
+                    "p50_ms": float(np.percentile(latencies, 50)),
+                    "p99_ms": float(np.percentile(latencies, 99)),
+                }
+            )
+    report[-1]["mean_batch_size"] = service.metrics.snapshot(0)["mean_batch_size"]
+
+    await runner.cleanup()
+    return report
+
+
+def main():
+    engine = RecommendationEngine(CONFIG, CONFIG_ITEMS, NO_CACHE)
+    report = []
+    for batch_window_ms in (0, 2):
+        report.extend(asyncio.run(run(engine, batch_window_ms)))
+    print(json.dumps(report, indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+# bench_tracing.py
+"""
+Measures what the tracing spans cost: a bare disabled span, and uncached
+single-team synergy and item queries with tracing off, with the in-memory
+histogram sink and with recording on.
+
+    python -m benchmarks.bench_tracing
+"""
+import json
+import timeit
+import numpy as np
+from builders import tracing
+from builders.engine import RecommendationEngine
+from benchmarks.bench_batch import CONFIG, CONFIG_ITEMS, NO_CACHE, random_teams
+
+QUERIES = 2000
+REPEATS = 5
+
+
+def span_ns():
+    def disabled():
+        with tracing.span("bench", queries=1):
+            pass
+
+    return min(timeit.repeat(disabled, number=100000, repeat=REPEATS)) / 100000 * 1e9
+
+
+def query_us(engine, teams):
+    def run():
+        for team in teams:
+            engine.synergies_batch([team])
+            engine.items_batch([team])
+
+    run()
+    best = min(timeit.repeat(run, number=1, repeat=REPEATS))
+    return best / len(teams) * 1e6
+
+
+def main():
+    engine = RecommendationEngine(CONFIG, CONFIG_ITEMS, NO_CACHE)
+    engine.prewarm()
+    teams = random_teams(engine.champ_id_map.names, QUERIES)
+
+    report = {"disabled_span_ns": span_ns(), "query_us": {}}
+    report["query_us"]["off"] = query_us(engine, teams)
+
+    sink = tracing.add_sink(tracing.HistogramSink())
+    report["query_us"]["histogram"] = query_us(engine, teams)
+    report["spans"] = sink.snapshot()
+    tracing.remove_sink(sink)
+
+    with tracing.recording():
+        report["query_us"]["recording"] = query_us(engine, teams[:200])
+
+    off = report["query_us"]["off"]
+    report["histogram_overhead"] = float(np.round(report["query_us"]["histogram"] / off - 1, 4))
+    print(json.dumps(report, indent=4))
+
+
+if __name__ == "__main__":
+    main()
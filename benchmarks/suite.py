@@ -0,0 +1,295 @@
+# suite.py
+"""
+The benchmark suite: end-to-end latency of the builder mains, artifact
+load time, raw search throughput, index build time and grid rendering,
+on the shipped data and on synthetic 10k / 100k vector corpora.
+
+Results are written as JSON and can be compared against a stored
+baseline; the run fails when a metric regressed by more than the
+tolerance.
+
+    python -m benchmarks.suite
+    python -m benchmarks.suite --quick
+    python -m benchmarks.suite --baseline benchmarks/baseline.json
+    python -m benchmarks.suite --save-baseline
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import numpy as np
+import builders.item_builder as item_builder
+import builders.synergy_builder as synergy_builder
+from builders.assets import (
+    CHAMPION_IMAGE_FOLDER,
+    ITEM_IMAGE_FOLDER,
+    AssetCache,
+    load_templates,
+    render_grid,
+)
+from builders.engine import RecommendationEngine
+from builders.id_map import IdMap, id_map_path, load_id_map, save_id_map
+from builders.index_factory import INDEX_TYPES, build_index, normalize, save_index
+from builders.vector_store import load_vectors, save_vectors, vectors_path
+from benchmarks.bench_batch import CONFIG, CONFIG_ITEMS, NO_CACHE, random_teams
+
+BASELINE_PATH = "benchmarks/baseline.json"
+RESULTS_PATH = "benchmarks/results.json"
+SYNTHETIC_SIZES = (10_000, 100_000)
+SYNTHETIC_DIMENSION = 256
+TOP_K = 10
+BATCH_SIZE = 64
+TOLERANCE = 0.2
+# Latency changes below this are timer noise on sub-millisecond searches
+MIN_DELTA_MS = 0.05
+
+
+def latency(fn, repeats=50, warmup=3):
+    """
+    Calls fn repeatedly and returns its p50 / p99 / mean latency in ms
+    """
+    for _ in range(warmup):
+        fn()
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return {
+        "p50_ms": float(np.percentile(timings, 50)),
+        "p99_ms": float(np.percentile(timings, 99)),
+        "mean_ms": float(np.mean(timings)),
+    }
+
+
+def throughput(fn, queries, min_seconds=0.5):
+    """
+    Returns queries per second, repeating fn() (answering queries at once) for min_seconds
+    """
+    fn()
+    calls = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < min_seconds:
+        fn()
+        calls += 1
+    return calls * queries / (time.perf_counter() - start)
+
+
+def once_ms(fn):
+    start = time.perf_counter()
+    value = fn()
+    return (time.perf_counter() - start) * 1000, value
+
+
+def shipped_benchmarks():
+    """
+    End-to-end, load, search and render numbers on the shipped artifacts
+    """
+    team = ["Ahri", "Teemo"]
+    report = {
+        "e2e": {
+            "synergy_main": latency(lambda: synergy_builder.main(CONFIG, team), repeats=30),
+            "item_main": latency(
+                lambda: item_builder.main(CONFIG, CONFIG_ITEMS, team), repeats=30
+            ),
+        }
+    }
+
+    init_ms, engine = once_ms(lambda: RecommendationEngine(CONFIG, CONFIG_ITEMS, NO_CACHE))
+    prewarm_ms, _ = once_ms(engine.prewarm)
+    report["load"] = {
+        "engine_init_ms": init_ms,
+        "prewarm_ms": prewarm_ms,
+        "read_index_ms": latency(lambda: synergy_builder.load_index(CONFIG["embeddings"]), 20)[
+            "p50_ms"
+        ],
+    }
+
+    teams = random_teams(engine.champ_id_map.names, BATCH_SIZE)
+    report["search"] = {
+        "synergies": latency(lambda: engine.synergies(team), repeats=200),
+        "synergies_loop_qps": throughput(
+            lambda: [engine.synergies(t) for t in teams], len(teams)
+        ),
+        "synergies_batch_qps": throughput(lambda: engine.synergies_batch(teams), len(teams)),
+        "items_batch_qps": throughput(lambda: engine.items_batch(teams), len(teams)),
+    }
+
+    assets_ms, assets = once_ms(AssetCache)
+    grid_template, card_template = load_templates()
+    champions = engine.champ_id_map.names
+    items = engine.item_id_map.names
+    grids = [
+        (champions[:15], CHAMPION_IMAGE_FOLDER),
+        (champions[15:25], CHAMPION_IMAGE_FOLDER),
+        (items[:15], ITEM_IMAGE_FOLDER),
+    ]
+    report["render"] = {
+        "asset_cache_ms": assets_ms,
+        "rerun_grids": latency(
+            lambda: [
+                render_grid(names, folder, assets, grid_template, card_template)
+                for names, folder in grids
+            ],
+            repeats=100,
+        ),
+    }
+    return report
+
+
+def synthetic_benchmarks(rows, dimension=SYNTHETIC_DIMENSION, seed=0):
+    """
+    Build, load and search numbers on a random corpus of the given size
+    """
+    rng = np.random.default_rng(seed)
+    vectors = normalize(rng.standard_normal((rows, dimension), dtype=np.float32))
+    names = [f"champ{row}" for row in range(rows)]
+    id_map = IdMap(names)
+    champion_data = {name: {"cost": int(rng.integers(1, 6))} for name in names}
+
+    picker = random.Random(seed)
+    teams = [picker.sample(names, picker.randint(1, 4)) for _ in range(BATCH_SIZE)]
+    queries, _ = synergy_builder.team_queries(vectors, id_map, teams)
+
+    report = {"build": {}, "load": {}, "search": {}}
+    with tempfile.TemporaryDirectory() as directory:
+        for index_type in INDEX_TYPES:
+            build_ms, index = once_ms(lambda: build_index(vectors, index_type))
+            report["build"][f"{index_type}_ms"] = build_ms
+
+            path = os.path.join(directory, f"{index_type}.faiss")
+            save_index(index, path)
+            report["load"][f"read_{index_type}_index_ms"] = latency(
+                lambda: synergy_builder.load_index(path), repeats=5, warmup=1
+            )["p50_ms"]
+
+            report["search"][index_type] = {
+                "single": latency(
+                    lambda: synergy_builder.search_batch(
+                        queries[:1], index, id_map, champion_data, teams[:1], TOP_K, TOP_K
+                    ),
+                    repeats=200,
+                ),
+                "batch_qps": throughput(
+                    lambda: synergy_builder.search_batch(
+                        queries, index, id_map, champion_data, teams, TOP_K, TOP_K
+                    ),
+                    len(teams),
+                ),
+            }
+
+        path = os.path.join(directory, "flat.faiss")
+        save_vectors(vectors, vectors_path(path))
+        save_id_map(names, id_map_path(path))
+        report["load"]["id_map_ms"] = latency(
+            lambda: load_id_map(id_map_path(path)), repeats=5, warmup=1
+        )["p50_ms"]
+        report["load"]["vectors_mmap_ms"] = latency(
+            lambda: load_vectors(vectors_path(path)), repeats=5, warmup=1
+        )["p50_ms"]
+
+    return report
+
+
+def run(sizes=SYNTHETIC_SIZES, dimension=SYNTHETIC_DIMENSION):
+    """
+    Runs the whole suite
+
+    Returns:
+    dict: The results with the machine they were measured on
+    """
+    import faiss
+
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "numpy": np.__version__,
+            "faiss": faiss.__version__,
+            "synthetic_dimension": dimension,
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "shipped": shipped_benchmarks(),
+        "synthetic": {str(rows): synthetic_benchmarks(rows, dimension) for rows in sizes},
+    }
+
+
+def flatten(report, prefix=""):
+    """
+    Flattens nested results into {"a.b.c_ms": value} for comparison
+    """
+    flat = {}
+    for key, value in report.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, path + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[path] = value
+    return flat
+
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    """
+    Compares every metric present in both runs
+
+    Metrics ending in _ms are better when lower, _qps when higher; a
+    metric regressed when it is worse than the baseline by more than
+    tolerance (0.2 = 20%) and, for latencies, by more than MIN_DELTA_MS.
+    p99 latencies are reported but too noisy to fail a run.
+
+    Returns:
+    list: (metric, baseline, current, change) per regression, change as a fraction
+    """
+    current = flatten(results)
+    previous = flatten(baseline)
+    regressions = []
+    for metric in sorted(set(current) & set(previous)):
+        if metric.startswith("meta.") or metric.endswith("p99_ms") or not previous[metric]:
+            continue
+        change = current[metric] / previous[metric] - 1
+        slower = current[metric] - previous[metric] > MIN_DELTA_MS
+        if metric.endswith("_ms") and change > tolerance and slower:
+            regressions.append((metric, previous[metric], current[metric], change))
+        elif metric.endswith("_qps") and change < -tolerance:
+            regressions.append((metric, previous[metric], current[metric], change))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Runs the benchmark suite.")
+    parser.add_argument("--quick", action="store_true", help="only the 10k synthetic corpus")
+    parser.add_argument("--dim", type=int, default=SYNTHETIC_DIMENSION)
+    parser.add_argument("--output", default=RESULTS_PATH, help="where to write the JSON results")
+    parser.add_argument("--baseline", help="a results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument(
+        "--save-baseline", action="store_true", help=f"also write the results to {BASELINE_PATH}"
+    )
+    args = parser.parse_args(argv)
+
+    sizes = SYNTHETIC_SIZES[:1] if args.quick else SYNTHETIC_SIZES
+    results = run(sizes, args.dim)
+
+    paths = [args.output] + ([BASELINE_PATH] if args.save_baseline else [])
+    for path in paths:
+        with open(path, "w") as f:
+            json.dump(results, f, indent=4)
+    print(json.dumps(results, indent=4))
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for metric, before, after, change in regressions:
+            print(f"REGRESSION {metric}: {before:.3f} -> {after:.3f} ({change:+.0%})")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.tolerance:.0%} against {args.baseline}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+#affinity.py
+import os
+import hashlib
+import numpy as np
+from builders.query_composer import RRF_K, fuse
+
+# Bump when the layout of the affinity file changes
+AFFINITY_VERSION = 1
+AFFINITY_TOP_K = 15
+
+
+def affinity_path(item_index_path):
+    """
+    Returns the champion x item affinity path stored alongside the item index
+
+    Parameters:
+    item_index_path (str): The path to the item faiss index, e.g. embeddings/items.faiss
+
+    Returns:
+    str: The affinity path, e.g. embeddings/items.affinity.npz
+    """
+    return os.path.splitext(item_index_path)[0] + ".affinity.npz"
+
+
+def file_digest(file_name):
+    """
+    Returns the sha256 of a file, read in chunks
+    """
+    digest = hashlib.sha256()
+    with open(file_name, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def fingerprint(champ_vectors_path, item_vectors_path):
+    """
+    Identifies the pair of embedding files an affinity matrix was built from
+    """
+    return f"{file_digest(champ_vectors_path)}:{file_digest(item_vectors_path)}"
+
+
+class Affinity:
+    """
+    Precomputed champion x item cosine similarities and their top-k table
+    """
+
+    def __init__(self, matrix, top_items, source=""):
+        self.matrix = matrix
+        self.top_items = top_items
+        self.source = source
+
+    def rank(self, champ_rows, top_k=AFFINITY_TOP_K, weights=None, fusion=None, rrf_k=RRF_K):
+        """
+        Ranks items for a team without any index search
+
+        A single champion is a slice of the top-k table. A team averages
+        its champions' rows, which ranks items exactly like searching with
+        the normalized average of their embeddings; with weights it is the
+        weighted average, like the weighted centroid. Each row already is a
+        full per-champion search, so fusion="rrf" fuses the row rankings by
+        reciprocal rank ("sum" ranks like the weighted average).
+
+        Parameters:
+        champ_rows (list): The champion index rows of the team
+        top_k (int, optional): The number of items. Defaults to 15.
+        weights (np.array, optional): The (k,) champion weights. Defaults to equal weights.
+        fusion (str, optional): "rrf" to fuse the per-champion rankings. Defaults to None.
+        rrf_k (int, optional): The reciprocal rank constant. Defaults to 60.
+
+        Returns:
+        np.array: The item index rows, best first
+        """
+        if len(champ_rows) == 1 and top_k <= self.top_items.shape[1]:
+            return self.top_items[champ_rows[0], :top_k]
+
+        rows = self.matrix[champ_rows]
+        if weights is None:
+            weights = np.full(len(champ_rows), 1 / len(champ_rows), dtype=np.float32)
+
+        if fusion == "rrf":
+            ids = np.argsort(-rows, axis=1, kind="stable")
+            owners = np.zeros(len(champ_rows), dtype=np.int64)
+            return fuse(ids, rows, owners, weights, 1, top_k, rrf_k=rrf_k)[0]
+
+        scores = weights @ rows
+        top_k = min(top_k, len(scores))
+        best = np.argpartition(-scores, top_k - 1)[:top_k]
+        return best[np.argsort(-scores[best], kind="stable")]
+
+
+def build_affinity(champ_vectors, item_vectors, top_k=AFFINITY_TOP_K, source=""):
+    """
+    Computes every champion x item similarity of two normalized matrices
+
+    Parameters:
+    champ_vectors (np.array): The (c, d) normalized champion embeddings
+    item_vectors (np.array): The (i, d) normalized item embeddings
+    top_k (int, optional): The width of the top-k table. Defaults to 15.
+    source (str, optional): The fingerprint of the embedding files
+
+    Returns:
+    Affinity: The similarity matrix and its top-k table
+    """
+    matrix = np.asarray(champ_vectors, dtype=np.float32) @ np.asarray(
+        item_vectors, dtype=np.float32
+    ).T
+    top_k = min(top_k, matrix.shape[1])
+    top_items = np.argsort(-matrix, axis=1, kind="stable")[:, :top_k]
+    return Affinity(matrix, top_items.astype(np.int32), source)
+
+
+def save_affinity(affinity, file_name):
+    """
+    Saves an affinity matrix with the fingerprint it was built from
+    """
+    np.savez(
+        file_name,
+        version=AFFINITY_VERSION,
+        source=affinity.source,
+        matrix=affinity.matrix,
+        top_items=affinity.top_items,
+    )
+
+
+def load_affinity(file_name, source):
+    """
+    Loads an affinity matrix if it was built from the current embeddings
+
+    Parameters:
+    file_name (str): The path to the affinity file
+    source (str): The fingerprint of the current embedding files
+
+    Returns:
+    Affinity: The loaded affinity, or None when it is missing or stale
+    """
+    if not os.path.exists(file_name):
+        return None
+
+    with np.load(file_name) as data:
+        if int(data["version"]) != AFFINITY_VERSION or str(data["source"]) != source:
+            return None
+        return Affinity(data["matrix"], data["top_items"], source)
+
+
+def cached_affinity_path(cache_dir, source):
+    """
+    Returns the path of a rebuilt affinity kept in a cache folder, by fingerprint
+    """
+    name = hashlib.sha256(source.encode("utf-8")).hexdigest()[:32]
+    return os.path.join(cache_dir, f"{name}.affinity.npz")
+
+
+def get_affinity(file_name, champ_vectors_path, item_vectors_path, cache_dir=None):
+    """
+    Loads the affinity matrix, rebuilding it when either embeddings file changed
+
+    Parameters:
+    file_name (str): The path to the affinity file
+    champ_vectors_path (str): The path to the champion .npy matrix
+    item_vectors_path (str): The path to the item .npy matrix
+    cache_dir (str, optional): Keep a rebuilt matrix in this folder instead of
+        writing file_name, for artifacts that are never modified like a bundle's
+
+    Returns:
+    Affinity: The up to date affinity
+    """
+    source = fingerprint(champ_vectors_path, item_vectors_path)
+    affinity = load_affinity(file_name, source)
+    if cache_dir:
+        file_name = cached_affinity_path(cache_dir, source)
+        if affinity is None:
+            affinity = load_affinity(file_name, source)
+
+    if affinity is None:
+        affinity = build_affinity(
+            np.load(champ_vectors_path, mmap_mode="r"),
+            np.load(item_vectors_path, mmap_mode="r"),
+            source=source,
+        )
+        try:
+            if cache_dir:
+                os.makedirs(cache_dir, exist_ok=True)
+            save_affinity(affinity, file_name)
+        except OSError as e:
+            print(f"Could not save {file_name}: {e}")
+
+    return affinity
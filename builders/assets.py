@@ -0,0 +1,89 @@
+#assets.py
+import os
+import base64
+
+CHAMPION_IMAGE_FOLDER = "assets/images/champions"
+ITEM_IMAGE_FOLDER = "assets/images/items"
+LOGO_IMAGE_FOLDER = "assets/images/logo"
+IMAGE_FOLDERS = (CHAMPION_IMAGE_FOLDER, ITEM_IMAGE_FOLDER, LOGO_IMAGE_FOLDER)
+
+
+def image_name(name):
+    """
+    Returns the image file stem of a champion or item name
+    """
+    return name.replace("/", "-")  # For K/DA Akali
+
+
+def encode_folder(folder):
+    """
+    Base64-encodes every PNG in a folder
+
+    Parameters:
+    folder (str): The image folder
+
+    Returns:
+    dict: The base64 strings keyed by file stem
+    """
+    images = {}
+    for file_name in sorted(os.listdir(folder)):
+        stem, extension = os.path.splitext(file_name)
+        if extension.lower() != ".png":
+            continue
+        with open(os.path.join(folder, file_name), "rb") as f:
+            images[stem] = base64.b64encode(f.read()).decode("utf-8")
+    return images
+
+
+class AssetCache:
+    """
+    Holds the base64 strings of every image, encoded once at startup
+    """
+
+    def __init__(self, folders=IMAGE_FOLDERS):
+        self.images = {folder: encode_folder(folder) for folder in folders}
+
+    def get(self, folder, name):
+        """
+        Returns the base64 string of a champion or item image, or None
+        """
+        return self.images.get(folder, {}).get(image_name(name))
+
+
+def load_templates(template_folder="template"):
+    """
+    Loads the grid and card html templates
+
+    Returns:
+    tuple: The grid template and the card template
+    """
+    with open(os.path.join(template_folder, "template.html")) as f:
+        grid_template = f.read()
+    with open(os.path.join(template_folder, "card.html")) as f:
+        card_template = f.read()
+    return grid_template, card_template
+
+
+def render_grid(names, folder, assets, grid_template, card_template):
+    """
+    Renders a whole image grid as one html block
+
+    Parameters:
+    names (list): The champion or item names, in display order
+    folder (str): The image folder of the names
+    assets (AssetCache): The pre-encoded images
+    grid_template (str): The grid template with a {cards} field
+    card_template (str): The card template with {img_data} and {item} fields
+
+    Returns:
+    tuple: The html block and the names without an image
+    """
+    cards = []
+    missing = []
+    for name in names:
+        img_data = assets.get(folder, name)
+        if img_data is None:
+            missing.append(name)
+            continue
+        cards.append(card_template.format(img_data=img_data, item=image_name(name)))
+    return grid_template.format(cards="".join(cards)), missing
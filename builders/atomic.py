@@ -0,0 +1,36 @@
+#atomic.py
+import os
+import tempfile
+from contextlib import contextmanager
+
+
+@contextmanager
+def replacing(file_name):
+    """
+    Yields a temporary path next to file_name, then renames it over file_name
+
+    The rename is atomic, so readers see the old file or the new one, and an
+    engine that memory-mapped the old file keeps its pages until it reloads.
+    When the block raises, the temporary file is removed and file_name is
+    left as it was.
+
+    Parameters:
+    file_name (str): The file to replace
+
+    Yields:
+    str: The temporary path to write, with the same extension as file_name
+    """
+    folder = os.path.dirname(file_name) or "."
+    # np.save and np.savez append their extension to a name without it
+    suffix = os.path.splitext(file_name)[1]
+    fd, temp_name = tempfile.mkstemp(dir=folder, prefix=".tmp-", suffix=suffix)
+    os.close(fd)
+    try:
+        yield temp_name
+        # mkstemp creates the file private to the user
+        os.chmod(temp_name, 0o644)
+        os.replace(temp_name, file_name)
+    except BaseException:
+        if os.path.exists(temp_name):
+            os.remove(temp_name)
+        raise
@@ -0,0 +1,281 @@
+#bundles.py
+import os
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+from dotenv import load_dotenv
+from builders.affinity import affinity_path, file_digest
+from builders.id_map import id_map_path
+from builders.metadata import metadata_path
+from builders.traits import trait_path
+from builders.vector_store import vectors_path
+
+# Bump when the bundle layout or the manifest changes
+BUNDLE_FORMAT = 1
+MANIFEST_FILE = "manifest.json"
+# The artifact file names inside a bundle. The index names keep the
+# .ids.json / .npy / .meta.bin / .traits.npz / .affinity.npz paths derived from them
+CHAMP_DATA_JSON = "champ_data.json"
+CHAMP_DATA_PKL = "champ_data.pkl"
+CHAMP_INDEX = "champs.faiss"
+ITEM_DATA_JSON = "item_data.json"
+ITEM_DATA_PKL = "item_data.pkl"
+ITEM_INDEX = "items.faiss"
+# The folder under BUNDLES_DIR holding affinities rebuilt for bundles without one
+AFFINITY_CACHE = ".affinity-cache"
+# Rebuilt or read from the other files when missing, so a bundle may leave them out
+OPTIONAL_FILES = (
+    os.path.basename(trait_path(CHAMP_INDEX)),
+    os.path.basename(affinity_path(ITEM_INDEX)),
+    os.path.basename(metadata_path(CHAMP_INDEX)),
+    os.path.basename(metadata_path(ITEM_INDEX)),
+)
+
+
+def load_bundle_config():
+    load_dotenv()
+    return {
+        "root": os.getenv("BUNDLES_DIR", "bundles"),
+        "default_set": os.getenv("BUNDLE_SET", ""),
+        "sets": [name.strip() for name in os.getenv("BUNDLE_SETS", "").split(",") if name.strip()],
+    }
+
+
+def bundle_path(root, set_name, patch):
+    """
+    Returns the folder of one set / patch bundle, e.g. bundles/set11/14.6
+    """
+    return os.path.join(root, set_name, patch)
+
+
+def source_files(config, config_items):
+    """
+    Maps every bundle file name to the artifact it is copied from
+
+    Parameters:
+    config (dict): The champion config from load_config()
+    config_items (dict): The item config from load_config_items()
+
+    Returns:
+    dict: {bundle file name: source path}
+    """
+    files = {
+        CHAMP_DATA_JSON: config["champ_data_json"],
+        CHAMP_DATA_PKL: config["champ_data_pkl"],
+        ITEM_DATA_JSON: config_items["item_data_json"],
+        ITEM_DATA_PKL: config_items["item_data_pkl"],
+    }
+    for name, index in ((CHAMP_INDEX, config["embeddings"]), (ITEM_INDEX, config_items["i_embeddings"])):
+        files[name] = index
+        files[os.path.basename(id_map_path(name))] = id_map_path(index)
+        files[os.path.basename(vectors_path(name))] = vectors_path(index)
+    files[OPTIONAL_FILES[0]] = trait_path(config["embeddings"])
+    files[OPTIONAL_FILES[1]] = affinity_path(config_items["i_embeddings"])
+    files[OPTIONAL_FILES[2]] = metadata_path(config["embeddings"])
+    files[OPTIONAL_FILES[3]] = metadata_path(config_items["i_embeddings"])
+    return files
+
+
+def bundle_checksum(files):
+    """
+    One checksum over the name and sha256 of every file of a bundle
+    """
+    digest = hashlib.sha256()
+    for name in sorted(files):
+        digest.update(f"{name}:{files[name]['sha256']}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def build_bundle(set_name, patch, config, config_items, root="bundles"):
+    """
+    Copies the current artifacts into a new, immutable set / patch bundle
+
+    The bundle is assembled in a hidden folder next to its target and
+    renamed into place once the manifest is written, so a running loader
+    never sees a partial bundle.
+
+    Parameters:
+    set_name (str): The set, e.g. "set11"
+    patch (str): The patch, e.g. "14.6"
+    config (dict): The champion config from load_config()
+    config_items (dict): The item config from load_config_items()
+    root (str, optional): The bundles folder. Defaults to "bundles".
+
+    Returns:
+    str: The bundle folder
+    """
+    for name in (set_name, patch):
+        if not name or name.startswith(".") or os.sep in name or name != name.strip():
+            raise ValueError(f"Invalid set or patch name: {name!r}.")
+    target = bundle_path(root, set_name, patch)
+    if os.path.exists(target):
+        raise ValueError(f"{target} already exists. Bundles are immutable, build a new patch instead.")
+
+    sources = source_files(config, config_items)
+    missing = [
+        path
+        for name, path in sources.items()
+        if name not in OPTIONAL_FILES and not os.path.exists(path)
+    ]
+    if missing:
+        raise ValueError(f"Missing artifacts: {', '.join(missing)}.")
+
+    os.makedirs(os.path.join(root, set_name), exist_ok=True)
+    building = tempfile.mkdtemp(dir=os.path.join(root, set_name), prefix=".build-")
+    try:
+        files = {}
+        for name, path in sources.items():
+            if not os.path.exists(path):
+                continue
+            shutil.copyfile(path, os.path.join(building, name))
+            files[name] = {
+                "sha256": file_digest(os.path.join(building, name)),
+                "size": os.path.getsize(os.path.join(building, name)),
+            }
+
+        manifest = {
+            "format": BUNDLE_FORMAT,
+            "set": set_name,
+            "patch": patch,
+            "created": time.time(),
+            "files": files,
+            "checksum": bundle_checksum(files),
+        }
+        with open(os.path.join(building, MANIFEST_FILE), "w") as f:
+            json.dump(manifest, f, indent=4)
+        # mkdtemp creates the folder private to the user
+        os.chmod(building, 0o755)
+        os.rename(building, target)
+    except BaseException:
+        shutil.rmtree(building, ignore_errors=True)
+        raise
+    return target
+
+
+def read_manifest(path):
+    """
+    Reads the manifest of a bundle folder
+
+    Returns:
+    dict: The manifest, see build_bundle
+    """
+    file_name = os.path.join(path, MANIFEST_FILE)
+    try:
+        with open(file_name) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        raise ValueError(f"{path} is not a bundle: {e}") from e
+
+    if manifest.get("format") != BUNDLE_FORMAT:
+        raise ValueError(
+            f"{file_name} has bundle format {manifest.get('format')}, expected {BUNDLE_FORMAT}."
+        )
+    return manifest
+
+
+def verify_bundle(path):
+    """
+    Checks every file of a bundle against its manifest
+
+    Parameters:
+    path (str): The bundle folder
+
+    Returns:
+    dict: The manifest, if the bundle is complete and unchanged
+    """
+    manifest = read_manifest(path)
+    files = manifest["files"]
+    if bundle_checksum(files) != manifest["checksum"]:
+        raise ValueError(f"The manifest of {path} does not match its checksum.")
+
+    problems = []
+    for name, expected in sorted(files.items()):
+        file_name = os.path.join(path, name)
+        if not os.path.exists(file_name):
+            problems.append(f"{name} is missing")
+        elif os.path.getsize(file_name) != expected["size"]:
+            problems.append(f"{name} has {os.path.getsize(file_name)} bytes, expected {expected['size']}")
+        elif file_digest(file_name) != expected["sha256"]:
+            problems.append(f"{name} does not match its sha256")
+    required = set(source_files(*bundle_configs(path))) - set(OPTIONAL_FILES)
+    problems.extend(f"{name} is not in the manifest" for name in sorted(required - set(files)))
+    if problems:
+        raise ValueError(f"The bundle {path} is damaged: {'; '.join(problems)}.")
+    return manifest
+
+
+def bundle_configs(path):
+    """
+    Returns the champion and item configs of a bundle
+
+    They have the keys of load_config() and load_config_items(), so every
+    builder function and the engine can read a bundle like the .env paths.
+    config_items also names the affinity_cache folder, a hidden folder next
+    to the sets, where an affinity rebuilt for the bundle is kept instead of
+    writing into it.
+
+    Returns:
+    tuple: (config, config_items)
+    """
+    config = {
+        "champ_data_pkl": os.path.join(path, CHAMP_DATA_PKL),
+        "champ_data_json": os.path.join(path, CHAMP_DATA_JSON),
+        "embeddings": os.path.join(path, CHAMP_INDEX),
+    }
+    config_items = {
+        "item_data_pkl": os.path.join(path, ITEM_DATA_PKL),
+        "item_data_json": os.path.join(path, ITEM_DATA_JSON),
+        "i_embeddings": os.path.join(path, ITEM_INDEX),
+        "affinity_cache": os.path.join(os.path.dirname(os.path.dirname(path)), AFFINITY_CACHE),
+    }
+    return config, config_items
+
+
+def list_bundles(root="bundles"):
+    """
+    Lists the bundles under a folder
+
+    Returns:
+    dict: {set name: [patches, oldest first]}; folders without a readable manifest are skipped
+    """
+    bundles = {}
+    if not os.path.isdir(root):
+        return bundles
+    for set_name in sorted(os.listdir(root)):
+        set_folder = os.path.join(root, set_name)
+        if set_name.startswith(".") or not os.path.isdir(set_folder):
+            continue
+        patches = []
+        for patch in os.listdir(set_folder):
+            if patch.startswith("."):
+                continue
+            try:
+                manifest = read_manifest(os.path.join(set_folder, patch))
+            except ValueError:
+                continue
+            patches.append((manifest["created"], patch))
+        if patches:
+            bundles[set_name] = [patch for _, patch in sorted(patches)]
+    return bundles
+
+
+def latest_patch(root, set_name):
+    """
+    Returns the most recently built patch of a set
+    """
+    patches = list_bundles(root).get(set_name)
+    if not patches:
+        raise ValueError(f"No bundle for the set {set_name} in {root}.")
+    return patches[-1]
+
+
+def set_configs(set_name, patch=None, root=None):
+    """
+    Returns the (config, config_items) of a set, by default of its latest patch
+    """
+    root = root or load_bundle_config()["root"]
+    path = bundle_path(root, set_name, patch or latest_patch(root, set_name))
+    read_manifest(path)
+    return bundle_configs(path)
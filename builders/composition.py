@@ -0,0 +1,115 @@
+#composition.py
+import numpy as np
+
+DEFAULT_BEAM_WIDTH = 64
+DEFAULT_POOL_SIZE = 30
+
+
+def trait_scores(counts, traits):
+    """
+    Scores trait counts by the share of each trait's breakpoints they reach
+
+    Parameters:
+    counts (np.array): The (..., traits) unit counts
+    traits (TraitTable): The trait table
+
+    Returns:
+    np.array: The (...) trait scores
+    """
+    capped = np.minimum(counts, traits.levels.shape[1] - 1)
+    reached = traits.levels[np.arange(len(traits.names)), capped]
+    return (reached / traits.tiers).sum(axis=-1)
+
+
+def compose(
+    team_rows,
+    similarities,
+    costs,
+    traits,
+    board_size=8,
+    gold_budget=None,
+    top_n=5,
+    similarity_weight=1.0,
+    trait_weight=1.0,
+    beam_width=DEFAULT_BEAM_WIDTH,
+    pool_size=DEFAULT_POOL_SIZE,
+):
+    """
+    Completes a team to a full board with a beam search
+
+    A board scores similarity_weight * the summed similarity of the added
+    champions to the team plus trait_weight * the share of breakpoints
+    each trait reaches. Candidates are limited to the pool_size champions
+    most similar to the team, and each level keeps the beam_width best
+    partial boards. Candidates are only added in pool order, so every
+    set of champions is built once.
+
+    Parameters:
+    team_rows (list): The champion index rows already on the board
+    similarities (np.array): The similarity of every champion to the team
+    costs (np.array): The cost of every champion
+    traits (TraitTable): The trait table
+    board_size (int, optional): The number of units on the final board. Defaults to 8.
+    gold_budget (int, optional): The most gold the added champions may cost. Defaults to None.
+    top_n (int, optional): The number of boards to return. Defaults to 5.
+    similarity_weight (float, optional): The weight of embedding similarity. Defaults to 1.0.
+    trait_weight (float, optional): The weight of trait breakpoints. Defaults to 1.0.
+    beam_width (int, optional): The partial boards kept per level. Defaults to 64.
+    pool_size (int, optional): The candidate champions considered. Defaults to 30.
+
+    Returns:
+    list: The best (added rows, score, cost, trait counts) boards, best first
+    """
+    team_rows = sorted(set(team_rows))
+    to_add = board_size - len(team_rows)
+    if to_add < 0:
+        raise ValueError(f"The team already has more than {board_size} units.")
+
+    budget = np.inf if gold_budget is None else gold_budget
+    candidates = np.setdiff1d(np.flatnonzero(costs <= budget), team_rows)
+    pool = candidates[np.argsort(-similarities[candidates], kind="stable")][:pool_size]
+    pool_members = traits.members[pool].astype(np.int32)
+    pool_costs = costs[pool]
+    pool_similarities = similarities[pool]
+
+    base_counts = traits.counts(team_rows).astype(np.int32)
+    # (added pool positions, trait counts, cost, similarity sum, score)
+    beam = [((), base_counts, 0, 0.0, trait_weight * trait_scores(base_counts, traits))]
+
+    for _ in range(to_add):
+        expansions = []
+        for added, counts, cost, similarity, _ in beam:
+            start = added[-1] + 1 if added else 0
+            positions = np.arange(start, len(pool))
+            positions = positions[cost + pool_costs[positions] <= budget]
+            if len(positions) == 0:
+                continue
+
+            new_counts = counts[None, :] + pool_members[positions]
+            new_similarity = similarity + pool_similarities[positions]
+            scores = similarity_weight * new_similarity + trait_weight * trait_scores(
+                new_counts, traits
+            )
+            # No single state can contribute more than beam_width survivors
+            best = np.argsort(-scores, kind="stable")[:beam_width]
+            for i in best:
+                position = positions[i]
+                expansions.append(
+                    (
+                        added + (int(position),),
+                        new_counts[i],
+                        cost + pool_costs[position],
+                        new_similarity[i],
+                        scores[i],
+                    )
+                )
+
+        if not expansions:
+            return []
+        expansions.sort(key=lambda state: -state[4])
+        beam = expansions[:beam_width]
+
+    return [
+        ([int(pool[p]) for p in added], float(score), int(cost), counts)
+        for added, counts, cost, _, score in beam[:top_n]
+    ]
@@ -0,0 +1,546 @@
+#engine.py
+import json
+import time
+import threading
+import numpy as np
+import builders.composition as composition
+import builders.item_builder as item_builder
+import builders.synergy_builder as synergy_builder
+from builders import tracing
+from builders.affinity import affinity_path, get_affinity
+from builders.filters import resolve_filters
+from builders.id_map import id_map_path
+from builders.index_factory import load_search_config
+from builders.metadata import index_metadata, metadata_path
+from builders.name_resolver import NameResolver, load_aliases
+from builders.query_composer import query_options
+from builders.result_cache import ResultCache, artifact_version, load_cache_config
+from builders.traits import trait_path
+from builders.vector_store import vectors_path
+
+
+def timed(timings, label, load, *args):
+    """
+    Calls load(*args), recording how long it took in timings[label] (ms)
+    """
+    start = time.perf_counter()
+    value = load(*args)
+    timings[label] = (time.perf_counter() - start) * 1000
+    return value
+
+
+def check_count(name, count, limit):
+    """
+    Raises a ValueError unless count is an integer between 1 and limit
+
+    Parameters:
+    name (str): The count's name in the error, e.g. "top_k_champs"
+    count (int): The number of results asked for
+    limit (int): The number of rows that can be returned
+    """
+    if isinstance(count, bool) or not isinstance(count, (int, np.integer)):
+        raise ValueError(f"{name} must be an integer.")
+    if not 1 <= count <= limit:
+        raise ValueError(f"{name} must be between 1 and {limit}.")
+
+
+class EngineState:
+    """
+    The artifacts of one engine load, replaced as a whole on reload
+
+    A query reads engine.state once and uses that object throughout, so a
+    reload in between never pairs the old id map with the new index. The
+    champion index is the one field filled after load, on first use.
+    """
+
+    FIELDS = (
+        "champion_data",
+        "champ_id_map",
+        "item_id_map",
+        "champ_vectors",
+        "traits",
+        "costs",
+        "affinity",
+        "champ_resolver",
+        "item_resolver",
+        "load_timings",
+        "version",
+    )
+    __slots__ = FIELDS + ("_champ_index", "_index_lock", "_read_index")
+
+    def __init__(self, read_index, champ_index=None, **artifacts):
+        """
+        Parameters:
+        read_index (callable): read_index(champ_id_map, timings) reads the champion index
+        champ_index (faiss.Index, optional): The index, when already read
+        artifacts: One value per name in FIELDS
+        """
+        for name in self.FIELDS:
+            object.__setattr__(self, name, artifacts[name])
+        object.__setattr__(self, "_champ_index", champ_index)
+        object.__setattr__(self, "_index_lock", threading.Lock())
+        object.__setattr__(self, "_read_index", read_index)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("The engine state is immutable, load a new one instead.")
+
+    @property
+    def index_loaded(self):
+        return self._champ_index is not None
+
+    @property
+    def champ_index(self):
+        """
+        The champion faiss index, read (and faiss imported) on first use
+        """
+        if self._champ_index is None:
+            with self._index_lock:
+                if self._champ_index is None:
+                    index = self._read_index(self.champ_id_map, self.load_timings)
+                    object.__setattr__(self, "_champ_index", index)
+        return self._champ_index
+
+
+class RecommendationEngine:
+    """
+    Long-lived recommendation engine
+
+    Memory-maps the champion and item metadata files (names, costs, trait
+    table and embeddings) and loads the champion x item affinity once, so
+    each query only pays for the vector math. faiss and the champion index are only loaded
+    by the first synergy search, or up front by prewarm().
+
+    Results are cached by the sorted, case-normalized team, the query
+    parameters and the artifact version. The artifact files are checked
+    at most every check_interval seconds; when any of them was rewritten
+    the engine reloads and the cache is cleared.
+
+    Everything loaded lives in one EngineState, swapped by a single
+    assignment. Its fields can also be read off the engine, e.g.
+    engine.champ_id_map, which always gives the current state's.
+    """
+
+    def __init__(self, config, config_items, cache_config=None):
+        """
+        Parameters:
+        config (dict): The champion config from load_config()
+        config_items (dict): The item config from load_config_items()
+        cache_config (dict, optional): The result cache config. Defaults to load_cache_config().
+        """
+        self.config = config
+        self.config_items = config_items
+
+        cache_config = cache_config or load_cache_config()
+        self.cache = ResultCache(cache_config["max_size"], cache_config["ttl"])
+        self.check_interval = cache_config["check_interval"]
+        # Exact re-ranking depth for quantized indexes, see index_factory.search_index
+        self.rerank = load_search_config()["rerank"]
+        self.reload_lock = threading.Lock()
+        self.ready = False
+        self.state = None
+        self.load()
+
+    def __getattr__(self, name):
+        # Only called for names the engine itself lacks, i.e. the state fields
+        if name in EngineState.FIELDS or name == "champ_index":
+            return getattr(self.__dict__["state"], name)
+        raise AttributeError(f"{type(self).__name__!r} object has no attribute {name!r}")
+
+    def artifact_paths(self):
+        """
+        Returns the files the engine is loaded from
+
+        The affinity file is left out, it is rebuilt from the .npy files.
+        """
+        return [
+            self.config["champ_data_json"],
+            self.config["embeddings"],
+            metadata_path(self.config["embeddings"]),
+            metadata_path(self.config_items["i_embeddings"]),
+            id_map_path(self.config["embeddings"]),
+            vectors_path(self.config["embeddings"]),
+            trait_path(self.config["embeddings"]),
+            id_map_path(self.config_items["i_embeddings"]),
+            vectors_path(self.config_items["i_embeddings"]),
+        ]
+
+    def load(self):
+        """
+        Loads every artifact, replacing the engine state only once all loaded
+        """
+        version = artifact_version(self.artifact_paths())
+        config = self.config
+        config_items = self.config_items
+        timings = {}
+
+        # Falls back to the json / .npy / trait files without a metadata file
+        champ_meta = timed(
+            timings,
+            "champion_metadata",
+            index_metadata,
+            config["embeddings"],
+            config["champ_data_json"],
+        )
+        item_meta = timed(
+            timings, "item_metadata", index_metadata, config_items["i_embeddings"]
+        )
+        if champ_meta.costs is None or champ_meta.traits is None:
+            raise ValueError(
+                f"{metadata_path(config['embeddings'])} has no champion costs and traits."
+            )
+
+        artifacts = dict(
+            champion_data=champ_meta.champion_data(),
+            champ_id_map=champ_meta.id_map,
+            item_id_map=item_meta.id_map,
+            champ_vectors=champ_meta.vectors,
+            traits=champ_meta.traits,
+            costs=champ_meta.costs,
+            affinity=timed(
+                timings,
+                "affinity",
+                get_affinity,
+                affinity_path(config_items["i_embeddings"]),
+                vectors_path(config["embeddings"]),
+                vectors_path(config_items["i_embeddings"]),
+                config_items.get("affinity_cache"),
+            ),
+            champ_resolver=timed(
+                timings,
+                "champion_resolver",
+                NameResolver,
+                champ_meta.names,
+                load_aliases("champions"),
+            ),
+            item_resolver=timed(
+                timings, "item_resolver", NameResolver, item_meta.names, load_aliases("items")
+            ),
+            load_timings=timings,
+            version=version,
+        )
+        # A warm engine reloads its index right away, so it is checked against
+        # the new id map before the swap and the next search is not cold
+        champ_index = None
+        if self.state is not None and self.state.index_loaded:
+            champ_index = self.read_champ_index(champ_meta.id_map, timings)
+        self.state = EngineState(self.read_champ_index, champ_index, **artifacts)
+        self.checked = time.monotonic()
+
+    def read_champ_index(self, champ_id_map, timings):
+        """
+        Reads the champion faiss index and checks it against the id map
+        """
+        index = timed(
+            timings, "champion_index", synergy_builder.load_index, self.config["embeddings"]
+        )
+        if index.ntotal != len(champ_id_map):
+            raise ValueError(
+                f"{self.config['embeddings']} has {index.ntotal} rows but the id map has {len(champ_id_map)}."
+            )
+        return index
+
+    def prewarm(self):
+        """
+        Loads everything the first query would, so it is not slower than the rest
+
+        Imports faiss, reads the champion index, pages in the memory-mapped
+        embeddings and runs one search. Sets ready when done.
+        """
+        state = self.state
+        timings = state.load_timings
+        state.champ_index
+        timed(timings, "page_in_vectors", lambda: float(np.sum(state.champ_vectors)))
+        timed(
+            timings,
+            "first_search",
+            synergy_builder.recommend_batch,
+            state.champ_vectors,
+            state.champ_id_map,
+            state.champion_data,
+            state.champ_index,
+            [state.champ_id_map.names[:1]],
+        )
+        self.ready = True
+
+    def check_artifacts(self):
+        """
+        Reloads the engine and clears the cache when an artifact file changed
+        """
+        if time.monotonic() - self.checked < self.check_interval:
+            return
+
+        with self.reload_lock:
+            if time.monotonic() - self.checked < self.check_interval:
+                return
+            self.checked = time.monotonic()
+            if artifact_version(self.artifact_paths()) == self.state.version:
+                return
+
+            try:
+                self.load()
+            except Exception as e:
+                print(f"Could not reload the changed artifacts, keeping the loaded ones: {e}")
+                return
+            self.cache.clear()
+
+    def current_state(self):
+        """
+        Returns the state a query should use, reloading first when an artifact changed
+        """
+        self.check_artifacts()
+        return self.state
+
+    def canonical_team(self, champion_names, state=None):
+        """
+        Returns the team as sorted id map names, or None for unknown champions
+
+        Names are matched by their normalized key or an alias, never fuzzily,
+        so a typo is reported instead of silently answering another team.
+        """
+        state = state or self.state
+        team = [state.champ_resolver.exact(name) for name in champion_names]
+        if not team or None in team:
+            return None
+        return tuple(sorted(team))
+
+    def cached_batch(self, state, kind, teams, params, compute):
+        """
+        Answers teams from the result cache, computing the misses in one batch
+
+        Parameters:
+        state (EngineState): The state the whole batch is answered from
+        kind (str): The kind of result, part of the cache key
+        teams (list): The teams, each a list of champion names
+        params (tuple): The hashable query parameters, part of the cache key
+        compute (callable): compute(teams) returns one result per canonical team
+
+        Returns:
+        list: One cached or computed result per team, None for unknown champions
+        """
+        results = [None] * len(teams)
+        missing = {}
+        with tracing.span(f"engine.{kind}.cache", teams=len(teams)) as lookup:
+            for position, team in enumerate(teams):
+                team = self.canonical_team(team, state)
+                if team is None:
+                    continue
+                key = (kind, team, params, state.version)
+                cached = self.cache.get(key)
+                if cached is None:
+                    missing.setdefault(key, []).append(position)
+                else:
+                    results[position] = cached
+            lookup.set(misses=len(missing))
+
+        if missing:
+            keys = list(missing)
+            for key, result in zip(keys, compute([list(key[1]) for key in keys])):
+                self.cache.put(key, result)
+                for position in missing[key]:
+                    results[position] = result
+
+        return results
+
+    @classmethod
+    def from_env(cls):
+        """
+        Builds an engine from the paths configured in the environment / .env
+        """
+        return cls(item_builder.load_config(), item_builder.load_config_items())
+
+    def query_key(self, query, state=None):
+        """
+        Checks the query options and returns them as a cache key part
+
+        Weights are keyed by the resolved champion name, so {"ahri": 2}
+        weights Ahri, and the options are spelled out with their defaults.
+        """
+        state = state or self.state
+        options = query_options(query)
+        options["weights"] = {
+            state.champ_resolver.exact(name) or name: weight
+            for name, weight in options["weights"].items()
+        }
+        return options, json.dumps(options, sort_keys=True)
+
+    def synergies(self, champion_names, top_k_champs=15, filters=None, query=None):
+        """
+        Recommends synergistic champions for the selected champions
+
+        Parameters:
+        champion_names (list): The selected champion names
+        top_k_champs (int, optional): The number of champions sorted by cost. Defaults to 15.
+        filters (dict, optional): Cost / trait filters, see builders.filters.filter_mask
+        query (dict, optional): How the team is combined into a search, see query_options
+
+        Returns:
+        tuple: The top champions by cost and by distance, or None for unknown champions
+        """
+        result = self.synergies_batch(
+            [champion_names], top_k_champs, filters=filters, query=query
+        )[0]
+        if result is None:
+            print("Make sure you enter a champ from the recent set.")
+        return result
+
+    def synergies_batch(
+        self, teams, top_k_champs=15, top_k_distance=10, filters=None, query=None
+    ):
+        """
+        Recommends synergistic champions for many teams with one faiss call
+
+        Parameters:
+        teams (list): The teams, each a list of champion names
+        top_k_champs (int, optional): The number of champions sorted by cost. Defaults to 15.
+        top_k_distance (int, optional): The number of champions sorted by distance. Defaults to 10.
+        filters (dict, optional): Cost / trait filters shared by every team
+        query (dict, optional): How each team is combined into a search, see query_options
+
+        Returns:
+        list: One (by cost, by distance) tuple per team, or None for teams with unknown champions
+        """
+        state = self.current_state()
+        check_count("top_k_champs", top_k_champs, len(state.champ_id_map))
+        check_count("top_k_distance", top_k_distance, len(state.champ_id_map))
+        options, options_key = self.query_key(query, state)
+        if filters:
+            filters = resolve_filters(filters, state.champ_resolver, state.traits)
+
+        def compute(canonical_teams):
+            results = synergy_builder.recommend_batch(
+                state.champ_vectors,
+                state.champ_id_map,
+                state.champion_data,
+                state.champ_index,
+                canonical_teams,
+                top_k_champs,
+                top_k_distance,
+                filters,
+                state.traits,
+                options,
+                self.rerank,
+            )
+            return [(tuple(by_cost), tuple(by_distance)) for by_cost, by_distance in results]
+
+        params = (
+            top_k_champs,
+            top_k_distance,
+            json.dumps(filters or {}, sort_keys=True),
+            options_key,
+        )
+        return [
+            None if result is None else (list(result[0]), list(result[1]))
+            for result in self.cached_batch(state, "synergies", teams, params, compute)
+        ]
+
+    def items(self, champion_names, top_k_items=15, query=None):
+        """
+        Recommends items for the selected champions
+
+        Parameters:
+        champion_names (list): The selected champion names
+        top_k_items (int, optional): The number of items to return. Defaults to 15.
+        query (dict, optional): How the champions are combined, see query_options
+
+        Returns:
+        list: The names of the top items
+        """
+        return self.items_batch([champion_names], top_k_items, query)[0]
+
+    def items_batch(self, teams, top_k_items=15, query=None):
+        """
+        Recommends items for many teams from the affinity matrix
+
+        Parameters:
+        teams (list): The teams, each a list of champion names
+        top_k_items (int, optional): The number of items per team. Defaults to 15.
+        query (dict, optional): How each team's champions are combined, see query_options
+
+        Returns:
+        list: The top item names per team, or None for teams with unknown champions
+        """
+        state = self.current_state()
+        check_count("top_k_items", top_k_items, len(state.item_id_map))
+        options, options_key = self.query_key(query, state)
+
+        def compute(canonical_teams):
+            results = item_builder.recommend_batch(
+                state.affinity,
+                state.champ_id_map,
+                state.item_id_map,
+                canonical_teams,
+                top_k_items,
+                options,
+                state.champion_data,
+            )
+            return [tuple(items) for items in results]
+
+        params = (top_k_items, options_key)
+        return [
+            None if result is None else list(result)
+            for result in self.cached_batch(state, "items", teams, params, compute)
+        ]
+
+    def compose(self, champion_names, board_size=8, gold_budget=None, top_n=5):
+        """
+        Completes the selected champions to full boards
+
+        Parameters:
+        champion_names (list): The selected champion names
+        board_size (int, optional): The number of units on the final board. Defaults to 8.
+        gold_budget (int, optional): The most gold the added champions may cost. Defaults to None.
+        top_n (int, optional): The number of boards to return. Defaults to 5.
+
+        Returns:
+        list: Dicts with the added champions, the board, its score, cost and active traits,
+        or None for unknown champions
+        """
+        state = self.current_state()
+        if self.canonical_team(champion_names, state) is None:
+            print("Make sure you enter a champ from the recent set.")
+            return None
+        champion_names = [state.champ_resolver.exact(name) for name in champion_names]
+
+        def compute(canonical_teams):
+            results = []
+            for team in canonical_teams:
+                queries, _ = synergy_builder.team_queries(
+                    state.champ_vectors, state.champ_id_map, [team]
+                )
+                team_rows = [state.champ_id_map.rows[name] for name in team]
+                boards = composition.compose(
+                    team_rows,
+                    state.champ_vectors @ queries[0],
+                    state.costs,
+                    state.traits,
+                    board_size,
+                    gold_budget,
+                    top_n,
+                )
+                results.append(
+                    [
+                        (
+                            [state.champ_id_map.names[row] for row in added],
+                            score,
+                            cost,
+                            state.traits.active(counts),
+                        )
+                        for added, score, cost, counts in boards
+                    ]
+                )
+            return results
+
+        # Cached like the synergies, so an app rerun does not search the boards again
+        params = (board_size, gold_budget, top_n)
+        boards = self.cached_batch(state, "compose", [champion_names], params, compute)[0]
+        selected = list(dict.fromkeys(champion_names))
+        return [
+            {
+                "champions": list(added_names),
+                "board": selected + added_names,
+                "score": score,
+                "cost": cost,
+                "traits": dict(traits),
+            }
+            for added_names, score, cost, traits in boards
+        ]
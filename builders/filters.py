@@ -0,0 +1,123 @@
+#filters.py
+import numpy as np
+from builders.name_resolver import normalize_name
+
+# Recognized keys of a filters dict
+FILTER_KEYS = (
+    "min_cost",
+    "max_cost",
+    "required_traits",
+    "excluded_traits",
+    "share_trait_with",
+    "excluded_champions",
+)
+CHAMPION_FILTERS = ("share_trait_with", "excluded_champions")
+TRAIT_FILTERS = ("required_traits", "excluded_traits")
+
+
+def resolve_filters(filters, champ_resolver, traits=None):
+    """
+    Returns the filters with every champion and trait name spelled as in the artifacts
+
+    Champion names are matched like team names, by the resolver's exact
+    lookup (case, punctuation and aliases, never fuzzily), and trait names
+    by their normalized form, so "ahri" and "kaisa" work. An unknown name
+    raises instead of being ignored, so a typo is reported rather than
+    answered unfiltered.
+
+    Parameters:
+    filters (dict): The filters, see filter_mask
+    champ_resolver (NameResolver): The resolver of the champion id map
+    traits (TraitTable, optional): Required by the trait filters
+
+    Returns:
+    dict: The filters with the canonical names
+    """
+    if not isinstance(filters, dict):
+        raise ValueError("filters must be a JSON object.")
+    unknown = set(filters) - set(FILTER_KEYS)
+    if unknown:
+        raise ValueError(f"Unknown filters: {', '.join(sorted(map(str, unknown)))}.")
+
+    resolved = dict(filters)
+    for key in CHAMPION_FILTERS + TRAIT_FILTERS:
+        names = filters.get(key)
+        if names is None:
+            continue
+        if not isinstance(names, list) or not all(isinstance(name, str) for name in names):
+            raise ValueError(f"{key} must be a list of names.")
+        if key in CHAMPION_FILTERS:
+            found = [champ_resolver.exact(name) for name in names]
+            kind = "champions"
+        else:
+            if traits is None and names:
+                raise ValueError("Trait filters need the trait table.")
+            keys = {normalize_name(name): name for name in traits.names} if traits else {}
+            found = [keys.get(normalize_name(name)) for name in names]
+            kind = "traits"
+        missing = [name for name, match in zip(names, found) if match is None]
+        if missing:
+            raise ValueError(f"Unknown {kind} in {key}: {', '.join(missing)}.")
+        resolved[key] = found
+    return resolved
+
+
+def filter_mask(filters, id_map, costs, traits=None):
+    """
+    Builds the boolean mask of the champions that pass the filters
+
+    Names must be spelled as in the id map and trait table, see resolve_filters.
+
+    Parameters:
+    filters (dict): Any of
+        min_cost / max_cost (int): The inclusive cost range
+        required_traits (list): Champions must have at least one of these traits
+        excluded_traits (list): Champions must have none of these traits
+        share_trait_with (list): Champions must share a trait with one of these champions
+        excluded_champions (list): Champions that are never returned
+    id_map (IdMap): The row/name lookup of the champion index
+    costs (np.array): The cost of every champion row
+    traits (TraitTable, optional): Required by the trait filters
+
+    Returns:
+    np.array: The (n,) mask, True for the rows that may be returned
+    """
+    unknown = set(filters) - set(FILTER_KEYS)
+    if unknown:
+        raise ValueError(f"Unknown filters: {', '.join(sorted(unknown))}.")
+
+    allowed = np.ones(len(id_map), dtype=bool)
+
+    if filters.get("min_cost") is not None:
+        allowed &= costs >= filters["min_cost"]
+    if filters.get("max_cost") is not None:
+        allowed &= costs <= filters["max_cost"]
+
+    trait_filters = ("required_traits", "excluded_traits", "share_trait_with")
+    if any(filters.get(key) for key in trait_filters):
+        if traits is None:
+            raise ValueError("Trait filters need the trait table.")
+        for key in ("required_traits", "excluded_traits"):
+            unknown = [name for name in filters.get(key) or () if name not in traits.ids]
+            if unknown:
+                raise ValueError(f"Unknown traits: {', '.join(unknown)}.")
+        unknown = [name for name in filters.get("share_trait_with") or () if name not in id_map]
+        if unknown:
+            raise ValueError(f"Unknown champions: {', '.join(unknown)}.")
+        if filters.get("required_traits"):
+            allowed &= traits.rows_with_any(filters["required_traits"])
+        if filters.get("excluded_traits"):
+            allowed &= ~traits.rows_with_any(filters["excluded_traits"])
+        if filters.get("share_trait_with"):
+            shared = np.bitwise_or.reduce(
+                traits.masks[[id_map.rows[name] for name in filters["share_trait_with"]]]
+            )
+            allowed &= (traits.masks & shared) != 0
+
+    unknown = [name for name in filters.get("excluded_champions") or () if name not in id_map]
+    if unknown:
+        raise ValueError(f"Unknown champions: {', '.join(unknown)}.")
+    for name in filters.get("excluded_champions") or ():
+        allowed[id_map.rows[name]] = False
+
+    return allowed
@@ -0,0 +1,81 @@
+#id_map.py
+import os
+import json
+from builders.atomic import replacing
+
+# Bump when the on-disk layout of the id map changes
+ID_MAP_VERSION = 1
+
+
+class IdMap:
+    """
+    Maps faiss rows to names and names back to faiss rows
+    """
+
+    def __init__(self, names):
+        self.names = list(names)
+        self.rows = {name: row for row, name in enumerate(self.names)}
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.rows
+
+
+def id_map_path(index_path):
+    """
+    Returns the id map path stored alongside a faiss index
+
+    Parameters:
+    index_path (str): The path to the faiss index, e.g. embeddings/champs.faiss
+
+    Returns:
+    str: The id map path, e.g. embeddings/champs.ids.json
+    """
+    return os.path.splitext(index_path)[0] + ".ids.json"
+
+
+def save_id_map(names, file_name):
+    """
+    Saves the names in faiss row order, replacing the file at once
+
+    Parameters:
+    names (list): The names, where names[i] is the vector at faiss row i
+    file_name (str): The path to the id map file
+    """
+    with replacing(file_name) as temp_name, open(temp_name, "w") as f:
+        json.dump(
+            {"version": ID_MAP_VERSION, "count": len(names), "names": list(names)},
+            f,
+            indent=4,
+        )
+
+
+def load_id_map(file_name, index=None):
+    """
+    Loads an id map and checks it against its faiss index
+
+    Parameters:
+    file_name (str): The path to the id map file
+    index (faiss.Index, optional): The index the map belongs to
+
+    Returns:
+    IdMap: The loaded id map
+    """
+    with open(file_name, "r") as f:
+        data = json.load(f)
+
+    if data.get("version") != ID_MAP_VERSION:
+        raise ValueError(
+            f"{file_name} has id map version {data.get('version')}, expected {ID_MAP_VERSION}."
+        )
+    if len(data["names"]) != data["count"]:
+        raise ValueError(f"{file_name} is truncated.")
+    if index is not None and index.ntotal != data["count"]:
+        raise ValueError(
+            f"{file_name} has {data['count']} rows but the index has {index.ntotal}."
+        )
+
+    return IdMap(data["names"])
+
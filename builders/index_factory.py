@@ -0,0 +1,237 @@
+#index_factory.py
+import os
+import numpy as np
+from dotenv import load_dotenv
+from builders.atomic import replacing
+
+# faiss is imported by the functions that use it, so importing this module
+# stays cheap until the first index is built or searched
+
+INDEX_TYPES = ("flat", "hnsw", "ivf", "sq8", "pq")
+# Dimensions per product quantizer sub-vector when PQ_M is 0
+PQ_SUBVECTOR_DIM = 16
+
+
+def load_index_config():
+    load_dotenv()
+    return {
+        "index_type": os.getenv("INDEX_TYPE", "flat"),
+        "hnsw_m": int(os.getenv("HNSW_M", 32)),
+        "hnsw_ef_search": int(os.getenv("HNSW_EF_SEARCH", 64)),
+        "ivf_nlist": int(os.getenv("IVF_NLIST", 0)),
+        "ivf_nprobe": int(os.getenv("IVF_NPROBE", 8)),
+        "pq_m": int(os.getenv("PQ_M", 0)),
+        "pq_nbits": int(os.getenv("PQ_NBITS", 8)),
+    }
+
+
+def load_search_config():
+    load_dotenv()
+    return {
+        "rerank": int(os.getenv("INDEX_RERANK", 0)),
+    }
+
+
+def normalize(vectors):
+    """
+    L2-normalizes vectors, so inner product ranks by cosine similarity
+
+    Parameters:
+    vectors (np.array): The (n, d) vectors, or one (d,) vector
+
+    Returns:
+    np.array: A normalized float32 copy with the same shape
+    """
+    import faiss
+
+    normalized = np.array(vectors, dtype=np.float32, order="C", ndmin=2)
+    faiss.normalize_L2(normalized)
+    return normalized.reshape(np.shape(vectors))
+
+
+def build_index(
+    vectors,
+    index_type="flat",
+    hnsw_m=32,
+    hnsw_ef_search=64,
+    ivf_nlist=0,
+    ivf_nprobe=8,
+    pq_m=0,
+    pq_nbits=8,
+):
+    """
+    Builds an inner product faiss index from a normalized matrix in one add
+
+    "sq8" stores every dimension as one byte. "pq" stores pq_m codes of
+    pq_nbits each per vector, in a single inverted list, so every code is
+    scanned and the id selectors of filtered searches work.
+
+    Parameters:
+    vectors (np.array): The (n, d) normalized float32 vectors, row i becomes id i
+    index_type (str, optional): One of INDEX_TYPES. Defaults to "flat".
+    hnsw_m (int, optional): Graph neighbours per node for "hnsw". Defaults to 32.
+    hnsw_ef_search (int, optional): Search queue size for "hnsw". Defaults to 64.
+    ivf_nlist (int, optional): Number of lists for "ivf", 0 picks sqrt(n). Defaults to 0.
+    ivf_nprobe (int, optional): Lists visited per query for "ivf". Defaults to 8.
+    pq_m (int, optional): Sub-quantizers for "pq", 0 picks d / 16. Defaults to 0.
+    pq_nbits (int, optional): Bits per "pq" code, lowered to fit the training rows. Defaults to 8.
+
+    Returns:
+    faiss.Index: The populated index
+    """
+    import faiss
+
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    dimension = vectors.shape[1]
+
+    if index_type == "flat":
+        index = faiss.IndexFlatIP(dimension)
+    elif index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dimension, hnsw_m, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efSearch = hnsw_ef_search
+    elif index_type == "ivf":
+        nlist = ivf_nlist or max(1, int(np.sqrt(len(vectors))))
+        quantizer = faiss.IndexFlatIP(dimension)
+        index = faiss.IndexIVFFlat(
+            quantizer, dimension, nlist, faiss.METRIC_INNER_PRODUCT
+        )
+        index.train(vectors)
+        index.nprobe = min(ivf_nprobe, nlist)
+    elif index_type == "sq8":
+        index = faiss.IndexScalarQuantizer(
+            dimension, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_INNER_PRODUCT
+        )
+        index.train(vectors)
+    elif index_type == "pq":
+        if not pq_m:
+            # The most sub-quantizers that leave PQ_SUBVECTOR_DIM dimensions each
+            subvector = min(PQ_SUBVECTOR_DIM, dimension)
+            pq_m = max(m for m in range(1, dimension // subvector + 1) if dimension % m == 0)
+        if dimension % pq_m:
+            raise ValueError(f"PQ_M {pq_m} does not divide the dimension {dimension}.")
+        # k-means needs at least as many training rows as centroids
+        nbits = max(1, min(pq_nbits, int(np.log2(len(vectors)))))
+        quantizer = faiss.IndexFlatIP(dimension)
+        index = faiss.IndexIVFPQ(
+            quantizer, dimension, 1, pq_m, nbits, faiss.METRIC_INNER_PRODUCT
+        )
+        index.train(vectors)
+        index.nprobe = 1
+    else:
+        raise ValueError(
+            f"Unknown index type {index_type!r}, expected one of {INDEX_TYPES}."
+        )
+
+    index.add(vectors)
+    return index
+
+
+def save_index(index, file_name):
+    """
+    Save a Faiss index to a file, replacing the file at once.
+    """
+    import faiss
+
+    with replacing(file_name) as temp_name:
+        faiss.write_index(index, temp_name)
+
+
+def search_params(index, selector=None):
+    """
+    Builds search parameters that keep the index's own search settings
+
+    faiss replaces nprobe / efSearch with its defaults when parameters are
+    passed, so they are copied over from the loaded index.
+
+    Parameters:
+    index (faiss.Index): The index the parameters are for
+    selector (faiss.IDSelector, optional): Restricts the ids that can be returned
+
+    Returns:
+    faiss.SearchParameters: The parameters matching the index type
+    """
+    import faiss
+
+    if isinstance(index, faiss.IndexHNSW):
+        params = faiss.SearchParametersHNSW(efSearch=index.hnsw.efSearch)
+    elif isinstance(index, faiss.IndexIVF):
+        params = faiss.SearchParametersIVF(nprobe=index.nprobe)
+    else:
+        params = faiss.SearchParameters()
+
+    if selector is not None:
+        params.sel = selector
+        # The python wrapper does not keep the selector alive on its own
+        params.referenced_objects = [selector]
+    return params
+
+
+def allowed_params(index, allowed):
+    """
+    Builds search parameters that only return the allowed index rows
+
+    Parameters:
+    index (faiss.Index): The index the parameters are for
+    allowed (np.array): The (n,) boolean mask of rows that may be returned
+
+    Returns:
+    faiss.SearchParameters: Parameters with a bitmap id selector
+    """
+    import faiss
+
+    bitmap = np.packbits(np.asarray(allowed, dtype=bool), bitorder="little")
+    params = search_params(index, faiss.IDSelectorBitmap(bitmap))
+    params.referenced_objects.append(bitmap)
+    return params
+
+
+def rerank_exact(queries, ids, vectors, k):
+    """
+    Re-scores index candidates against the exact vectors and keeps the best k
+
+    Parameters:
+    queries (np.array): The (B, d) normalized queries
+    ids (np.array): The (B, K) candidate rows from an index search, -1 for none
+    vectors (np.array): The (n, d) normalized embeddings in index row order
+    k (int): The results to keep per query
+
+    Returns:
+    tuple: (scores, ids) shaped (B, k) and best first, -inf / -1 past the candidates
+    """
+    scores = np.full(ids.shape, -np.inf, dtype=np.float32)
+    for row, (query, candidates) in enumerate(zip(queries, ids)):
+        valid = candidates >= 0
+        scores[row, valid] = np.asarray(vectors)[candidates[valid]] @ query
+    order = np.argsort(-scores, axis=1, kind="stable")[:, :k]
+    scores = np.take_along_axis(scores, order, axis=1)
+    ids = np.take_along_axis(ids, order, axis=1)
+    ids[~np.isfinite(scores)] = -1
+    return scores, ids
+
+
+def search_index(index, queries, k, params=None, vectors=None, rerank=0):
+    """
+    Searches an index, re-ranking rerank * k candidates exactly when asked
+
+    A quantized index only approximates the scores, so its k best codes
+    can miss a true neighbour. Fetching a few times more candidates and
+    scoring them against the float32 vectors recovers most of the exact
+    ranking for a small gather per query. The engine passes the index's
+    memory-mapped .npy matrix, the only copy of the floats, so only the
+    gathered rows are paged in.
+
+    Parameters:
+    index (faiss.Index): The index to search
+    queries (np.array): The (B, d) normalized queries
+    k (int): The results per query
+    params (faiss.SearchParameters, optional): E.g. an allowed-rows selector
+    vectors (np.array, optional): The exact embeddings, required to re-rank
+    rerank (int, optional): Candidates fetched per result, 0 or 1 to skip. Defaults to 0.
+
+    Returns:
+    tuple: (scores, ids) like index.search
+    """
+    if rerank <= 1 or vectors is None:
+        return index.search(queries, k, params=params)
+    _, ids = index.search(queries, k * rerank, params=params)
+    return rerank_exact(queries, ids, vectors, k)
@@ -1,13 +1,26 @@
 #item_builder.py
 import os
-import json
-import pickle
-import numpy as np
-import faiss
 from dotenv import load_dotenv
+from builders import tracing
+from builders.bundles import set_configs
+from builders.affinity import affinity_path, get_affinity
+from builders.metadata import index_metadata
+from builders.name_resolver import NameResolver, load_aliases, split_names
+from builders.query_composer import is_default, query_options, team_weights
+from builders.vector_store import vectors_path
 
 
-def load_config():
+@tracing.traced("item.load_config")
+def load_config(set_name=None, patch=None):
+    """
+    Returns the .env artifact paths, or those of a set's bundle
+
+    Parameters:
+    set_name (str, optional): Read the bundle of this set, e.g. "set11"
+    patch (str, optional): The bundle patch. Defaults to the latest one.
+    """
+    if set_name:
+        return set_configs(set_name, patch)[0]
     load_dotenv()
     return {
         "champ_data_pkl": os.getenv("CHAMP_DATA_PKL"),
@@ -16,7 +29,17 @@ def load_config():
     }
 
 
-def load_config_items():
+@tracing.traced("item.load_config")
+def load_config_items(set_name=None, patch=None):
+    """
+    Returns the .env artifact paths, or those of a set's bundle
+
+    Parameters:
+    set_name (str, optional): Read the bundle of this set, e.g. "set11"
+    patch (str, optional): The bundle patch. Defaults to the latest one.
+    """
+    if set_name:
+        return set_configs(set_name, patch)[1]
     load_dotenv()
     return {
         "item_data_pkl": os.getenv("ITEM_DATA_PKL"),
@@ -25,101 +48,105 @@ def load_config_items():
     }
 
 
-def load_pickle_data(file_name):
-    """
-    Loads data from a pickle file
-
-    Parameters:
-    file_name (str): The path to the pickle file
-
-    Returns:
-    dict: The loaded data
-    """
-    try:
-        with open(file_name, "rb") as f:
-            return pickle.load(f)
-    except FileNotFoundError:
-        print(f"The file {file_name} was not found.")
-    except Exception as e:
-        print(f"An error occurred: {e}")
-        return None
-
-
-def load_json_data(file_name):
+def recommend_batch(
+    affinity,
+    champ_id_map,
+    item_id_map,
+    teams,
+    top_k_items=15,
+    query=None,
+    champion_data=None,
+):
     """
-    Loads data from a json file
+    Recommends items for many teams from the precomputed affinity matrix
 
     Parameters:
-    file_name (str): The path to the json file
+    affinity (Affinity): The champion x item affinity
+    champ_id_map (IdMap): The row/name lookup of the champion index
+    item_id_map (IdMap): The row/name lookup of the item index
+    teams (list): The teams, each a list of champion names
+    top_k_items (int, optional): The number of items per team. Defaults to 15.
+    query (dict, optional): How each team's champions are combined, see query_options
+    champion_data (dict, optional): The champion data with 'cost', for the cost weighting
 
     Returns:
-    dict: The loaded data
+    list: The top item names per team, or None for teams with unknown champions
     """
-    try:
-        with open(file_name, "r") as f:
-            return json.load(f)
-    except FileNotFoundError:
-        print(f"The file {file_name} was not found.")
-    except Exception as e:
-        print(f"An error occurred: {e}")
-        return None
-
-
-def search(
-    query_embedding,
-    index_path,
-    embeddings,
-    top_k=15,
+    options = query_options(query)
+    fusion = options["fusion"] if options["mode"] == "multi" else None
+
+    results = []
+    with tracing.span("item.rank", teams=len(teams), k=top_k_items):
+        for team in teams:
+            if not team or any(name not in champ_id_map for name in team):
+                results.append(None)
+                continue
+            rows = [champ_id_map.rows[name] for name in team]
+            weights = None if is_default(options) else team_weights(team, options, champion_data)
+            ranked = affinity.rank(rows, top_k_items, weights, fusion, options["rrf_k"])
+            results.append([item_id_map.names[i] for i in ranked])
+    return results
+
+
+def recommend(
+    affinity,
+    champ_id_map,
+    item_id_map,
+    champion_names,
+    top_k_items=15,
+    query=None,
+    champion_data=None,
 ):
     """
-    Search for the top_k nearest neighbors to the query_embedding
+    Recommends items for the selected champions from already loaded artifacts
 
     Parameters:
-    query_embedding (np.array): The embedding of the query
-    index_path (str): The path to the faiss index
-    embeddings (dict): The embeddings dictionary
-    top_k (int, optional): The number of nearest neighbors to return. Defaults to 10.
+    affinity (Affinity): The champion x item affinity
+    champ_id_map (IdMap): The row/name lookup of the champion index
+    item_id_map (IdMap): The row/name lookup of the item index
+    champion_names (list): The selected champion names
+    top_k_items (int, optional): The number of items to return. Defaults to 15.
+    query (dict, optional): How the champions are combined, see query_options
+    champion_data (dict, optional): The champion data with 'cost', for the cost weighting
 
     Returns:
-    list: The names of the top_k nearest neighbors in the embeddings
+    list: The names of the top items
     """
-    index = faiss.read_index(index_path)
-
-    # faiss requires the query to be a 2D array
-    query = np.array([query_embedding])
-    _, nearest_indices = index.search(query, top_k)
-    print(_)
-    nearest_items = [list(embeddings.keys())[i] for i in nearest_indices[0]]
-
-    return nearest_items[:top_k]
+    return recommend_batch(
+        affinity,
+        champ_id_map,
+        item_id_map,
+        [champion_names],
+        top_k_items,
+        query,
+        champion_data,
+    )[0]
 
 
 def main(config, config_items, champion_names, top_k_items=15):
-    champ_data_pkl = load_pickle_data(config["champ_data_pkl"])
-    queries = [
-        champ_data_pkl["embeddings"][champion_name] for champion_name in champion_names
-    ]
-    avg_query = np.mean(queries, axis=0)
-
-    item_data_pkl = load_pickle_data(config_items["item_data_pkl"])
-    original_item_data = load_json_data(config_items["item_data_json"])
-
-    top_items = search(
-        avg_query,
-        config_items["i_embeddings"],
-        item_data_pkl["embeddings"],
-        top_k_items,
-    )
-
-    return top_items
-    #print(f"\nTop Items: {top_items}\n")
+    with tracing.span("item.load_metadata"):
+        champ_id_map = index_metadata(config["embeddings"], config["champ_data_json"]).id_map
+        item_id_map = index_metadata(config_items["i_embeddings"]).id_map
+    with tracing.span("item.resolve_names"):
+        resolver = NameResolver(champ_id_map.names, load_aliases("champions"))
+        champion_names = resolver.resolve_all(champion_names)
+    with tracing.span("item.load_affinity"):
+        affinity = get_affinity(
+            affinity_path(config_items["i_embeddings"]),
+            vectors_path(config["embeddings"]),
+            vectors_path(config_items["i_embeddings"]),
+            config_items.get("affinity_cache"),
+        )
+
+    return recommend(affinity, champ_id_map, item_id_map, champion_names, top_k_items)
 
 
 if __name__ == "__main__":
-    champion_names = input(
-        "Please enter the champion names separated by comma: "
-    ).split(", ")
+    champion_names = split_names(
+        input("Please enter the champion names separated by comma: ")
+    )
 
+    tracing.configure()
     config = load_config()
     config_items = load_config_items()
     main(config, config_items, champion_names)
@@ -0,0 +1,365 @@
+#metadata.py
+import os
+import json
+import mmap
+import zlib
+import hashlib
+import struct
+import numpy as np
+from builders.atomic import replacing
+from builders.id_map import IdMap, id_map_path, load_id_map
+from builders.traits import TraitTable, build_trait_table, load_trait_table, trait_path
+from builders.vector_store import load_vectors, vectors_path
+
+# Bump when the layout of the metadata file changes
+METADATA_VERSION = 3
+METADATA_MAGIC = b"TFTMETA\x00"
+# magic, version, section count, rows, traits, dim, strings, crc32, file size and the
+# sha256 of the source files. The crc32 covers the section table and every section.
+# The vectors are not stored here but memory-mapped from the index's .npy matrix,
+# which must be (rows, dim)
+HEADER = struct.Struct("<8sHHIIIIIQ32s")
+# kind, item size, offset, item count
+SECTION = struct.Struct("<IIQQ")
+# Every section starts on a 64 byte boundary
+ALIGNMENT = 64
+# The sections in file order. The strings are the row names, then the trait names
+SECTIONS = (
+    ("string_offsets", np.dtype("<u4")),
+    ("strings", np.dtype("u1")),
+    ("costs", np.dtype("<i4")),
+    ("breakpoint_offsets", np.dtype("<u4")),
+    ("breakpoints", np.dtype("<i4")),
+    ("trait_masks", np.dtype("<u8")),
+)
+METADATA_SUFFIX = ".meta.bin"
+
+
+def metadata_path(index_path):
+    """
+    Returns the binary metadata path stored alongside a faiss index
+
+    Parameters:
+    index_path (str): The path to the faiss index, e.g. embeddings/champs.faiss
+
+    Returns:
+    str: The metadata path, e.g. embeddings/champs.meta.bin
+    """
+    return os.path.splitext(index_path)[0] + METADATA_SUFFIX
+
+
+class Metadata:
+    """
+    Everything the query path needs about the rows of one index
+
+    The row names, their costs and trait table (champions only) and the
+    embedding matrix in faiss row order. Loaded from a metadata file, the
+    arrays are read-only views into its memory map, and the vectors are the
+    memory-mapped .npy matrix of the index.
+    """
+
+    def __init__(
+        self, names, vectors, costs=None, trait_names=(), breakpoints=(), masks=None, sources=b""
+    ):
+        self.id_map = IdMap(names)
+        # The source_digest of the files this was built from, empty when unknown
+        self.sources = sources
+        self.names = self.id_map.names
+        self.vectors = vectors
+        self.costs = costs
+        self.traits = None
+        if len(trait_names):
+            self.traits = TraitTable(trait_names, breakpoints, masks, self.names)
+
+    def champion_data(self):
+        """
+        Returns {name: {"cost": cost}}, the part of the champion json the builders read
+        """
+        if self.costs is None:
+            raise ValueError("The metadata has no costs.")
+        return {name: {"cost": int(cost)} for name, cost in zip(self.names, self.costs)}
+
+
+def source_digest(index_path, data_json=None):
+    """
+    Returns the sha256 over the files the metadata of an index is built from
+
+    That is the id map and, for champions, the champion json and the trait
+    table. A metadata file whose digest differs is stale.
+
+    Parameters:
+    index_path (str): The path to the faiss index
+    data_json (str, optional): The champion json
+
+    Returns:
+    bytes: The 32 byte digest
+    """
+    digest = hashlib.sha256()
+    files = [id_map_path(index_path)]
+    if data_json:
+        files += [data_json, trait_path(index_path)]
+    for file_name in files:
+        if os.path.exists(file_name):
+            with open(file_name, "rb") as f:
+                digest.update(hashlib.sha256(f.read()).digest())
+        else:
+            digest.update(b"missing")
+    return digest.digest()
+
+
+def aligned(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def save_metadata(metadata, file_name):
+    """
+    Writes the metadata as one binary file, replacing any previous one at once
+
+    The vectors are only checked for their shape, they stay in the .npy file.
+
+    Parameters:
+    metadata (Metadata): The names, costs and traits to write
+    file_name (str): The path to the metadata file
+    """
+    rows = len(metadata.names)
+    shape = np.shape(metadata.vectors)
+    if len(shape) != 2 or shape[0] != rows:
+        raise ValueError(f"Expected a ({rows}, d) vector matrix, got {shape}.")
+
+    traits = metadata.traits
+    trait_names = traits.names if traits else []
+    breakpoints = traits.breakpoints if traits else []
+    encoded = [name.encode("utf-8") for name in list(metadata.names) + trait_names]
+    arrays = {
+        "string_offsets": np.cumsum([0] + [len(name) for name in encoded]),
+        "strings": np.frombuffer(b"".join(encoded), dtype=np.uint8),
+        "costs": [] if metadata.costs is None else metadata.costs,
+        "breakpoint_offsets": np.cumsum([0] + [len(points) for points in breakpoints])
+        if traits
+        else [],
+        "breakpoints": [point for points in breakpoints for point in points],
+        "trait_masks": traits.masks if traits else [],
+    }
+
+    table_end = HEADER.size + SECTION.size * len(SECTIONS)
+    offset = aligned(table_end)
+    entries, blocks = [], []
+    for kind, (name, dtype) in enumerate(SECTIONS):
+        data = np.ascontiguousarray(arrays[name], dtype=dtype)
+        entries.append(SECTION.pack(kind, dtype.itemsize, offset, data.size))
+        blocks.append((offset, data.tobytes()))
+        offset = aligned(offset + data.nbytes)
+
+    body = bytearray(offset - HEADER.size)
+    body[: table_end - HEADER.size] = b"".join(entries)
+    for start, data in blocks:
+        body[start - HEADER.size : start - HEADER.size + len(data)] = data
+    header = HEADER.pack(
+        METADATA_MAGIC,
+        METADATA_VERSION,
+        len(SECTIONS),
+        rows,
+        len(trait_names),
+        shape[1],
+        len(encoded),
+        zlib.crc32(body),
+        offset,
+        metadata.sources,
+    )
+
+    with replacing(file_name) as temp_name, open(temp_name, "wb") as f:
+        f.write(header)
+        f.write(body)
+
+
+def read_sections(buffer, file_name):
+    """
+    Validates the header and section table, returning {section name: array view}
+    """
+    if len(buffer) < HEADER.size:
+        raise ValueError(f"{file_name} is too short to be a metadata file.")
+    magic, version, count, rows, traits, dim, strings, crc, size, sources = HEADER.unpack_from(buffer)
+    if magic != METADATA_MAGIC:
+        raise ValueError(f"{file_name} is not a metadata file.")
+    if version != METADATA_VERSION:
+        raise ValueError(f"{file_name} has metadata version {version}, expected {METADATA_VERSION}.")
+    if count != len(SECTIONS):
+        raise ValueError(f"{file_name} has {count} sections, expected {len(SECTIONS)}.")
+    if size != len(buffer):
+        raise ValueError(f"{file_name} has {len(buffer)} bytes, expected {size}.")
+    sections = {}
+    for kind, (name, dtype) in enumerate(SECTIONS):
+        entry_kind, itemsize, offset, items = SECTION.unpack_from(
+            buffer, HEADER.size + SECTION.size * kind
+        )
+        if entry_kind != kind or itemsize != dtype.itemsize:
+            raise ValueError(f"{file_name} has an unexpected {name} section.")
+        if offset % ALIGNMENT or offset + items * itemsize > size:
+            raise ValueError(f"{file_name} has its {name} section out of bounds.")
+        sections[name] = np.frombuffer(buffer, dtype=dtype, count=items, offset=offset)
+    if zlib.crc32(memoryview(buffer)[HEADER.size :]) != crc:
+        raise ValueError(f"{file_name} does not match its checksum.")
+
+    expected = {
+        "string_offsets": strings + 1,
+        "breakpoint_offsets": traits + 1 if traits else 0,
+        "trait_masks": rows if traits else 0,
+    }
+    for name, items in expected.items():
+        if len(sections[name]) != items:
+            raise ValueError(f"{file_name} has {len(sections[name])} {name}, expected {items}.")
+    # Items have no costs
+    if len(sections["costs"]) not in (0, rows):
+        raise ValueError(f"{file_name} has {len(sections['costs'])} costs for {rows} rows.")
+    if strings != rows + traits:
+        raise ValueError(f"{file_name} has {strings} strings for {rows} rows and {traits} traits.")
+    for offsets_name, data_name in (("string_offsets", "strings"), ("breakpoint_offsets", "breakpoints")):
+        offsets = sections[offsets_name].astype(np.int64)
+        if len(offsets) and (
+            offsets[0] != 0 or np.any(np.diff(offsets) < 0) or offsets[-1] != len(sections[data_name])
+        ):
+            raise ValueError(f"{file_name} has invalid {data_name} offsets.")
+    if traits and np.any(sections["trait_masks"] >> np.uint64(traits)):
+        raise ValueError(f"{file_name} has trait masks with more than {traits} traits.")
+    return sections, rows, traits, dim, sources
+
+
+def load_metadata(file_name, vectors_file=None):
+    """
+    Memory-maps a metadata file after checking its version, checksum and sections
+
+    Nothing in the file is executed or unpickled. The costs and trait masks
+    are read-only views into the map; only the names are decoded. The
+    vectors are the memory-mapped .npy matrix, checked against the rows and
+    dimension in the header.
+
+    Parameters:
+    file_name (str): The path to the metadata file
+    vectors_file (str, optional): The .npy matrix. Defaults to the one next to file_name.
+
+    Returns:
+    Metadata: The loaded metadata
+    """
+    with open(file_name, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise ValueError(f"{file_name} is empty.")
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    sections, rows, traits, dim, sources = read_sections(buffer, file_name)
+    offsets = sections["string_offsets"].tolist()
+    strings = sections["strings"].tobytes()
+    try:
+        names = [strings[start:end].decode("utf-8") for start, end in zip(offsets[:-1], offsets[1:])]
+    except UnicodeDecodeError as e:
+        raise ValueError(f"{file_name} has an invalid string table: {e}") from e
+    if len(set(names[:rows])) != rows:
+        raise ValueError(f"{file_name} has duplicate row names.")
+
+    if vectors_file is None:
+        vectors_file = file_name[: -len(METADATA_SUFFIX)] + ".npy"
+    vectors = load_vectors(vectors_file)
+    if vectors.shape != (rows, dim):
+        raise ValueError(f"{vectors_file} has shape {vectors.shape}, {file_name} expects ({rows}, {dim}).")
+
+    point_offsets = sections["breakpoint_offsets"].tolist()
+    breakpoints = [
+        sections["breakpoints"][start:end].tolist()
+        for start, end in zip(point_offsets[:-1], point_offsets[1:])
+    ]
+    return Metadata(
+        names[:rows],
+        vectors,
+        sections["costs"] if len(sections["costs"]) else None,
+        names[rows:],
+        breakpoints,
+        sections["trait_masks"],
+        sources,
+    )
+
+
+def metadata_from_sources(index_path, champion_data=None):
+    """
+    Assembles the metadata from the id map, .npy matrix, trait table and json
+
+    Parameters:
+    index_path (str): The path to the faiss index
+    champion_data (dict, optional): The champion data with 'cost' and origin/class details
+
+    Returns:
+    Metadata: The metadata, without costs and traits when champion_data is None
+    """
+    id_map = load_id_map(id_map_path(index_path))
+    vectors = load_vectors(vectors_path(index_path), id_map)
+    if champion_data is None:
+        return Metadata(id_map.names, vectors)
+
+    missing = [name for name in id_map.names if name not in champion_data]
+    if missing:
+        raise ValueError(f"The champion data has no entry for {', '.join(missing)}.")
+    costs = np.array([champion_data[name]["cost"] for name in id_map.names], dtype=np.int32)
+
+    file_name = trait_path(index_path)
+    if os.path.exists(file_name):
+        traits = load_trait_table(file_name, id_map.names)
+    else:
+        print(f"The file {file_name} was not found, parsing traits from the champion data.")
+        traits = build_trait_table(champion_data, id_map.names)
+    return Metadata(id_map.names, vectors, costs, traits.names, traits.breakpoints, traits.masks)
+
+
+def read_sources(index_path, data_json=None):
+    """
+    Reads the metadata from the source files, recording their digest
+    """
+    sources = source_digest(index_path, data_json)
+    champion_data = None
+    if data_json:
+        with open(data_json) as f:
+            champion_data = json.load(f)
+    metadata = metadata_from_sources(index_path, champion_data)
+    metadata.sources = sources
+    return metadata
+
+
+def build_metadata(index_path, data_json=None):
+    """
+    Writes the metadata file of an index from its source artifacts
+
+    Rerun after any of them changed, index_metadata ignores a stale file.
+
+    Parameters:
+    index_path (str): The path to the faiss index
+    data_json (str, optional): The champion json, None for items
+
+    Returns:
+    str: The metadata path
+    """
+    file_name = metadata_path(index_path)
+    save_metadata(read_sources(index_path, data_json), file_name)
+    return file_name
+
+
+def index_metadata(index_path, data_json=None):
+    """
+    Loads the metadata of an index, from the sources when its file is missing or stale
+
+    The file is stale when the id map, champion json or trait table changed
+    since it was written. It is not rewritten here, since it may belong to
+    a bundle; scripts.build_metadata refreshes it.
+
+    Parameters:
+    index_path (str): The path to the faiss index
+    data_json (str, optional): The champion json, None for items
+
+    Returns:
+    Metadata: The loaded metadata
+    """
+    file_name = metadata_path(index_path)
+    if os.path.exists(file_name):
+        metadata = load_metadata(file_name, vectors_path(index_path))
+        if metadata.sources == source_digest(index_path, data_json):
+            return metadata
+        print(f"The file {file_name} is older than its sources, reading the json artifacts.")
+    else:
+        print(f"The file {file_name} was not found, reading the json artifacts.")
+    return read_sources(index_path, data_json)
@@ -0,0 +1,294 @@
+#name_resolver.py
+import os
+import re
+import json
+import unicodedata
+from collections import Counter
+from dotenv import load_dotenv
+
+# Separators between names in free text; "/" is kept, it is part of names like K/DA Akali
+SEPARATOR_PATTERN = re.compile(r"\s*(?:[,;|+&\n]|\band\b)\s*", re.IGNORECASE)
+DEFAULT_MIN_SCORE = 0.6
+# Accepted without asking when the best suggestion scores at least this
+AUTO_ACCEPT_SCORE = 0.8
+# The longest run of words tried as one name, e.g. "Lee Sin" or "Tahm Kench"
+MAX_NAME_WORDS = 3
+# Candidates re-scored by edit distance after the trigram ranking
+CANDIDATE_LIMIT = 5
+# Weaker suggestions are noise rather than help
+SUGGESTION_MIN_SCORE = 0.4
+MEMO_SIZE = 4096
+
+
+def load_aliases(kind):
+    """
+    Loads the aliases of one kind ("champions" or "items") from ALIASES_JSON
+
+    Returns:
+    dict: {alias: name}, empty when no alias file is configured
+    """
+    load_dotenv()
+    file_name = os.getenv("ALIASES_JSON", "data/aliases.json")
+    if not os.path.exists(file_name):
+        return {}
+    with open(file_name, "r") as f:
+        return json.load(f).get(kind, {})
+
+
+def normalize_name(name):
+    """
+    Reduces a name to its lookup key: no accents, case, spaces or punctuation
+
+    "Kai'Sa", "kaisa" and "KAI SA" all become "kaisa", "K/DA Akali" becomes "kdaakali".
+    """
+    name = unicodedata.normalize("NFKD", name)
+    name = "".join(char for char in name if not unicodedata.combining(char))
+    return re.sub(r"[\W_]+", "", name.casefold())
+
+
+def split_names(text):
+    """
+    Splits free text into name tokens on commas, semicolons, "|", "+", "&" and "and"
+
+    Parameters:
+    text (str): The raw input, e.g. "Ahri,teemo ; Lee Sin"
+
+    Returns:
+    list: The non-empty tokens
+    """
+    return [token for token in SEPARATOR_PATTERN.split(text) if token.strip()]
+
+
+def trigrams(key):
+    padded = f"  {key} "
+    return [padded[i : i + 3] for i in range(len(padded) - 2)]
+
+
+def edit_similarity(a, b):
+    """
+    1 - the optimal string alignment distance over the longer length
+
+    Counts insertions, deletions, substitutions and adjacent swaps, so
+    "ahir" is one edit from "ahri". Uses the bit-parallel algorithm of
+    Myers with Hyyro's transposition term: one pass of integer operations
+    per character of b instead of a len(a) x len(b) table.
+    """
+    if a == b:
+        return 1.0
+    if not a or not b:
+        return 0.0
+
+    match = {}
+    for i, char in enumerate(a):
+        match[char] = match.get(char, 0) | (1 << i)
+    mask = (1 << len(a)) - 1
+    high = 1 << (len(a) - 1)
+
+    vertical_plus, vertical_minus, diagonal, previous_match = mask, 0, 0, 0
+    distance = len(a)
+    for char in b:
+        current_match = match.get(char, 0)
+        diagonal = (
+            (((~diagonal & current_match) << 1) & previous_match)
+            | (((current_match & vertical_plus) + vertical_plus) ^ vertical_plus)
+            | current_match
+            | vertical_minus
+        )
+        horizontal_plus = vertical_minus | (~(diagonal | vertical_plus) & mask)
+        horizontal_minus = diagonal & vertical_plus
+        if horizontal_plus & high:
+            distance += 1
+        elif horizontal_minus & high:
+            distance -= 1
+        horizontal_plus = ((horizontal_plus << 1) | 1) & mask
+        horizontal_minus = (horizontal_minus << 1) & mask
+        vertical_plus = horizontal_minus | (~(diagonal | horizontal_plus) & mask)
+        vertical_minus = diagonal & horizontal_plus
+        previous_match = current_match
+
+    return 1 - distance / max(len(a), len(b))
+
+
+class NameResolver:
+    """
+    Resolves user typed names to the names of an id map
+
+    Keys are normalized names. A normalized name or alias resolves with a
+    dict lookup; anything else is matched through a trigram index: keys
+    sharing the most trigrams with the token are scored by edit
+    similarity. Fuzzy results are memoized per token.
+    """
+
+    def __init__(self, names, aliases=None):
+        """
+        Parameters:
+        names (list): The names of the id map
+        aliases (dict, optional): {alias: name}, aliases of unknown names are ignored
+        """
+        self.names = list(names)
+        self.keys = {}
+        for name in self.names:
+            self.keys[normalize_name(name)] = name
+
+        # The first word of a multi-word name, when no other name shares it
+        first_words = Counter(name.split()[0] for name in self.names if " " in name)
+        for name in self.names:
+            word = name.split()[0]
+            if " " in name and first_words[word] == 1:
+                self.keys.setdefault(normalize_name(word), name)
+
+        for alias, name in (aliases or {}).items():
+            if name in self.names:
+                self.keys[normalize_name(alias)] = name
+
+        self.postings = {}
+        self.gram_counts = {}
+        for key in self.keys:
+            grams = set(trigrams(key))
+            self.gram_counts[key] = len(grams)
+            for gram in grams:
+                self.postings.setdefault(gram, []).append(key)
+
+        self.memo = {}
+
+    def exact(self, token):
+        """
+        Returns the name a token normalizes to, or None without fuzzy matching
+        """
+        return self.keys.get(normalize_name(token))
+
+    def suggest(self, token, limit=5):
+        """
+        Ranks the names closest to a token
+
+        Parameters:
+        token (str): One typed name
+        limit (int, optional): The number of suggestions. Defaults to 5.
+
+        Returns:
+        list: (name, score) tuples, best first, score 1.0 for exact and alias matches
+        """
+        key = normalize_name(token)
+        if key in self.keys:
+            return [(self.keys[key], 1.0)]
+        if not key:
+            return []
+
+        memo_key = (key, limit)
+        if memo_key in self.memo:
+            return self.memo[memo_key]
+
+        grams = set(trigrams(key))
+        shared = Counter()
+        for gram in grams:
+            shared.update(self.postings.get(gram, ()))
+
+        # Dice coefficient of the trigram sets picks the candidates
+        dice = {
+            candidate: 2 * count / (len(grams) + self.gram_counts[candidate])
+            for candidate, count in shared.items()
+        }
+        best = {}
+        for candidate in sorted(dice, key=dice.get, reverse=True)[:CANDIDATE_LIMIT]:
+            name = self.keys[candidate]
+            score = (edit_similarity(key, candidate), dice[candidate])
+            if score > best.get(name, (0, 0)):
+                best[name] = score
+
+        ranked = sorted(best.items(), key=lambda item: (-item[1][0], -item[1][1], item[0]))
+        suggestions = [(name, score) for name, (score, _) in ranked[:limit]]
+        if len(self.memo) >= MEMO_SIZE:
+            self.memo.clear()
+        self.memo[memo_key] = suggestions
+        return suggestions
+
+    def best(self, token, min_score=DEFAULT_MIN_SCORE):
+        """
+        Returns the best name for a token, or None when nothing scores min_score
+        """
+        suggestions = self.suggest(token, 1)
+        if suggestions and suggestions[0][1] >= min_score:
+            return suggestions[0][0]
+        return None
+
+    def segment(self, token, min_score=DEFAULT_MIN_SCORE):
+        """
+        Splits a token with missing separators, such as "Ahri Teemo", into names
+
+        Every run of up to MAX_NAME_WORDS words is scored and the split that
+        covers the most words with the best matches wins, so "Lee Sin" stays
+        one name while "Ahri Teemo" becomes two.
+
+        Returns:
+        list: (words, name, score) per run, name is None for unmatched words
+        """
+        words = token.split()
+        # best[i] is (value, runs) of the best split of words[:i]
+        best = [(0.0, [])] + [None] * len(words)
+        for end in range(1, len(words) + 1):
+            for start in range(max(0, end - MAX_NAME_WORDS), end):
+                phrase = " ".join(words[start:end])
+                suggestions = self.suggest(phrase, 1)
+                name, score = suggestions[0] if suggestions else (None, 0.0)
+                if score < min_score:
+                    if end - start > 1:
+                        continue
+                    name, score = None, 0.0
+                value = best[start][0] + score * (end - start)
+                if best[end] is None or value > best[end][0]:
+                    best[end] = (value, best[start][1] + [(phrase, name, score)])
+        return best[-1][1]
+
+    def parse(self, text, min_score=DEFAULT_MIN_SCORE):
+        """
+        Resolves free text into names
+
+        Parameters:
+        text (str): The raw input, with any of the split_names separators or none
+        min_score (float, optional): The lowest accepted match. Defaults to 0.6.
+
+        Returns:
+        tuple: The resolved (token, name, score) matches and the unresolved
+        (token, suggestions) tokens, in input order
+        """
+        matches = []
+        unresolved = []
+        for token in split_names(text):
+            token = token.strip()
+            name = self.exact(token)
+            if name is not None:
+                matches.append((token, name, 1.0))
+                continue
+
+            for phrase, name, score in self.segment(token, min_score):
+                if name is None:
+                    suggestions = [
+                        (suggestion, score)
+                        for suggestion, score in self.suggest(phrase)
+                        if score >= SUGGESTION_MIN_SCORE
+                    ]
+                    unresolved.append((phrase, suggestions))
+                else:
+                    matches.append((phrase, name, score))
+        return matches, unresolved
+
+    def resolve_all(self, names, min_score=DEFAULT_MIN_SCORE):
+        """
+        Resolves already split names, splitting any that miss a separator
+
+        Parameters:
+        names (list): The typed names
+        min_score (float, optional): The lowest accepted match. Defaults to 0.6.
+
+        Returns:
+        list: The resolved names in input order, unresolved words kept as typed
+        """
+        resolved = []
+        for token in names:
+            name = self.exact(token)
+            if name is not None:
+                resolved.append(name)
+                continue
+            for phrase, name, _ in self.segment(token, min_score):
+                resolved.append(phrase if name is None else name)
+        return resolved
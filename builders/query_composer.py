@@ -0,0 +1,277 @@
+#query_composer.py
+import numpy as np
+from builders import tracing
+from builders.index_factory import normalize, search_index
+
+# Keys accepted in a query dict, see query_options
+QUERY_KEYS = ("mode", "weighting", "weights", "fusion", "rrf_k")
+QUERY_MODES = ("centroid", "multi")
+WEIGHTINGS = ("uniform", "cost")
+FUSIONS = ("rrf", "sum")
+# The usual reciprocal rank fusion constant, it damps the top ranks
+RRF_K = 60
+# Each champion's own search goes this many times deeper than the result,
+# so champions close to several team members can surface in the fusion
+MULTI_DEPTH_FACTOR = 2
+
+
+def query_options(query=None):
+    """
+    Validates how a team is turned into a search and fills in the defaults
+
+    Parameters:
+    query (dict, optional): Any of
+        mode (str): "centroid" searches once with the normalized weighted
+            centroid of the team, "multi" searches once per champion and
+            fuses the results. Defaults to "centroid".
+        weighting (str): "uniform" or "cost", weights proportional to the
+            champion cost. Defaults to "uniform".
+        weights (dict): {name: weight} overrides for single champions
+        fusion (str): "rrf" (reciprocal rank) or "sum" (weighted score sum)
+            for the multi mode. Defaults to "rrf".
+        rrf_k (int): The reciprocal rank constant. Defaults to 60.
+
+    Returns:
+    dict: Every key of QUERY_KEYS
+    """
+    query = query or {}
+    unknown = set(query) - set(QUERY_KEYS)
+    if unknown:
+        raise ValueError(
+            f"Unknown query options: {', '.join(sorted(unknown))}. Expected {', '.join(QUERY_KEYS)}."
+        )
+
+    options = {
+        "mode": "centroid",
+        "weighting": "uniform",
+        "weights": {},
+        "fusion": "rrf",
+        "rrf_k": RRF_K,
+    }
+    options.update(query)
+
+    for key, choices in (("mode", QUERY_MODES), ("weighting", WEIGHTINGS), ("fusion", FUSIONS)):
+        if options[key] not in choices:
+            raise ValueError(f"{key} must be one of {', '.join(choices)}, got {options[key]}.")
+    if not isinstance(options["weights"], dict) or any(
+        not isinstance(weight, (int, float)) or weight < 0
+        for weight in options["weights"].values()
+    ):
+        raise ValueError("weights must map champion names to non-negative numbers.")
+    if not isinstance(options["rrf_k"], (int, float)) or options["rrf_k"] <= 0:
+        raise ValueError("rrf_k must be a positive number.")
+    return options
+
+
+def is_default(options):
+    """
+    True when the options rank exactly like the plain team average
+    """
+    return (
+        options["mode"] == "centroid"
+        and options["weighting"] == "uniform"
+        and not options["weights"]
+    )
+
+
+def team_weights(team, options, champion_data=None):
+    """
+    Weights the members of one team
+
+    Parameters:
+    team (list): The champion names
+    options (dict): The checked options from query_options
+    champion_data (dict, optional): The champion data with 'cost', required by the cost weighting
+
+    Returns:
+    np.array: The (k,) float32 weights, summing to 1
+    """
+    if options["weighting"] == "cost":
+        if champion_data is None:
+            raise ValueError("The cost weighting needs the champion data.")
+        weights = [float(champion_data[name]["cost"]) for name in team]
+    else:
+        weights = [1.0] * len(team)
+
+    weights = np.array(
+        [options["weights"].get(name, weight) for name, weight in zip(team, weights)],
+        dtype=np.float32,
+    )
+    if weights.sum() <= 0:
+        raise ValueError(f"The team {', '.join(team)} has no positive weight.")
+    return weights / weights.sum()
+
+
+def centroid_queries(member_sets, weight_sets):
+    """
+    Turns each team into one query: the normalized weighted centroid
+
+    Members are normalized before they are weighted, so a champion with a
+    long embedding does not pull the query toward itself.
+
+    Parameters:
+    member_sets (list): One (k, d) array of member embeddings per team
+    weight_sets (list): One (k,) weight array per team
+
+    Returns:
+    np.array: The (B, d) normalized float32 queries
+    """
+    if not member_sets:
+        return np.empty((0, 0), dtype=np.float32)
+    return stacked_centroids(
+        np.concatenate(member_sets),
+        [len(members) for members in member_sets],
+        np.concatenate(weight_sets),
+    )
+
+
+def stacked_centroids(members, sizes, weights=None):
+    """
+    centroid_queries for the members of every team stacked in one array
+
+    Every member is normalized and weighted at once, then summed per team.
+
+    Parameters:
+    members (np.array): The (m, d) member embeddings, team after team
+    sizes (list): The number of members of each team
+    weights (np.array, optional): The (m,) member weights. Defaults to equal weights per team.
+
+    Returns:
+    np.array: The (B, d) normalized float32 queries
+    """
+    sizes = np.asarray(sizes)
+    if weights is None:
+        weights = np.repeat(1 / sizes.astype(np.float32), sizes)
+    members = normalize(members)
+    members *= weights[:, None]
+
+    # Teams of one size are summed together as a (teams, size, d) block,
+    # much faster than np.add.reduceat over rows
+    if len(sizes) == 1:
+        return normalize(members.sum(axis=0, keepdims=True))
+    starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+    queries = np.empty((len(sizes), members.shape[1]), dtype=np.float32)
+    for size in np.unique(sizes):
+        teams = np.flatnonzero(sizes == size)
+        queries[teams] = members[starts[teams][:, None] + np.arange(size)].sum(axis=1)
+    return normalize(queries)
+
+
+def fuse(ids, scores, owners, weights, queries, top, excluded=None, fusion="rrf", rrf_k=RRF_K):
+    """
+    Fuses the ranked results of many member searches into one ranking per query
+
+    rrf adds weight / (rrf_k + rank) for every list a row appears in, sum
+    adds weight * score. A row missing from a member's list adds nothing.
+
+    Parameters:
+    ids (np.array): The (m, depth) result rows of the m member searches, -1 for none
+    scores (np.array): The (m, depth) similarities
+    owners (np.array): The (m,) query each member search belongs to
+    weights (np.array): The (m,) member weights
+    queries (int): The number of queries B
+    top (int): The rows to return per query
+    excluded (list, optional): One set of rows per query that is never returned
+    fusion (str, optional): "rrf" or "sum". Defaults to "rrf".
+    rrf_k (int, optional): The reciprocal rank constant. Defaults to 60.
+
+    Returns:
+    list: One array of rows per query, best first
+    """
+    if fusion == "rrf":
+        contributions = weights[:, None] / (rrf_k + 1 + np.arange(ids.shape[1]))[None, :]
+    else:
+        contributions = weights[:, None] * scores
+
+    # Every (query, row) pair gets one key, so all queries are summed at once
+    found = ids >= 0
+    stride = int(ids.max()) + 1 if found.any() else 1
+    keys = (owners[:, None] * stride + ids)[found]
+    unique, inverse = np.unique(keys, return_inverse=True)
+    totals = np.bincount(inverse, weights=contributions[found], minlength=len(unique))
+
+    if excluded is not None:
+        excluded_keys = [query * stride + row for query, rows in enumerate(excluded) for row in rows]
+        keep = ~np.isin(unique, excluded_keys)
+        unique, totals = unique[keep], totals[keep]
+
+    # By query, then best total first; ties keep the lower row first
+    order = np.lexsort((-totals, unique // stride))
+    unique = unique[order]
+    bounds = np.searchsorted(unique // stride, np.arange(queries + 1))
+    return [
+        unique[start:end][:top] % stride for start, end in zip(bounds[:-1], bounds[1:])
+    ]
+
+
+def member_depth(top, excluded=0):
+    """
+    How deep each member search of a multi query goes for top results
+    """
+    return top * MULTI_DEPTH_FACTOR + excluded
+
+
+def exact_member_search(members, vectors, allowed, depth):
+    """
+    Searches every member against the allowed rows of a matrix without faiss
+
+    Returns:
+    tuple: (scores, ids) shaped like faiss results, ids -1 past the allowed rows
+    """
+    scores = members @ np.asarray(vectors).T
+    scores[:, ~allowed] = -np.inf
+    depth = min(depth, scores.shape[1])
+    ids = np.argsort(-scores, axis=1, kind="stable")[:, :depth]
+    ranked = np.take_along_axis(scores, ids, axis=1)
+    ids[~np.isfinite(ranked)] = -1
+    return ranked, ids
+
+
+def multi_search(
+    index,
+    member_sets,
+    weight_sets,
+    top,
+    excluded=None,
+    params=None,
+    fusion="rrf",
+    rrf_k=RRF_K,
+    vectors=None,
+    rerank=0,
+):
+    """
+    Searches once per member of every team with one faiss call and fuses per team
+
+    Parameters:
+    index (faiss.Index): The index to search
+    member_sets (list): One (k, d) array of member embeddings per team
+    weight_sets (list): One (k,) weight array per team
+    top (int): The rows to return per team
+    excluded (list, optional): One set of rows per team that is never returned
+    params (faiss.SearchParameters, optional): E.g. an allowed-rows selector
+    fusion (str, optional): "rrf" or "sum". Defaults to "rrf".
+    rrf_k (int, optional): The reciprocal rank constant. Defaults to 60.
+    vectors (np.array, optional): The exact embeddings, required to re-rank
+    rerank (int, optional): Re-rank rerank * depth candidates per member, see search_index
+
+    Returns:
+    list: One array of rows per team, best first
+    """
+    if not member_sets:
+        return []
+
+    members = normalize(np.concatenate(member_sets))
+    owners = np.repeat(np.arange(len(member_sets)), [len(team) for team in member_sets])
+    weights = np.concatenate(weight_sets)
+    team_depths = np.array(
+        [member_depth(top, len(rows)) for rows in (excluded or [()] * len(member_sets))]
+    )
+    depth = min(int(team_depths.max()), index.ntotal)
+
+    with tracing.span("compose.search", queries=len(members), k=depth):
+        scores, ids = search_index(index, members, depth, params, vectors, rerank)
+    with tracing.span("compose.fuse", fusion=fusion):
+        # Each team only fuses its own depth, so a result does not depend on
+        # the other teams in the batch
+        ids[np.arange(depth)[None, :] >= team_depths[owners][:, None]] = -1
+        return fuse(ids, scores, owners, weights, len(member_sets), top, excluded, fusion, rrf_k)
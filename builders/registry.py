@@ -0,0 +1,216 @@
+#registry.py
+import threading
+from builders.bundles import (
+    bundle_configs,
+    bundle_path,
+    latest_patch,
+    list_bundles,
+    load_bundle_config,
+    verify_bundle,
+)
+from builders.engine import RecommendationEngine
+from builders.result_cache import load_cache_config
+
+# The set name of an engine loaded from the .env paths instead of a bundle
+ENV_SET = "default"
+# The shortest pause between two bundle checks, so an interval of 0 does not spin
+MIN_CHECK_SECONDS = 0.5
+
+
+class BundleRegistry:
+    """
+    Keeps one RecommendationEngine per set resident and swaps in new patches
+
+    A swap replaces the whole set -> engine mapping at once. Callers hold
+    the engine they got from engine() for their whole query, so queries
+    already running on the old patch finish on it, and the old engine is
+    freed after the last one returns.
+
+    Once start() was called, a background thread looks for a newer patch
+    of each resident set every check_interval seconds. A new patch is
+    verified, loaded and (when the old engine was warm) prewarmed on that
+    thread before it is swapped in, so engine() never waits for it.
+    """
+
+    def __init__(self, config=None, cache_config=None):
+        """
+        Parameters:
+        config (dict, optional): The bundle config. Defaults to load_bundle_config().
+        cache_config (dict, optional): The result cache config. Defaults to load_cache_config().
+        """
+        self.config = config or load_bundle_config()
+        self.cache_config = cache_config or load_cache_config()
+        self.root = self.config["root"]
+        self.default_set = self.config["default_set"]
+        self.check_interval = self.cache_config["check_interval"]
+        self.engines = {}
+        self.patches = {}
+        # The last patch per set that failed to load, not retried until a newer one appears
+        self.failed = {}
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.checker = None
+
+    def add(self, set_name, engine, patch=None):
+        """
+        Makes an engine the one answering a set, replacing any previous one
+        """
+        with self.lock:
+            # Copied, so a reader iterating the old mapping is not disturbed
+            engines = dict(self.engines)
+            engines[set_name] = engine
+            patches = dict(self.patches)
+            patches[set_name] = patch
+            self.engines, self.patches = engines, patches
+            if not self.default_set:
+                self.default_set = set_name
+        return engine
+
+    def load(self, set_name, patch=None, prewarm=False):
+        """
+        Verifies and loads a bundle, then swaps it in for its set
+
+        Parameters:
+        set_name (str): The set, e.g. "set11"
+        patch (str, optional): The patch. Defaults to the latest one.
+        prewarm (bool, optional): Prewarm the engine before the swap. Defaults to False.
+
+        Returns:
+        RecommendationEngine: The new engine
+        """
+        patch = patch or latest_patch(self.root, set_name)
+        path = bundle_path(self.root, set_name, patch)
+        manifest = verify_bundle(path)
+        engine = RecommendationEngine(*bundle_configs(path), self.cache_config)
+        engine.bundle = manifest
+        if prewarm:
+            engine.prewarm()
+        return self.add(set_name, engine, patch)
+
+    def load_newest(self, set_name, patches):
+        """
+        Loads the newest patch of a set that passes verify_bundle
+
+        A damaged newer patch is reported and skipped, so one bad build does
+        not keep the set from loading.
+        """
+        for patch in reversed(patches):
+            try:
+                return self.load(set_name, patch)
+            except ValueError as e:
+                self.failed.setdefault(set_name, patch)
+                print(f"Skipping the {set_name} bundle {patch}: {e}")
+        raise ValueError(f"No loadable bundle for the set {set_name} in {self.root}.")
+
+    def unload(self, set_name):
+        with self.lock:
+            engines = dict(self.engines)
+            engines.pop(set_name, None)
+            patches = dict(self.patches)
+            patches.pop(set_name, None)
+            self.engines, self.patches = engines, patches
+
+    def sets(self):
+        """
+        Returns:
+        dict: {set name: loaded patch}, None for an engine not loaded from a bundle
+        """
+        return dict(self.patches)
+
+    def engine(self, set_name=None):
+        """
+        Returns the engine answering a set
+
+        Parameters:
+        set_name (str, optional): The set. Defaults to the default set.
+
+        Returns:
+        RecommendationEngine: The engine, keep it for the whole query
+        """
+        set_name = set_name or self.default_set
+        engine = self.engines.get(set_name)
+        if engine is None:
+            raise ValueError(
+                f"Unknown set {set_name}. Loaded sets: {', '.join(sorted(self.engines)) or 'none'}."
+            )
+        return engine
+
+    def check_bundles(self):
+        """
+        Swaps in the newest patch of every resident set built since the last check
+        """
+        bundles = list_bundles(self.root)
+        for set_name, patch in self.sets().items():
+            if patch is None or set_name not in bundles:
+                continue
+            newest = bundles[set_name][-1]
+            if newest == patch or self.failed.get(set_name) == newest:
+                continue
+            try:
+                self.load(set_name, newest, self.engines[set_name].ready)
+            except Exception as e:
+                self.failed[set_name] = newest
+                print(f"Could not load the {set_name} bundle {newest}, keeping {patch}: {e}")
+
+    def start(self):
+        """
+        Starts checking for new patches on a daemon thread
+        """
+        if self.checker is not None:
+            return
+        self.stopped.clear()
+        self.checker = threading.Thread(target=self.check_loop, name="bundle-check", daemon=True)
+        self.checker.start()
+
+    def stop(self):
+        """
+        Stops the bundle checks, waiting for a check in progress to finish
+        """
+        if self.checker is None:
+            return
+        self.stopped.set()
+        self.checker.join()
+        self.checker = None
+
+    def check_loop(self):
+        while not self.stopped.wait(max(self.check_interval, MIN_CHECK_SECONDS)):
+            try:
+                self.check_bundles()
+            except Exception as e:
+                print(f"Could not check {self.root} for new bundles: {e}")
+
+    def prewarm(self):
+        for engine in self.engines.values():
+            engine.prewarm()
+
+    @property
+    def ready(self):
+        return all(engine.ready for engine in self.engines.values())
+
+    @classmethod
+    def from_env(cls):
+        """
+        Loads the latest patch of every set in BUNDLE_SETS (all sets when empty)
+
+        The default set is BUNDLE_SET, or else the set with the most recently
+        built bundle. Without any bundle under BUNDLES_DIR, the engine is
+        loaded from the .env paths and answers the set "default".
+        """
+        registry = cls()
+        bundles = list_bundles(registry.root)
+        set_names = registry.config["sets"] or list(bundles)
+        if not set_names:
+            registry.add(registry.default_set or ENV_SET, RecommendationEngine.from_env())
+            return registry
+
+        for set_name in set_names:
+            registry.load_newest(set_name, bundles.get(set_name, []))
+        if not registry.config["default_set"]:
+            registry.default_set = max(
+                set_names, key=lambda set_name: registry.engines[set_name].bundle["created"]
+            )
+        if registry.default_set not in registry.engines:
+            raise ValueError(
+                f"BUNDLE_SET {registry.default_set} is not loaded, expected one of {', '.join(set_names)}."
+            )
+        return registry
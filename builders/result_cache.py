@@ -0,0 +1,119 @@
+#result_cache.py
+import os
+import time
+import threading
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+
+def load_cache_config():
+    load_dotenv()
+    return {
+        "max_size": int(os.getenv("RESULT_CACHE_SIZE", 4096)),
+        "ttl": float(os.getenv("RESULT_CACHE_TTL", 600)),
+        "check_interval": float(os.getenv("ARTIFACT_CHECK_INTERVAL", 2)),
+    }
+
+
+def artifact_version(paths):
+    """
+    Identifies the state of a set of artifact files by their size and mtime
+
+    Parameters:
+    paths (list): The artifact file paths, missing files are recorded as such
+
+    Returns:
+    tuple: A hashable version, different whenever any file is rewritten
+    """
+    version = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            version.append((path, stat.st_size, stat.st_mtime_ns))
+        except FileNotFoundError:
+            version.append((path, None, None))
+    return tuple(version)
+
+
+class ResultCache:
+    """
+    Thread-safe LRU cache whose entries also expire after ttl seconds
+
+    Shared by every session and worker thread of the engine, so get and
+    put take a lock. None is never stored, it is what get returns on a miss.
+    """
+
+    def __init__(self, max_size=4096, ttl=600, clock=time.monotonic):
+        """
+        Parameters:
+        max_size (int, optional): The most entries kept, 0 disables the cache. Defaults to 4096.
+        ttl (float, optional): Seconds an entry stays valid, 0 for no expiry. Defaults to 600.
+        clock (callable, optional): The time source. Defaults to time.monotonic.
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        """
+        Returns the cached value, or None when it is missing or expired
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, expires = entry
+            if expires is not None and expires <= self.clock():
+                del self.entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """
+        Stores a value, evicting the least recently used entries over max_size
+        """
+        if self.max_size <= 0 or value is None:
+            return
+
+        expires = self.clock() + self.ttl if self.ttl else None
+        with self.lock:
+            self.entries[key] = (value, expires)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        """
+        Returns the hit / miss counters and the current size
+        """
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
@@ -0,0 +1,561 @@
+#service.py
+import os
+import json
+import argparse
+import time
+import asyncio
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from aiohttp import web
+from dotenv import load_dotenv
+from builders import tracing
+from builders.engine import check_count
+from builders.registry import BundleRegistry
+from builders.name_resolver import split_names
+from builders.query_composer import query_options
+from builders.startup import print_report, profile_startup
+
+LATENCY_WINDOW = 4096
+
+
+def load_service_config():
+    load_dotenv()
+    return {
+        "host": os.getenv("SERVICE_HOST", "127.0.0.1"),
+        "port": int(os.getenv("SERVICE_PORT", 8080)),
+        "workers": int(os.getenv("SERVICE_WORKERS", 4)),
+        "batch_window_ms": float(os.getenv("SERVICE_BATCH_WINDOW_MS", 0)),
+        "max_batch": int(os.getenv("SERVICE_MAX_BATCH", 256)),
+        "max_pending": int(os.getenv("SERVICE_MAX_PENDING", 10000)),
+        "max_batch_teams": int(os.getenv("SERVICE_MAX_BATCH_TEAMS", 4096)),
+        "keepalive_timeout": float(os.getenv("SERVICE_KEEPALIVE_TIMEOUT", 75)),
+        "prewarm": os.getenv("SERVICE_PREWARM", "1") == "1",
+    }
+
+
+class ServerBusy(Exception):
+    """
+    Raised when a request would take the pending queries over max_pending
+    """
+
+
+class Metrics:
+    """
+    Request counters and a sliding window of request latencies
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.requests = {}
+        self.errors = {}
+        self.batches = 0
+        self.batched_queries = 0
+        self.coalesced = 0
+        self.rejected = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+
+    def observe(self, endpoint, seconds, error=False):
+        self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+        if error:
+            self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+        self.latencies.append(seconds)
+
+    def snapshot(self, pending):
+        latencies = np.array(self.latencies) * 1000
+        return {
+            "uptime_s": time.time() - self.started,
+            "requests": self.requests,
+            "errors": self.errors,
+            "rejected": self.rejected,
+            "pending": pending,
+            "batches": self.batches,
+            "batched_queries": self.batched_queries,
+            "mean_batch_size": self.batched_queries / self.batches if self.batches else 0,
+            "coalesced": self.coalesced,
+            "latency_ms": {
+                "p50": float(np.percentile(latencies, 50)) if len(latencies) else 0,
+                "p95": float(np.percentile(latencies, 95)) if len(latencies) else 0,
+                "p99": float(np.percentile(latencies, 99)) if len(latencies) else 0,
+            },
+        }
+
+
+class Coalescer:
+    """
+    Merges concurrent single-team queries into one batched engine call
+
+    Queries with the same parameters that arrive within the batch window
+    are answered by one call on the worker pool, and an identical query
+    that is already in flight shares its result instead of running again.
+    """
+
+    def __init__(self, run, executor, metrics, batch_window_ms=0, max_batch=256):
+        """
+        Parameters:
+        run (callable): run(teams, params) returns one result per team
+        executor (ThreadPoolExecutor): The bounded pool the engine calls run on
+        metrics (Metrics): The service metrics
+        batch_window_ms (float, optional): How long a batch waits for more queries. Defaults to 0,
+            which batches the queries queued in one event loop pass.
+        max_batch (int, optional): The largest batch sent to the engine. Defaults to 256.
+        """
+        self.run = run
+        self.executor = executor
+        self.metrics = metrics
+        self.batch_window = batch_window_ms / 1000
+        self.max_batch = max_batch
+        self.pending = {}
+        self.inflight = {}
+
+    def __len__(self):
+        return len(self.inflight)
+
+    async def submit(self, params, team):
+        """
+        Queues one team and waits for its result
+
+        Parameters:
+        params (tuple): The hashable query parameters, shared by the whole batch
+        team (list): The champion names of the team
+
+        Returns:
+        The engine result for the team
+        """
+        key = (params, tuple(sorted(team)))
+        if key in self.inflight:
+            self.metrics.coalesced += 1
+            return await asyncio.shield(self.inflight[key])
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.inflight[key] = future
+
+        group = self.pending.setdefault(params, [])
+        group.append((key, team, future))
+        if len(group) >= self.max_batch:
+            self.flush(params)
+        elif len(group) == 1:
+            loop.call_later(self.batch_window, self.flush, params)
+        return await asyncio.shield(future)
+
+    def flush(self, params):
+        group = self.pending.pop(params, None)
+        if group:
+            asyncio.ensure_future(self.run_group(params, group))
+
+    async def run_group(self, params, group):
+        teams = [team for _, team, _ in group]
+        self.metrics.batches += 1
+        self.metrics.batched_queries += len(teams)
+        try:
+            results = await asyncio.get_running_loop().run_in_executor(
+                self.executor, self.run, teams, params
+            )
+        except Exception as e:
+            for _, _, future in group:
+                future.set_exception(e)
+        else:
+            for (_, _, future), result in zip(group, results):
+                future.set_result(result)
+        finally:
+            for key, _, _ in group:
+                self.inflight.pop(key, None)
+
+
+class RecommendationService:
+    """
+    JSON endpoints over the preloaded engines of a BundleRegistry
+
+    Every query may name a "set", by default the registry's default set.
+    """
+
+    def __init__(self, registry, config):
+        """
+        Parameters:
+        registry (BundleRegistry): The loaded sets
+        config (dict): The service config from load_service_config()
+        """
+        self.registry = registry
+        self.config = config
+        self.metrics = Metrics()
+        self.executor = ThreadPoolExecutor(
+            max_workers=config["workers"], thread_name_prefix="engine"
+        )
+        self.coalescer = Coalescer(
+            self.run,
+            self.executor,
+            self.metrics,
+            config["batch_window_ms"],
+            config["max_batch"],
+        )
+        # Teams of the /batch requests in flight, they bypass the coalescer
+        self.batch_pending = 0
+
+    def pending(self):
+        """
+        Returns the number of queries waiting for or running on the engine
+        """
+        return len(self.coalescer) + self.batch_pending
+
+    def run(self, teams, params):
+        """
+        Answers a batch of teams on the worker pool
+        """
+        kind, set_name, top_k, top_k_distance, filters, query = params
+        # Held for the whole batch, so a bundle swap does not affect it
+        engine = self.registry.engine(set_name)
+        if kind == "items":
+            return engine.items_batch(teams, top_k, json.loads(query) or None)
+        return engine.synergies_batch(
+            teams, top_k, top_k_distance, json.loads(filters) or None, json.loads(query) or None
+        )
+
+    def set_name(self, query):
+        """
+        Returns the set a query asks for, checking that it is loaded
+        """
+        set_name = query.get("set") or self.registry.default_set
+        self.registry.engine(set_name)
+        return set_name
+
+    def unknown(self, team, set_name=None):
+        engine = self.registry.engine(set_name)
+        return [
+            str(name)
+            for name in team
+            if not isinstance(name, str) or engine.champ_resolver.exact(name) is None
+        ]
+
+    async def read_query(self, request):
+        """
+        Reads a query from a JSON body, or from the query string of a GET
+
+        Returns:
+        dict: The query with "champions" as a list of names
+        """
+        if request.method == "GET":
+            query = dict(request.query)
+            query["champions"] = split_names(query.get("champions", ""))
+            return query
+
+        query = await request.json()
+        if not isinstance(query, dict):
+            raise ValueError("Expected a JSON object.")
+        return query
+
+    def count(self, query, key, default, limit):
+        """
+        Reads a result count, e.g. top_k, which must be between 1 and limit
+
+        Parameters:
+        query (dict): The query
+        key (str): The count's key in the query
+        default (int): The count when the query has none
+        limit (int): The number of rows in the searched index
+
+        Returns:
+        int: The count
+        """
+        value = query.get(key, default)
+        try:
+            if isinstance(value, bool):
+                raise ValueError
+            count = int(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"{key} must be an integer.") from None
+        check_count(key, count, limit)
+        return count
+
+    def champion_counts(self, query, set_name):
+        """
+        Returns the top_k and top_k_distance of a synergy query
+        """
+        champions = len(self.registry.engine(set_name).champ_id_map)
+        return (
+            self.count(query, "top_k", 15, champions),
+            self.count(query, "top_k_distance", 10, champions),
+        )
+
+    def team(self, query, key="champions"):
+        team = query.get(key)
+        if not team or not isinstance(team, list):
+            raise ValueError(f"{key} must be a non-empty list of champion names.")
+        set_name = self.set_name(query)
+        unknown = self.unknown(team, set_name)
+        if unknown:
+            raise ValueError(f"Unknown champions: {self.describe_unknown(unknown, set_name)}.")
+        return team
+
+    def describe_unknown(self, unknown, set_name=None):
+        """
+        Lists unknown names with the closest known name, e.g. "teemoo (did you mean Teemo?)"
+        """
+        engine = self.registry.engine(set_name)
+        described = []
+        for name in unknown:
+            suggestions = engine.champ_resolver.suggest(name, 1)
+            if suggestions:
+                described.append(f"{name} (did you mean {suggestions[0][0]}?)")
+            else:
+                described.append(name)
+        return ", ".join(described)
+
+    async def resolve(self, query):
+        kind = query.get("kind", "champions")
+        if kind not in ("champions", "items"):
+            raise ValueError("kind must be champions or items.")
+        engine = self.registry.engine(self.set_name(query))
+        resolver = engine.champ_resolver if kind == "champions" else engine.item_resolver
+
+        matches, unresolved = resolver.parse(str(query.get("q", "")))
+        return {
+            "names": [name for _, name, _ in matches],
+            "matches": [
+                {"token": token, "name": name, "score": score}
+                for token, name, score in matches
+            ],
+            "unresolved": [
+                {
+                    "token": token,
+                    "suggestions": [
+                        {"name": name, "score": score} for name, score in suggestions
+                    ],
+                }
+                for token, suggestions in unresolved
+            ],
+        }
+
+    @staticmethod
+    def filters_key(query):
+        # GET passes the filters as ?filters=<json>, like the query options
+        filters = query.get("filters") or {}
+        if isinstance(filters, str):
+            try:
+                filters = json.loads(filters)
+            except json.JSONDecodeError as error:
+                raise ValueError(f"filters is not valid JSON: {error}.") from None
+        if not isinstance(filters, dict):
+            raise ValueError('filters must be a JSON object, e.g. {"max_cost": 2}.')
+        return json.dumps(filters, sort_keys=True)
+
+    @staticmethod
+    def query_key(query):
+        # GET passes the options as ?query=<json>
+        options = query.get("query") or {}
+        if isinstance(options, str):
+            options = json.loads(options)
+        query_options(options)
+        return json.dumps(options, sort_keys=True)
+
+    async def synergies(self, query):
+        team = self.team(query)
+        set_name = self.set_name(query)
+        params = (
+            "synergies",
+            set_name,
+            *self.champion_counts(query, set_name),
+            self.filters_key(query),
+            self.query_key(query),
+        )
+        by_cost, by_distance = await self.coalescer.submit(params, team)
+        return {"by_cost": by_cost, "by_distance": by_distance}
+
+    async def items(self, query):
+        team = self.team(query)
+        set_name = self.set_name(query)
+        items = len(self.registry.engine(set_name).item_id_map)
+        params = (
+            "items",
+            set_name,
+            self.count(query, "top_k", 15, items),
+            0,
+            "{}",
+            self.query_key(query),
+        )
+        return {"items": await self.coalescer.submit(params, team)}
+
+    async def batch(self, query):
+        teams = query.get("teams")
+        if not isinstance(teams, list) or not all(isinstance(t, list) for t in teams):
+            raise ValueError("teams must be a list of champion name lists.")
+        if len(teams) > self.config["max_batch_teams"]:
+            raise ValueError(f"A batch takes at most {self.config['max_batch_teams']} teams.")
+
+        set_name = self.set_name(query)
+        items = len(self.registry.engine(set_name).item_id_map)
+        params = (
+            "synergies",
+            set_name,
+            *self.champion_counts(query, set_name),
+            self.filters_key(query),
+            self.query_key(query),
+        )
+        item_params = ("items", set_name, self.count(query, "top_k_items", 15, items), 0, "{}", params[-1])
+        # Every team counts against max_pending, like the queued single queries
+        if self.pending() + len(teams) > self.config["max_pending"]:
+            raise ServerBusy()
+
+        loop = asyncio.get_running_loop()
+        self.batch_pending += len(teams)
+        try:
+            # Already batched, so both calls go straight to the worker pool
+            synergies, items = await asyncio.gather(
+                loop.run_in_executor(self.executor, self.run, teams, params),
+                loop.run_in_executor(self.executor, self.run, teams, item_params),
+            )
+        finally:
+            self.batch_pending -= len(teams)
+
+        results = []
+        for team, synergy, team_items in zip(teams, synergies, items):
+            if synergy is None:
+                unknown = self.unknown(team, params[1])
+                error = (
+                    f"Unknown champions: {self.describe_unknown(unknown, params[1])}."
+                    if unknown
+                    else "Empty team."
+                )
+                results.append({"error": error})
+            else:
+                results.append(
+                    {
+                        "by_cost": synergy[0],
+                        "by_distance": synergy[1],
+                        "items": team_items,
+                    }
+                )
+        return {"results": results}
+
+    def handler(self, endpoint, answer):
+        """
+        Wraps an endpoint with backpressure, error responses and metrics
+        """
+
+        async def handle(request):
+            start = time.perf_counter()
+            status = 200
+            try:
+                if self.pending() >= self.config["max_pending"]:
+                    raise ServerBusy()
+                body = await answer(await self.read_query(request))
+            except ServerBusy:
+                self.metrics.rejected += 1
+                return web.json_response({"error": "Server busy."}, status=503)
+            except (ValueError, TypeError) as e:
+                status = 400
+                body = {"error": str(e)}
+            except Exception as e:
+                status = 500
+                body = {"error": f"An error occurred: {e}"}
+
+            self.metrics.observe(endpoint, time.perf_counter() - start, status != 200)
+            return web.json_response(body, status=status)
+
+        return handle
+
+    async def metrics_handler(self, request):
+        snapshot = self.metrics.snapshot(self.pending())
+        snapshot["result_cache"] = self.registry.engine().cache.stats()
+        sink = tracing.histogram_sink()
+        if sink is not None:
+            snapshot["spans"] = sink.snapshot()
+        return web.json_response(snapshot)
+
+    async def prometheus_handler(self, request):
+        # The builder spans, when TRACE_SINKS includes histogram or prometheus
+        sink = tracing.histogram_sink()
+        if sink is None:
+            return web.json_response({"error": "tracing is off, set TRACE_SINKS"}, status=404)
+        return web.Response(text=sink.prometheus_text(), content_type="text/plain")
+
+    async def sets_handler(self, request):
+        sets = {}
+        for set_name, patch in sorted(self.registry.sets().items()):
+            engine = self.registry.engine(set_name)
+            bundle = getattr(engine, "bundle", None) or {}
+            sets[set_name] = {
+                "patch": patch,
+                "checksum": bundle.get("checksum"),
+                "ready": engine.ready,
+                "result_cache": engine.cache.stats(),
+            }
+        return web.json_response({"default": self.registry.default_set, "sets": sets})
+
+    async def health_handler(self, request):
+        # Not healthy until prewarm loaded the index, so no request pays for it
+        if self.config["prewarm"] and not self.registry.ready:
+            return web.json_response({"status": "starting"}, status=503)
+        return web.json_response({"status": "ok"})
+
+    async def prewarm(self):
+        try:
+            await asyncio.get_running_loop().run_in_executor(
+                self.executor, self.registry.prewarm
+            )
+        except Exception as e:
+            print(f"Prewarm failed: {e}")
+
+    async def start(self, app):
+        # Prewarm in the background, so the server listens (and reports
+        # "starting" on /health) while the index loads
+        if self.config["prewarm"]:
+            self.prewarm_task = asyncio.ensure_future(self.prewarm())
+        # New patches are verified and loaded off the event loop
+        self.registry.start()
+
+    async def close(self, app):
+        await asyncio.get_running_loop().run_in_executor(None, self.registry.stop)
+        self.executor.shutdown(wait=False)
+
+    def make_app(self):
+        """
+        Builds the aiohttp application
+
+        Returns:
+        web.Application: The app with /synergies, /items, /batch, /resolve, /sets,
+        /metrics, /metrics/prometheus and /health
+        """
+        app = web.Application()
+        app.add_routes(
+            [
+                web.get("/synergies", self.handler("synergies", self.synergies)),
+                web.post("/synergies", self.handler("synergies", self.synergies)),
+                web.get("/items", self.handler("items", self.items)),
+                web.post("/items", self.handler("items", self.items)),
+                web.post("/batch", self.handler("batch", self.batch)),
+                web.get("/resolve", self.handler("resolve", self.resolve)),
+                web.post("/resolve", self.handler("resolve", self.resolve)),
+                web.get("/sets", self.sets_handler),
+                web.get("/metrics", self.metrics_handler),
+                web.get("/metrics/prometheus", self.prometheus_handler),
+                web.get("/health", self.health_handler),
+            ]
+        )
+        app.on_startup.append(self.start)
+        app.on_cleanup.append(self.close)
+        return app
+
+
+def main(config):
+    tracing.configure()
+    service = RecommendationService(BundleRegistry.from_env(), config)
+    web.run_app(
+        service.make_app(),
+        host=config["host"],
+        port=config["port"],
+        keepalive_timeout=config["keepalive_timeout"],
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serves recommendations over HTTP.")
+    parser.add_argument(
+        "--profile-startup",
+        action="store_true",
+        help="print the import and artifact load breakdown of a cold start and exit",
+    )
+    if parser.parse_args().profile_startup:
+        print_report(profile_startup())
+    else:
+        main(load_service_config())
@@ -0,0 +1,130 @@
+#startup.py
+import re
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+# Modules timed by a fresh interpreter for the import breakdown
+PROFILED_MODULES = ("builders.engine", "builders.service")
+IMPORT_PATTERN = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def import_times(module, top_n=15):
+    """
+    Imports a module in a fresh interpreter with -X importtime
+
+    Parameters:
+    module (str): The module to import
+    top_n (int, optional): The number of slowest imports to return. Defaults to 15.
+
+    Returns:
+    dict: The total import ms and the top_n (module, self ms, cumulative ms)
+    rows with the largest cumulative time, nested imports excluded
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr}")
+
+    rows = []
+    for line in result.stderr.splitlines():
+        match = IMPORT_PATTERN.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            rows.append((name, int(self_us) / 1000, int(cumulative_us) / 1000, len(indent)))
+
+    total = next((cumulative for name, _, cumulative, _ in rows if name == module), 0)
+    # Top-level imports of the module and of its direct dependencies
+    shallow = [row for row in rows if row[3] <= 3]
+    slowest = sorted(shallow, key=lambda row: -row[2])[:top_n]
+    return {
+        "total_ms": total,
+        "slowest": [
+            {"module": name, "self_ms": self_ms, "cumulative_ms": cumulative}
+            for name, self_ms, cumulative, _ in slowest
+        ],
+    }
+
+
+def artifact_times():
+    """
+    Builds an engine from the environment and times each startup step
+
+    Returns:
+    dict: ms per step, the artifact loads, the first synergy search, and prewarm.
+    import_engine is None when the engine was already imported, e.g. by the
+    service, as timing the import again would only measure a dict lookup.
+    """
+    imported = "builders.engine" in sys.modules
+    start = time.perf_counter()
+    from builders.engine import RecommendationEngine
+
+    timings = {"import_engine": None if imported else (time.perf_counter() - start) * 1000}
+
+    start = time.perf_counter()
+    engine = RecommendationEngine.from_env()
+    timings["engine_init"] = (time.perf_counter() - start) * 1000
+    timings["faiss_imported_by_init"] = "faiss" in sys.modules
+
+    start = time.perf_counter()
+    engine.prewarm()
+    timings["prewarm"] = (time.perf_counter() - start) * 1000
+
+    timings["artifacts"] = dict(engine.load_timings)
+    return timings
+
+
+def profile_startup(modules=PROFILED_MODULES):
+    """
+    Collects the startup profiling report
+
+    Returns:
+    dict: The import breakdown per module and the artifact load timings
+    """
+    imports = {module: import_times(module) for module in modules}
+    startup = artifact_times()
+    # Already imported in this process, take the fresh interpreter's time
+    if startup["import_engine"] is None and "builders.engine" in imports:
+        startup["import_engine"] = imports["builders.engine"]["total_ms"]
+    return {"imports": imports, "startup": startup}
+
+
+def print_report(report):
+    for module, imports in report["imports"].items():
+        print(f"import {module}: {imports['total_ms']:.1f} ms")
+        for row in imports["slowest"]:
+            print(f"  {row['cumulative_ms']:8.1f} ms  {row['module']}")
+
+    startup = report["startup"]
+    print()
+    if startup["import_engine"] is None:
+        print("engine import:   already imported")
+    else:
+        print(f"engine import:   {startup['import_engine']:8.1f} ms")
+    print(f"engine init:     {startup['engine_init']:8.1f} ms (faiss imported: {startup['faiss_imported_by_init']})")
+    print(f"prewarm:         {startup['prewarm']:8.1f} ms")
+    for label, ms in startup["artifacts"].items():
+        print(f"  {ms:8.1f} ms  {label}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Profiles the imports and artifact loads of a cold start."
+    )
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    report = profile_startup()
+    if args.json:
+        print(json.dumps(report, indent=4))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,37 @@
 #synergy_builder.py
 import os
-import json
-import pickle
 import numpy as np
-import faiss
 from dotenv import load_dotenv
+from builders import tracing
+from builders.bundles import set_configs
+from builders.name_resolver import NameResolver, load_aliases, split_names
+from builders.filters import filter_mask
+from builders.index_factory import allowed_params, load_search_config, normalize, search_index
+from builders.metadata import index_metadata
+from builders.query_composer import (
+    centroid_queries,
+    exact_member_search,
+    fuse,
+    is_default,
+    member_depth,
+    multi_search,
+    query_options,
+    stacked_centroids,
+    team_weights,
+)
 
 
-def load_config():
+@tracing.traced("synergy.load_config")
+def load_config(set_name=None, patch=None):
+    """
+    Returns the .env artifact paths, or those of a set's bundle
+
+    Parameters:
+    set_name (str, optional): Read the bundle of this set, e.g. "set11"
+    patch (str, optional): The bundle patch. Defaults to the latest one.
+    """
+    if set_name:
+        return set_configs(set_name, patch)[0]
     load_dotenv()
     return {
         "champ_data_pkl": os.getenv("CHAMP_DATA_PKL"),
@@ -16,124 +40,459 @@ def load_config():
     }
 
 
-def load_pickle_data(file_name):
+@tracing.traced("synergy.read_index")
+def load_index(index_path):
+    """
+    Loads a faiss index from disk
+
+    Parameters:
+    index_path (str): The path to the faiss index
+
+    Returns:
+    faiss.Index: The loaded index
+    """
+    import faiss
+
+    return faiss.read_index(index_path)
+
+
+@tracing.traced("synergy.query")
+def team_queries(vectors, id_map, teams, weights=None):
+    """
+    Combines each team's champion embeddings into one normalized query row
+
+    Parameters:
+    vectors (np.array): The champion embeddings in faiss row order
+    id_map (IdMap): The row/name lookup of the champion index
+    teams (list): The teams, each a list of champion names
+    weights (list, optional): One (k,) weight array per team. Defaults to equal weights.
+
+    Returns:
+    tuple: The (B, d) float32 query matrix and the positions of the known teams
+    """
+    rows = []
+    sizes = []
+    known = []
+    for position, team in enumerate(teams):
+        if not team or any(name not in id_map for name in team):
+            continue
+        rows.extend(id_map.rows[name] for name in team)
+        sizes.append(len(team))
+        known.append(position)
+
+    if not known:
+        return np.empty((0, vectors.shape[1]), dtype=np.float32), known
+    if weights is not None:
+        weights = np.concatenate([weights[position] for position in known])
+    return stacked_centroids(vectors[rows], sizes, weights), known
+
+
+def exact_top(query, vectors, allowed, top):
     """
-    Loads data from a pickle file
+    Ranks the allowed rows of the embedding matrix for one query without faiss
 
     Parameters:
-    file_name (str): The path to the pickle file
+    query (np.array): The (d,) normalized query
+    vectors (np.array): The champion embeddings in faiss row order
+    allowed (np.array): The (n,) boolean mask of rows that may be returned
+    top (int): The number of rows to return
 
     Returns:
-    dict: The loaded data
+    np.array: The best allowed rows, best first
     """
-    try:
-        with open(file_name, "rb") as f:
-            return pickle.load(f)
-    except FileNotFoundError:
-        print(f"The file {file_name} was not found.")
-    except Exception as e:
-        print(f"An error occurred: {e}")
-        return None
+    scores = np.where(allowed, vectors @ query, -np.inf)
+    top = min(top, int(allowed.sum()))
+    if top == 0:
+        return np.empty(0, dtype=np.int64)
+    best = np.argpartition(-scores, top - 1)[:top]
+    return best[np.argsort(-scores[best], kind="stable")]
 
 
-def load_json_data(file_name):
+def search_batch(
+    queries,
+    index,
+    id_map,
+    champion_data,
+    teams,
+    top_k=15,
+    top_k_distance=10,
+    allowed=None,
+    vectors=None,
+    rerank=0,
+):
     """
-    Loads data from a json file
+    Search the nearest neighbors of many team queries with one faiss call
+
+    The team's own champions and the rows outside allowed are never
+    returned. Both are filtered inside faiss with a bitmap id selector, so
+    the result size does not depend on how selective the filter is. When
+    the teams differ, each row is fetched with room for its team and the
+    team is dropped afterwards. Approximate indexes can come back short
+    under a very selective filter; those rows are re-ranked exactly from
+    vectors, so every query gets top hits whenever that many are allowed.
 
     Parameters:
-    file_name (str): The path to the json file
+    queries (np.array): The (B, d) averaged team embeddings
+    index (faiss.Index): The loaded champion faiss index
+    id_map (IdMap): The row/name lookup of the index
+    champion_data (dict): The original champion data with 'cost' property
+    teams (list): The B teams the queries were built from
+    top_k (int, optional): The number of champions sorted by cost. Defaults to 15.
+    top_k_distance (int, optional): The number of champions sorted by distance. Defaults to 10.
+    allowed (np.array, optional): The (n,) boolean mask of rows that may be returned
+    vectors (np.array, optional): The champion embeddings, used to fill short rows
+    rerank (int, optional): Re-rank rerank * k candidates against vectors, see search_index
 
     Returns:
-    dict: The loaded data
+    list: One (top champions by cost, top champions by distance) tuple per query
+    """
+    if len(queries) == 0:
+        return []
+
+    if allowed is None:
+        allowed = np.ones(len(id_map), dtype=bool)
+    excluded = [{id_map.rows[name] for name in team} for team in teams]
+    top = max(top_k, top_k_distance)
+
+    if all(rows == excluded[0] for rows in excluded):
+        team_allowed = [allowed.copy()]
+        team_allowed[0][list(excluded[0])] = False
+        params = allowed_params(index, team_allowed[0])
+        with tracing.span("synergy.search", queries=len(queries), k=top):
+            _, nearest_indices = search_index(index, queries, top, params, vectors, rerank)
+        team_allowed *= len(queries)
+    else:
+        largest_team = max(len(rows) for rows in excluded)
+        params = None if allowed.all() else allowed_params(index, allowed)
+        with tracing.span("synergy.search", queries=len(queries), k=top + largest_team):
+            _, nearest_indices = search_index(
+                index, queries, top + largest_team, params, vectors, rerank
+            )
+        team_allowed = []
+        for rows in excluded:
+            team_allowed.append(allowed.copy())
+            team_allowed[-1][list(rows)] = False
+
+    results = []
+    with tracing.span("synergy.map") as mapping:
+        refilled = 0
+        for query, rows, mask, row in zip(queries, excluded, team_allowed, nearest_indices):
+            found = [i for i in row if i >= 0 and i not in rows][:top]
+            if vectors is not None and len(found) < min(top, int(mask.sum())):
+                found = exact_top(query, vectors, mask, top)
+                refilled += 1
+            results.append(rank_names(found, id_map, champion_data, top_k, top_k_distance))
+        mapping.set(refilled=refilled)
+
+    return results
+
+
+def rank_names(found, id_map, champion_data, top_k=15, top_k_distance=10):
+    """
+    Maps result rows, best first, to the (by cost, by distance) name lists
     """
-    try:
-        with open(file_name, "r") as f:
-            return json.load(f)
-    except FileNotFoundError:
-        print(f"The file {file_name} was not found.")
-    except Exception as e:
-        print(f"An error occurred: {e}")
-        return None
+    candidates = [id_map.names[i] for i in found]
+    by_cost = sorted(candidates[:top_k], key=lambda champ: champion_data[champ]["cost"])
+    return by_cost, candidates[:top_k_distance]
+
+
+def multi_search_batch(
+    member_sets,
+    weight_sets,
+    index,
+    id_map,
+    champion_data,
+    teams,
+    top_k=15,
+    top_k_distance=10,
+    allowed=None,
+    fusion="rrf",
+    rrf_k=60,
+    vectors=None,
+    rerank=0,
+):
+    """
+    Searches once per champion of every team with one faiss call and fuses per team
+
+    A champion close to several team members ranks above one close to a
+    single member, instead of both being judged against the team average.
+    The team's own champions and the rows outside allowed are never
+    returned; like search_batch, short rows are re-ranked exactly from
+    vectors when they are given.
+
+    Parameters:
+    member_sets (list): One (k, d) array of member embeddings per team
+    weight_sets (list): One (k,) weight array per team
+    index (faiss.Index): The loaded champion faiss index
+    id_map (IdMap): The row/name lookup of the index
+    champion_data (dict): The original champion data with 'cost' property
+    teams (list): The teams the members belong to
+    top_k (int, optional): The number of champions sorted by cost. Defaults to 15.
+    top_k_distance (int, optional): The number of champions sorted by distance. Defaults to 10.
+    allowed (np.array, optional): The (n,) boolean mask of rows that may be returned
+    fusion (str, optional): "rrf" or "sum", see query_composer.fuse. Defaults to "rrf".
+    rrf_k (int, optional): The reciprocal rank constant. Defaults to 60.
+    vectors (np.array, optional): The champion embeddings, used to fill short rows
+    rerank (int, optional): Re-rank rerank * k candidates against vectors, see search_index
+
+    Returns:
+    list: One (top champions by cost, top champions by distance) tuple per team
+    """
+    if not teams:
+        return []
+
+    if allowed is None:
+        allowed = np.ones(len(id_map), dtype=bool)
+    excluded = [{id_map.rows[name] for name in team} for team in teams]
+    top = max(top_k, top_k_distance)
+    params = None if allowed.all() else allowed_params(index, allowed)
+    found_sets = multi_search(
+        index, member_sets, weight_sets, top, excluded, params, fusion, rrf_k, vectors, rerank
+    )
+
+    results = []
+    with tracing.span("synergy.map") as mapping:
+        refilled = 0
+        for members, weights, rows, found in zip(member_sets, weight_sets, excluded, found_sets):
+            mask = allowed.copy()
+            mask[list(rows)] = False
+            if vectors is not None and len(found) < min(top, int(mask.sum())):
+                scores, ids = exact_member_search(
+                    normalize(members), vectors, mask, member_depth(top, len(rows))
+                )
+                owners = np.zeros(len(members), dtype=np.int64)
+                found = fuse(ids, scores, owners, weights, 1, top, fusion=fusion, rrf_k=rrf_k)[0]
+                refilled += 1
+            results.append(rank_names(found, id_map, champion_data, top_k, top_k_distance))
+        mapping.set(refilled=refilled)
+
+    return results
 
 
 def search(
     query_embedding,
-    index_path,
-    embeddings,
+    index,
+    id_map,
     champion_data,
     champion_names,
     top_k=15,
     sort_by_cost=False,
+    allowed=None,
+    query=None,
 ):
     """
     Search for the top_k nearest neighbors to the query_embedding
 
     Parameters:
-    query_embedding (np.array): The embedding of the query
-    index_path (str): The path to the faiss index
-    embeddings (dict): The embeddings dictionary
+    query_embedding (np.array): The (d,) embedding of the query, or the (k, d)
+    embeddings of champion_names, combined as query says
+    index (faiss.Index): The loaded champion faiss index
+    id_map (IdMap): The row/name lookup of the index
     champion_data (dict): The original champion data with 'cost' property
     top_k (int, optional): The number of nearest neighbors to return. Defaults to 10.
     sort_by_cost (bool, optional): If True, sort champions by cost. Defaults to False.
+    allowed (np.array, optional): The (n,) boolean mask of rows that may be returned
+    query (dict, optional): How the team embeddings are combined, see query_options
 
     Returns:
-    list: The names of the top_k nearest neighbors in the embeddings, optionally sorted by cost
+    list: The names of the top_k nearest neighbors in the index, optionally sorted by cost
     """
-    index = faiss.read_index(index_path)
+    query_embedding = np.asarray(query_embedding, dtype=np.float32)
+    if query_embedding.ndim == 2:
+        options = query_options(query)
+        weights = team_weights(champion_names, options, champion_data)
+        if options["mode"] == "multi":
+            by_cost, by_distance = multi_search_batch(
+                [query_embedding],
+                [weights],
+                index,
+                id_map,
+                champion_data,
+                [champion_names],
+                top_k,
+                top_k,
+                allowed,
+                options["fusion"],
+                options["rrf_k"],
+            )[0]
+            return by_cost if sort_by_cost else by_distance
+        query_embedding = centroid_queries([query_embedding], [weights])[0]
 
     # faiss requires the query to be a 2D array
-    query = np.array([query_embedding])
-    _, nearest_indices = index.search(query, top_k + len(champion_names))
-    nearest_champs = [list(embeddings.keys())[i] for i in nearest_indices[0]]
+    query = np.array([query_embedding], dtype=np.float32)
+    by_cost, by_distance = search_batch(
+        query, index, id_map, champion_data, [champion_names], top_k, top_k, allowed
+    )[0]
+
+    return by_cost if sort_by_cost else by_distance
+
+
+def recommend_batch(
+    vectors,
+    id_map,
+    champion_data,
+    index,
+    teams,
+    top_k_champs=15,
+    top_k_distance=10,
+    filters=None,
+    traits=None,
+    query=None,
+    rerank=0,
+):
+    """
+    Recommends synergistic champions for many teams with one faiss call
+
+    Parameters:
+    vectors (np.array): The champion embeddings in faiss row order
+    id_map (IdMap): The row/name lookup of the champion index
+    champion_data (dict): The original champion data with 'cost' property
+    index (faiss.Index): The loaded champion faiss index
+    teams (list): The teams, each a list of champion names
+    top_k_champs (int, optional): The number of champions sorted by cost. Defaults to 15.
+    top_k_distance (int, optional): The number of champions sorted by distance. Defaults to 10.
+    filters (dict, optional): Cost / trait filters shared by every team, see filter_mask
+    traits (TraitTable, optional): The trait table, required by the trait filters
+    query (dict, optional): How each team is combined into a search, see query_options
+    rerank (int, optional): Re-rank rerank * k index candidates exactly, see search_index
+
+    Returns:
+    list: One (by cost, by distance) tuple per team, or None for teams with unknown champions
+    """
+    options = query_options(query)
+    allowed = None
+    if filters:
+        with tracing.span("synergy.filter"):
+            costs = np.array([champion_data[name]["cost"] for name in id_map.names])
+            allowed = filter_mask(filters, id_map, costs, traits)
 
-    if sort_by_cost:
-        nearest_champs = sorted(
-            nearest_champs, key=lambda champ: champion_data[champ]["cost"]
+    known = [
+        position
+        for position, team in enumerate(teams)
+        if team and all(name in id_map for name in team)
+    ]
+    known_teams = [teams[position] for position in known]
+    weights = None
+    if not is_default(options):
+        weights = [team_weights(team, options, champion_data) for team in known_teams]
+
+    if options["mode"] == "multi":
+        member_sets = [vectors[[id_map.rows[name] for name in team]] for team in known_teams]
+        weights = weights or [team_weights(team, options) for team in known_teams]
+        found = multi_search_batch(
+            member_sets,
+            weights,
+            index,
+            id_map,
+            champion_data,
+            known_teams,
+            top_k_champs,
+            top_k_distance,
+            allowed,
+            options["fusion"],
+            options["rrf_k"],
+            vectors,
+            rerank,
+        )
+    else:
+        queries, _ = team_queries(vectors, id_map, known_teams, weights)
+        found = search_batch(
+            queries,
+            index,
+            id_map,
+            champion_data,
+            known_teams,
+            top_k_champs,
+            top_k_distance,
+            allowed,
+            vectors,
+            rerank,
         )
 
-    return nearest_champs[:top_k]
+    results = [None] * len(teams)
+    for position, result in zip(known, found):
+        results[position] = result
+    return results
 
 
-def main(config, champion_names, top_k_champs=15):
-    champ_data_pkl = load_pickle_data(config["champ_data_pkl"])
-    original_champ_data = load_json_data(config["champ_data_json"])
-    
-    try:
-        queries = [
-            champ_data_pkl["embeddings"][champion_name] for champion_name in champion_names
-        ]
-    except KeyError:
-        print("Make sure you enter a champ from the recent set.")
-        return None
+def recommend(
+    vectors,
+    id_map,
+    champion_data,
+    index,
+    champion_names,
+    top_k_champs=15,
+    filters=None,
+    traits=None,
+    query=None,
+    rerank=0,
+):
+    """
+    Recommends synergistic champions from already loaded artifacts
 
-    avg_query = np.mean(queries, axis=0)
+    Parameters:
+    vectors (np.array): The champion embeddings in faiss row order
+    id_map (IdMap): The row/name lookup of the champion index
+    champion_data (dict): The original champion data with 'cost' property
+    index (faiss.Index): The loaded champion faiss index
+    champion_names (list): The selected champion names
+    top_k_champs (int, optional): The number of champions sorted by cost. Defaults to 15.
+    filters (dict, optional): Cost / trait filters, see filter_mask
+    traits (TraitTable, optional): The trait table, required by the trait filters
+    query (dict, optional): How the team is combined into a search, see query_options
+    rerank (int, optional): Re-rank rerank * k index candidates exactly, see search_index
 
-    top_champs_by_cost = search(
-        avg_query,
-        config["embeddings"],
-        champ_data_pkl["embeddings"],
-        original_champ_data,
-        champion_names,
+    Returns:
+    tuple: The top champions by cost and by distance, or None for unknown champions
+    """
+    result = recommend_batch(
+        vectors,
+        id_map,
+        champion_data,
+        index,
+        [champion_names],
         top_k_champs,
-        sort_by_cost=True,
-    )
+        filters=filters,
+        traits=traits,
+        query=query,
+        rerank=rerank,
+    )[0]
+
+    if result is None:
+        print("Make sure you enter a champ from the recent set.")
+    return result
+
 
-    top_champs_by_distance = search(
-        avg_query,
-        config["embeddings"],
-        champ_data_pkl["embeddings"],
-        original_champ_data,
+def main(config, champion_names, top_k_champs=15, query=None):
+    with tracing.span("synergy.load_metadata"):
+        metadata = index_metadata(config["embeddings"], config["champ_data_json"])
+    index = load_index(config["embeddings"])
+    if index.ntotal != len(metadata.id_map):
+        raise ValueError(
+            f"{config['embeddings']} has {index.ntotal} rows but the metadata has {len(metadata.id_map)}."
+        )
+    with tracing.span("synergy.resolve_names"):
+        resolver = NameResolver(metadata.names, load_aliases("champions"))
+        champion_names = resolver.resolve_all(champion_names)
+
+    return recommend(
+        metadata.vectors,
+        metadata.id_map,
+        metadata.champion_data(),
+        index,
         champion_names,
-        top_k=10,
+        top_k_champs,
+        traits=metadata.traits,
+        query=query,
+        rerank=load_search_config()["rerank"],
     )
 
-    return top_champs_by_cost, top_champs_by_distance
-
 
 if __name__ == "__main__":
-    champion_names = input(
-        "Please enter the champion names separated by comma: "
-    ).split(", ")
+    champion_names = split_names(
+        input("Please enter the champion names separated by comma: ")
+    )
 
+    tracing.configure()
     config = load_config()
     main(config, champion_names)
@@ -0,0 +1,347 @@
+#tracing.py
+import os
+import time
+import bisect
+import logging
+import functools
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from dotenv import load_dotenv
+
+# Histogram bucket upper bounds in ms, Prometheus style (cumulative, plus +Inf)
+BUCKETS_MS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+SINK_TYPES = ("log", "histogram", "prometheus")
+METRIC_NAME = "tft_span_duration_seconds"
+
+# Checked by every span; False while no sink is configured and nothing records
+enabled = False
+sinks = []
+recorders = 0
+local = threading.local()
+lock = threading.Lock()
+
+
+def load_tracing_config():
+    load_dotenv()
+    return {
+        "sinks": [
+            sink.strip() for sink in os.getenv("TRACE_SINKS", "").split(",") if sink.strip()
+        ],
+        "log_level": os.getenv("TRACE_LOG_LEVEL", "INFO"),
+        "prometheus_port": int(os.getenv("TRACE_PROMETHEUS_PORT", 0)),
+    }
+
+
+class NullSpan:
+    """
+    The span handed out while tracing is off; does nothing
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+NULL_SPAN = NullSpan()
+
+
+class Span:
+    """
+    One timed section, passed to every sink when it ends
+    """
+
+    __slots__ = ("name", "attrs", "start", "ms")
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+        self.start = 0.0
+        self.ms = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.ms = (time.perf_counter() - self.start) * 1000
+        emit(self)
+        return False
+
+    def set(self, **attrs):
+        """
+        Adds attributes known only inside the span, such as a result count
+        """
+        self.attrs.update(attrs)
+
+
+def span(name, **attrs):
+    """
+    Times a block: with span("synergy.search", queries=8): ...
+
+    Parameters:
+    name (str): The span name, "<module>.<step>"
+    attrs: Extra values passed to the sinks, e.g. batch sizes
+
+    Returns:
+    Span: A context manager, a shared no-op one while tracing is off
+    """
+    if not enabled:
+        return NULL_SPAN
+    return Span(name, attrs)
+
+
+def traced(name):
+    """
+    Decorator timing every call of a function as one span
+    """
+
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return function(*args, **kwargs)
+            with Span(name, {}):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+def emit(finished):
+    for sink in sinks:
+        sink.record(finished)
+    recorded = getattr(local, "spans", None)
+    if recorded is not None:
+        recorded.append(finished)
+
+
+def update_enabled():
+    global enabled
+    enabled = bool(sinks) or recorders > 0
+
+
+def add_sink(sink):
+    """
+    Starts passing every finished span to sink.record(span)
+    """
+    with lock:
+        sinks.append(sink)
+        update_enabled()
+    return sink
+
+
+def remove_sink(sink):
+    with lock:
+        if sink in sinks:
+            sinks.remove(sink)
+        update_enabled()
+
+
+@contextmanager
+def recording():
+    """
+    Collects the spans finished by the current thread inside the block
+
+    Tracing is on while any thread records, even without sinks, so the
+    Streamlit debug view works without configuring TRACE_SINKS.
+
+    Returns:
+    list: The finished Span objects, filled in as the block runs
+    """
+    global recorders
+    recorded = []
+    previous = getattr(local, "spans", None)
+    local.spans = recorded
+    with lock:
+        recorders += 1
+        update_enabled()
+    try:
+        yield recorded
+    finally:
+        local.spans = previous
+        with lock:
+            recorders -= 1
+            update_enabled()
+
+
+class LogSink:
+    """
+    Writes one log line per span
+    """
+
+    def __init__(self, logger=None, level=logging.INFO):
+        self.logger = logger or logging.getLogger("tracing")
+        self.level = level
+
+    def record(self, finished):
+        if self.logger.isEnabledFor(self.level):
+            attrs = "".join(f" {key}={value}" for key, value in finished.attrs.items())
+            self.logger.log(self.level, "%s %.3f ms%s", finished.name, finished.ms, attrs)
+
+
+class HistogramSink:
+    """
+    Counts span durations per name in fixed buckets, in memory
+    """
+
+    def __init__(self, buckets_ms=BUCKETS_MS):
+        self.buckets_ms = tuple(buckets_ms)
+        self.histograms = {}
+        self.lock = threading.Lock()
+
+    def record(self, finished):
+        bucket = bisect.bisect_left(self.buckets_ms, finished.ms)
+        with self.lock:
+            histogram = self.histograms.get(finished.name)
+            if histogram is None:
+                histogram = self.histograms[finished.name] = {
+                    "counts": [0] * (len(self.buckets_ms) + 1),
+                    "sum_ms": 0.0,
+                }
+            histogram["counts"][bucket] += 1
+            histogram["sum_ms"] += finished.ms
+
+    def copy(self):
+        """
+        Returns:
+        dict: {span name: (bucket counts, sum_ms)}, consistent under concurrent record()
+        """
+        with self.lock:
+            return {
+                name: (list(histogram["counts"]), histogram["sum_ms"])
+                for name, histogram in self.histograms.items()
+            }
+
+    def quantile(self, counts, q):
+        """
+        The upper bound of the bucket holding the q quantile, None past the last bound
+        """
+        target = q * sum(counts)
+        seen = 0
+        for bound, count in zip(self.buckets_ms, counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return None
+
+    def snapshot(self):
+        """
+        Returns:
+        dict: {span name: count, mean_ms and bucket estimates of p50_ms / p99_ms}
+        """
+        histograms = self.copy()
+        report = {}
+        for name, (counts, sum_ms) in sorted(histograms.items()):
+            total = sum(counts)
+            report[name] = {
+                "count": total,
+                "mean_ms": sum_ms / total,
+                "p50_ms": self.quantile(counts, 0.5),
+                "p99_ms": self.quantile(counts, 0.99),
+            }
+        return report
+
+    def prometheus_text(self):
+        """
+        Renders the histograms in the Prometheus text exposition format
+        """
+        histograms = self.copy()
+        lines = [
+            f"# HELP {METRIC_NAME} Duration of traced builder spans.",
+            f"# TYPE {METRIC_NAME} histogram",
+        ]
+        for name, (counts, sum_ms) in sorted(histograms.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets_ms + (None,), counts):
+                cumulative += count
+                le = "+Inf" if bound is None else repr(bound / 1000)
+                lines.append(f'{METRIC_NAME}_bucket{{span="{name}",le="{le}"}} {cumulative}')
+            lines.append(f'{METRIC_NAME}_sum{{span="{name}"}} {sum_ms / 1000}')
+            lines.append(f'{METRIC_NAME}_count{{span="{name}"}} {cumulative}')
+        return "\n".join(lines) + "\n"
+
+
+class PrometheusSink(HistogramSink):
+    """
+    A histogram sink that can also serve itself on /metrics for scraping
+    """
+
+    def serve(self, port, host="0.0.0.0"):
+        """
+        Serves prometheus_text() from a daemon thread
+
+        Returns:
+        ThreadingHTTPServer: The running server
+        """
+        sink = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+                body = sink.prometheus_text().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+def configure(config=None):
+    """
+    Replaces the sinks with the ones named in the tracing config
+
+    Parameters:
+    config (dict, optional): The tracing config. Defaults to load_tracing_config().
+
+    Returns:
+    list: The new sinks, empty when tracing is off
+    """
+    config = config or load_tracing_config()
+    for name in config["sinks"]:
+        if name not in SINK_TYPES:
+            raise ValueError(f"Unknown trace sink {name}, expected one of {', '.join(SINK_TYPES)}.")
+
+    for sink in list(sinks):
+        remove_sink(sink)
+
+    new_sinks = []
+    if "log" in config["sinks"]:
+        logger = logging.getLogger("tracing")
+        if not logger.handlers:
+            logger.addHandler(logging.StreamHandler())
+        logger.setLevel(config["log_level"])
+        new_sinks.append(LogSink(logger, logger.level))
+    if "prometheus" in config["sinks"]:
+        sink = PrometheusSink()
+        if config["prometheus_port"]:
+            sink.serve(config["prometheus_port"])
+        new_sinks.append(sink)
+    elif "histogram" in config["sinks"]:
+        new_sinks.append(HistogramSink())
+
+    for sink in new_sinks:
+        add_sink(sink)
+    return new_sinks
+
+
+def histogram_sink():
+    """
+    Returns the configured histogram (or Prometheus) sink, or None
+    """
+    return next((sink for sink in sinks if isinstance(sink, HistogramSink)), None)
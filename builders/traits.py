@@ -0,0 +1,191 @@
+#traits.py
+import os
+import re
+import numpy as np
+from builders.atomic import replacing
+
+# Bump when the layout of the trait table file changes
+TRAIT_TABLE_VERSION = 1
+
+BREAKPOINT_PATTERN = re.compile(r"^\s*(\d+)\s*:", re.MULTILINE)
+
+
+def parse_breakpoints(description):
+    """
+    Parses the unit counts of a trait description such as "2: ... 4: ..."
+
+    Parameters:
+    description (str): The trait description
+
+    Returns:
+    list: The sorted breakpoints, [1] for unique traits without any
+    """
+    breakpoints = sorted({int(count) for count in BREAKPOINT_PATTERN.findall(description)})
+    return breakpoints or [1]
+
+
+def trait_path(index_path):
+    """
+    Returns the trait table path stored alongside the champion index
+
+    Parameters:
+    index_path (str): The path to the champion faiss index, e.g. embeddings/champs.faiss
+
+    Returns:
+    str: The trait table path, e.g. embeddings/champs.traits.npz
+    """
+    return os.path.splitext(index_path)[0] + ".traits.npz"
+
+
+class TraitTable:
+    """
+    Traits, their breakpoints and the traits of every champion
+
+    Trait ids are positions in names. masks[row] has bit t set when the
+    champion champions[row] has trait t, and inverted[t] lists the rows of
+    the champions with trait t.
+    """
+
+    def __init__(self, names, breakpoints, masks, champions):
+        self.names = list(names)
+        self.ids = {name: trait for trait, name in enumerate(self.names)}
+        self.breakpoints = [list(points) for points in breakpoints]
+        self.masks = np.asarray(masks, dtype=np.uint64)
+        self.champions = list(champions)
+
+        bits = np.uint64(1) << np.arange(len(self.names), dtype=np.uint64)
+        # (champions, traits) membership matrix for vectorized counting
+        self.members = (self.masks[:, None] & bits[None, :]) != 0
+
+        # levels[t, c] is how many breakpoints of trait t c units reach
+        max_count = max(points[-1] for points in self.breakpoints)
+        self.levels = np.zeros((len(self.names), max_count + 1), dtype=np.int32)
+        for trait, points in enumerate(self.breakpoints):
+            for point in points:
+                self.levels[trait, point:] += 1
+        self.tiers = np.array([len(points) for points in self.breakpoints])
+        self.inverted = [np.flatnonzero(column) for column in self.members.T]
+
+    def mask(self, trait_names):
+        """
+        Returns the bitmask of the given trait names
+        """
+        mask = np.uint64(0)
+        for name in trait_names:
+            mask |= np.uint64(1) << np.uint64(self.ids[name])
+        return mask
+
+    def rows_with_any(self, trait_names):
+        """
+        Returns a boolean row filter of the champions with any of the traits
+        """
+        return (self.masks & self.mask(trait_names)) != 0
+
+    def counts(self, rows):
+        """
+        Returns the unit count of every trait for the given champion rows
+        """
+        return self.members[rows].sum(axis=0)
+
+    def active(self, counts):
+        """
+        Returns {trait name: unit count} of the traits with a breakpoint reached
+        """
+        reached = self.levels[np.arange(len(self.names)), np.minimum(counts, self.levels.shape[1] - 1)]
+        return {
+            self.names[trait]: int(counts[trait])
+            for trait in np.flatnonzero(reached)
+        }
+
+
+def build_trait_table(champion_data, champion_names=None):
+    """
+    Builds the trait table from the scraped champion data
+
+    Parameters:
+    champion_data (dict): The original champion data with origin/class details
+    champion_names (list, optional): The champion row order. Defaults to the data order.
+
+    Returns:
+    TraitTable: The traits with champion masks in the given row order
+    """
+    champion_names = list(champion_data) if champion_names is None else list(champion_names)
+
+    descriptions = {}
+    for champ in champion_data.values():
+        for details in (champ["origin_details"], champ["class_details"]):
+            for trait, description in details.items():
+                descriptions.setdefault(trait, description)
+
+    names = sorted(descriptions)
+    if len(names) > 64:
+        raise ValueError(f"{len(names)} traits do not fit in 64-bit masks.")
+    trait_ids = {name: trait for trait, name in enumerate(names)}
+
+    masks = np.zeros(len(champion_names), dtype=np.uint64)
+    for row, champ_name in enumerate(champion_names):
+        champ = champion_data[champ_name]
+        for trait in list(champ["origin_details"]) + list(champ["class_details"]):
+            masks[row] |= np.uint64(1) << np.uint64(trait_ids[trait])
+
+    return TraitTable(
+        names,
+        [parse_breakpoints(descriptions[name]) for name in names],
+        masks,
+        champion_names,
+    )
+
+
+def save_trait_table(table, file_name):
+    """
+    Saves a trait table as flat arrays, ragged lists as values + offsets
+    """
+    inverted_lengths = [len(rows) for rows in table.inverted]
+    with replacing(file_name) as temp_name:
+        np.savez(
+            temp_name,
+            version=TRAIT_TABLE_VERSION,
+            names=np.array(table.names),
+            champions=np.array(table.champions),
+            masks=table.masks,
+            breakpoints=np.concatenate([np.array(p, dtype=np.int32) for p in table.breakpoints]),
+            breakpoint_offsets=np.cumsum([0] + [len(p) for p in table.breakpoints]),
+            inverted=np.concatenate(table.inverted).astype(np.int32),
+            inverted_offsets=np.cumsum([0] + inverted_lengths),
+        )
+
+
+def load_trait_table(file_name, champion_names=None):
+    """
+    Loads a trait table, reordering its rows to the champion index
+
+    Parameters:
+    file_name (str): The path to the trait table file
+    champion_names (list, optional): The champion row order of the index
+
+    Returns:
+    TraitTable: The loaded trait table
+    """
+    with np.load(file_name) as data:
+        if int(data["version"]) != TRAIT_TABLE_VERSION:
+            raise ValueError(
+                f"{file_name} has trait table version {int(data['version'])}, expected {TRAIT_TABLE_VERSION}."
+            )
+        offsets = data["breakpoint_offsets"]
+        breakpoints = [
+            data["breakpoints"][start:end].tolist()
+            for start, end in zip(offsets[:-1], offsets[1:])
+        ]
+        names = data["names"].tolist()
+        champions = data["champions"].tolist()
+        masks = data["masks"]
+
+    if champion_names is not None:
+        rows = {name: row for row, name in enumerate(champions)}
+        missing = [name for name in champion_names if name not in rows]
+        if missing:
+            raise ValueError(f"{file_name} has no traits for {', '.join(missing)}.")
+        masks = masks[[rows[name] for name in champion_names]]
+        champions = list(champion_names)
+
+    return TraitTable(names, breakpoints, masks, champions)
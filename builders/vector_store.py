@@ -0,0 +1,54 @@
+#vector_store.py
+import os
+import numpy as np
+from builders.atomic import replacing
+
+
+def vectors_path(index_path):
+    """
+    Returns the embedding matrix path stored alongside a faiss index
+
+    Parameters:
+    index_path (str): The path to the faiss index, e.g. embeddings/champs.faiss
+
+    Returns:
+    str: The matrix path, e.g. embeddings/champs.npy
+    """
+    return os.path.splitext(index_path)[0] + ".npy"
+
+
+def save_vectors(vectors, file_name):
+    """
+    Saves the embeddings as one contiguous float32 matrix, replacing the file at once
+
+    Parameters:
+    vectors (np.array): The (n, d) embeddings in faiss row order
+    file_name (str): The path to the .npy file
+    """
+    with replacing(file_name) as temp_name:
+        np.save(temp_name, np.ascontiguousarray(vectors, dtype=np.float32))
+
+
+def load_vectors(file_name, id_map=None):
+    """
+    Memory-maps the embedding matrix, so worker processes share its pages
+
+    Parameters:
+    file_name (str): The path to the .npy file
+    id_map (IdMap, optional): The id map the rows must line up with
+
+    Returns:
+    np.memmap: The read-only (n, d) float32 matrix
+    """
+    vectors = np.load(file_name, mmap_mode="r")
+
+    if vectors.dtype != np.float32 or vectors.ndim != 2:
+        raise ValueError(
+            f"{file_name} must hold a 2D float32 matrix, got {vectors.dtype} {vectors.shape}."
+        )
+    if id_map is not None and vectors.shape[0] != len(id_map):
+        raise ValueError(
+            f"{file_name} has {vectors.shape[0]} rows but the id map has {len(id_map)}."
+        )
+
+    return vectors
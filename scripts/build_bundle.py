@@ -0,0 +1,61 @@
+# build_bundle.py
+"""
+Packs the artifacts configured in .env into a versioned set / patch bundle
+that the app and the service can load next to other sets.
+
+    python -m scripts.build_bundle --set set11 --patch 14.6
+    python -m scripts.build_bundle --list
+    python -m scripts.build_bundle --verify set11/14.6
+"""
+import os
+import sys
+import argparse
+from builders.bundles import (
+    build_bundle,
+    list_bundles,
+    load_bundle_config,
+    read_manifest,
+    verify_bundle,
+)
+from builders.item_builder import load_config, load_config_items
+
+
+def main(argv=None):
+    root = load_bundle_config()["root"]
+    parser = argparse.ArgumentParser(description="Build, list and verify artifact bundles.")
+    parser.add_argument("--set", dest="set_name", help="The set of the new bundle, e.g. set11.")
+    parser.add_argument("--patch", help="The patch of the new bundle, e.g. 14.6.")
+    parser.add_argument("--root", default=root, help=f"The bundles folder. Defaults to {root}.")
+    parser.add_argument("--list", action="store_true", help="List the bundles and exit.")
+    parser.add_argument("--verify", metavar="SET/PATCH", help="Check a bundle against its manifest.")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for set_name, patches in list_bundles(args.root).items():
+            for patch in patches:
+                manifest = read_manifest(os.path.join(args.root, set_name, patch))
+                print(f"{set_name}/{patch}  {manifest['checksum'][:12]}  {len(manifest['files'])} files")
+        return 0
+
+    if args.verify:
+        try:
+            manifest = verify_bundle(os.path.join(args.root, args.verify))
+        except ValueError as e:
+            print(e)
+            return 1
+        print(f"{args.verify} is intact, checksum {manifest['checksum']}")
+        return 0
+
+    if not args.set_name or not args.patch:
+        parser.error("--set and --patch are required to build a bundle")
+    try:
+        path = build_bundle(args.set_name, args.patch, load_config(), load_config_items(), args.root)
+    except ValueError as e:
+        print(e)
+        return 1
+    print(f"Built {path}, checksum {read_manifest(path)['checksum']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,48 @@
+# build_metadata.py
+"""
+Rewrites the binary metadata files (embeddings/champs.meta.bin and
+embeddings/items.meta.bin) from the json, id map and trait table files
+configured in .env. The vectors stay in the .npy files, which the metadata
+loader memory-maps. The embedding scripts write them too; rerun this
+after scraping new costs or traits without re-embedding.
+
+    python -m scripts.build_metadata
+    python -m scripts.build_metadata --check
+"""
+import sys
+import argparse
+from builders.item_builder import load_config, load_config_items
+from builders.metadata import build_metadata, load_metadata, metadata_path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or check the binary metadata files.")
+    parser.add_argument("--check", action="store_true", help="Only validate the existing files.")
+    args = parser.parse_args(argv)
+
+    config = load_config()
+    config_items = load_config_items()
+    if args.check:
+        status = 0
+        for index_path in (config["embeddings"], config_items["i_embeddings"]):
+            try:
+                metadata = load_metadata(metadata_path(index_path))
+            except (OSError, ValueError) as e:
+                print(e)
+                status = 1
+                continue
+            print(f"{metadata_path(index_path)}: {len(metadata.names)} rows, dim {metadata.vectors.shape[1]}")
+        return status
+
+    sources = ((config["embeddings"], config["champ_data_json"]), (config_items["i_embeddings"], None))
+    for index_path, data in sources:
+        try:
+            print(f"Wrote {build_metadata(index_path, data)}")
+        except ValueError as e:
+            print(e)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,34 +1,26 @@
 import json
-import numpy as np
-import faiss
-import pickle
-import openai
 from dotenv import load_dotenv
 import os
-
-from tenacity import (
-    retry,
-    stop_after_attempt,
-    wait_exponential,
-    retry_if_exception_type,
+from builders.metadata import build_metadata
+from scripts.corpus_store import CorpusStore, build_corpus, corpus_path, finalize_corpus
+from scripts.embedding_pipeline import (
+    EmbeddingCache,
+    embed_texts,
+    get_provider,
+    load_pipeline_config,
 )
 
 
 # Load Environment Variables
 load_dotenv()
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 CHAMP_DATA_PKL = os.getenv("CHAMP_DATA_PKL")
 CHAMP_DATA_JSON = os.getenv("CHAMP_DATA_JSON")
 EMBEDDINGS_PATH = os.getenv("EMBEDDINGS_PATH")
-EMBEDDING_MODEL = "text-embedding-3-small"
 
-if not all([OPENAI_API_KEY, CHAMP_DATA_PKL, CHAMP_DATA_JSON, EMBEDDINGS_PATH]):
+if not all([CHAMP_DATA_PKL, CHAMP_DATA_JSON, EMBEDDINGS_PATH]):
     raise EnvironmentError("Some required environment variables are missing.")
 
 
-openai.api_key = OPENAI_API_KEY
-
-
 def load_data(file_name):
     """
     Load JSON data from a file.
@@ -38,38 +30,20 @@ def load_data(file_name):
     return data
 
 
-def preprocess_data(champs):
+def iter_documents(champs):
     """
-    Preprocess the champion data and extract the embeddings.
+    Yield a (champion name, normalized text) pair per champion.
     """
-    docs = {}
-    embeddings = {}
     for champ_name, spells_dict in champs.items():
         spell_content = str(spells_dict).replace("{", "").replace("}", "")
-        docs["stats"] = spell_content
-        embeddings[champ_name] = extract_embeddings(spell_content)
-    return docs, embeddings
+        yield champ_name, clean_description(spell_content)
 
 
-# using tenacity to throttle openai calls
-@retry(
-    stop=stop_after_attempt(10),
-    wait=wait_exponential(multiplier=1, min=2, max=30),
-    retry=retry_if_exception_type(
-        (
-            openai.error.ServiceUnavailableError,
-            openai.error.APIConnectionError,
-            openai.error.RateLimitError,
-            openai.error.Timeout,
-            openai.error.APIError,
-        )
-    ),
-)
-def extract_embeddings(desc):
+def clean_description(desc):
     """
-    Extract embeddings from the description using the OpenAI API.
+    Strip the characters that add noise to the embeddings.
     """
-    desc = (
+    return (
         desc.replace("\\n", " ")
         .replace("'", "")
         .replace("  ", " ")
@@ -77,41 +51,6 @@ def extract_embeddings(desc):
         .replace("+", "")
         .replace("%", "")
     )
-    response = openai.Embedding.create(model=EMBEDDING_MODEL, input=[desc])
-    embedding = np.array(response["data"][0]["embedding"])
-    return embedding
-
-
-def build_faiss_index(embeddings):
-    """
-    Build a Faiss index from the embeddings.
-    """
-    # Note: OpenAI dimensions are always 1536 (as of 07.2023)
-    dimension = embeddings[list(embeddings.keys())[0]].shape[0]
-
-    # Initialize the index
-    index = faiss.IndexFlatIP(dimension)
-
-    # Add vectors to the index
-    for i, (title, embedding) in enumerate(embeddings.items()):
-        index.add(np.array([embedding]))
-
-    return index
-
-
-def save_faiss_index(index, file_name):
-    """
-    Save a Faiss index to a file.
-    """
-    faiss.write_index(index, file_name)
-
-
-def save_data(data, file_name):
-    """
-    Save data to a file using pickle.
-    """
-    with open(file_name, "wb") as f:
-        pickle.dump(data, f)
 
 
 def main():
@@ -119,10 +58,30 @@ def main():
     Main execution function.
     """
     tft_champ_data = load_data(CHAMP_DATA_JSON)
-    docs, embeddings = preprocess_data(tft_champ_data)
-    index = build_faiss_index(embeddings)
-    save_faiss_index(index, EMBEDDINGS_PATH)
-    save_data({"docs": docs, "embeddings": embeddings}, CHAMP_DATA_PKL)
+    pipeline_config = load_pipeline_config()
+    provider = get_provider(pipeline_config["provider"])
+    cache = EmbeddingCache(pipeline_config["cache_path"])
+
+    def embed(texts):
+        return embed_texts(
+            texts,
+            provider,
+            cache,
+            pipeline_config["batch_size"],
+            pipeline_config["max_workers"],
+        )
+
+    # Records are streamed to the store, so an interrupted build resumes
+    store = CorpusStore(
+        corpus_path(EMBEDDINGS_PATH), provider.model, getattr(provider, "dimension", None)
+    )
+    names = build_corpus(
+        iter_documents(tft_champ_data), store, embed, pipeline_config["batch_size"]
+    )
+    cache.close()
+    finalize_corpus(store, names, EMBEDDINGS_PATH, CHAMP_DATA_PKL)
+    # The names, costs and traits the query path memory-maps next to the .npy
+    build_metadata(EMBEDDINGS_PATH, CHAMP_DATA_JSON)
 
 
 if __name__ == "__main__":
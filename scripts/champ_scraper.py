@@ -1,42 +1,45 @@
 # champ_scraper.py
-import requests
 import json
 import os
 from bs4 import BeautifulSoup
+from dotenv import load_dotenv
+from builders.assets import image_name
+from builders.id_map import id_map_path
+from builders.metadata import build_metadata
+from builders.traits import build_trait_table, save_trait_table, trait_path
+from scripts.fetcher import Fetcher, load_fetch_config
+from scripts.page_parser import PARSERS, champion_data_from, parse_page, synergy_name
 
-HEADERS = {
-    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/74.0.3729.169 Safari/537.36"
-}
-
-BASE_URL = "https://www.mobafire.com/"
 CHAMPIONS_PAGE = "teamfight-tactics/champions"
+# Formatted with the scraped set, e.g. images/tft/set11/champion/icon
+IMAGE_PATH = "images/tft/{set_name}/champion/icon"
 IMAGE_FOLDER = "assets/images/champions"
 DATA_FILE = "data/champ_data.json"
 
+load_dotenv()
+# The trait table is read next to the champion index, e.g. embeddings/champs.traits.npz
+EMBEDDINGS_PATH = os.getenv("EMBEDDINGS_PATH", "embeddings/champs.faiss")
+TRAITS_FILE = trait_path(EMBEDDINGS_PATH)
+
 # If the directory does not exist, create it.
 if not os.path.exists(IMAGE_FOLDER):
     os.makedirs(IMAGE_FOLDER)
 
 
-def get_page_html(url):
-    try:
-        response = requests.get(url, headers=HEADERS)
-        response.raise_for_status()
-    except (requests.RequestException, ValueError):
-        print("Network or URL error")
-        return None
-    return BeautifulSoup(response.content, "html.parser")
-
-
-def save_image(url, champ_name):
-    try:
-        img_data = requests.get(url).content
-    except (requests.RequestException, ValueError):
-        print("Network or URL error")
-        return
-    name = champ_name.replace("/", "-")
-    with open(os.path.join(IMAGE_FOLDER, f"{name}.png"), "wb") as handler:
-        handler.write(img_data)
+def image_jobs(fetcher, champion_names, image_folder=IMAGE_FOLDER):
+    """
+    Returns the (url, file name) download of every champion icon
+    """
+    jobs = []
+    for name in champion_names:
+        slug = name.replace(" ", "-").replace("'", "").replace("/", "-").lower()
+        jobs.append(
+            (
+                fetcher.url(f"{IMAGE_PATH.format(set_name=fetcher.set_name)}/{slug}.png"),
+                os.path.join(image_folder, f"{image_name(name)}.png"),
+            )
+        )
+    return jobs
 
 
 def get_details(div_name, page):
@@ -67,22 +70,14 @@ def get_champion_data(page, origin_details, class_details):
 
         for synergies in champion_table.select("span.synergies"):
             for img in synergies.select("img"):
-                src = img.get("src")
                 # Extract the last word from the src attribute
-                synergy = src.split("/")[-1].split(".")[0].title().replace("-", " ")
+                synergy = synergy_name(img.get("src"))
 
                 if synergy in origin_details:
                     champion_origin_details[synergy] = origin_details[synergy]
                 if synergy in class_details:
                     champion_class_details[synergy] = class_details[synergy]
 
-        # Save the image for each champion
-        image_name = name.replace(" ", "-").replace("'", "").replace("/","-").lower()
-        champ_image_url = (
-            f"https://www.mobafire.com/images/tft/set11/champion/icon/{image_name}.png"
-        )
-        save_image(champ_image_url, name)
-
         champion_data[name] = {
             "cost": cost,
             "ability_text": ability_text,
@@ -93,20 +88,63 @@ def get_champion_data(page, origin_details, class_details):
     return champion_data
 
 
-def main():
-    champions_page = get_page_html(BASE_URL + CHAMPIONS_PAGE)
-    if not champions_page:
-        print("Failed to retrieve HTML content")
-        return
-
-    origin_details = get_details("origins", champions_page)
-    class_details = get_details("classes", champions_page)
-    champion_data = get_champion_data(champions_page, origin_details, class_details)
+def parse_champions_page(content, parser="stream"):
+    """
+    Reads the traits and champions of the champions page
+
+    Parameters:
+    content (bytes): The page html
+    parser (str, optional): "stream" for the single-pass page parser, "soup"
+        for a BeautifulSoup tree. Defaults to "stream".
+
+    Returns:
+    dict: The champion data, keyed by champion name
+    """
+    if parser not in PARSERS:
+        raise ValueError(f"parser must be one of {', '.join(PARSERS)}, got {parser}.")
+    if parser == "stream":
+        return champion_data_from(parse_page(content, ("origins", "classes", "champions")))
+
+    page = BeautifulSoup(content, "html.parser")
+    origin_details = get_details("origins", page)
+    class_details = get_details("classes", page)
+    return get_champion_data(page, origin_details, class_details)
+
+
+def main(
+    config=None,
+    image_folder=IMAGE_FOLDER,
+    data_file=DATA_FILE,
+    traits_file=TRAITS_FILE,
+    index_path=EMBEDDINGS_PATH,
+):
+    config = config or load_fetch_config()
+    with Fetcher(config) as fetcher:
+        content = fetcher.get_page(CHAMPIONS_PAGE)
+        if not content:
+            print("Failed to retrieve HTML content")
+            return
+
+        champion_data = parse_champions_page(content, config["parser"])
+
+        # Download the champion icons concurrently, skipping unchanged ones
+        results = fetcher.download_all(image_jobs(fetcher, champion_data, image_folder))
+        print(f"Champion images: {dict(results)}")
 
     # Save the data to a JSON file
-    with open(DATA_FILE, "w") as f:
+    with open(data_file, "w") as f:
         json.dump(champion_data, f, indent=4)
 
+    # Save the parsed trait table (breakpoints, champion bitmasks, inverted lists)
+    save_trait_table(build_trait_table(champion_data), traits_file)
+
+    # Refresh the costs and traits of the metadata file, once the index was built
+    if index_path and os.path.exists(id_map_path(index_path)):
+        try:
+            print(f"Wrote {build_metadata(index_path, data_file)}")
+        except ValueError as e:
+            print(f"Could not rebuild the metadata, rerun the embedding script: {e}")
+
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
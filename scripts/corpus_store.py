@@ -0,0 +1,252 @@
+#corpus_store.py
+import os
+import json
+import pickle
+import hashlib
+import numpy as np
+from builders.atomic import replacing
+from builders.id_map import id_map_path, save_id_map
+from builders.index_factory import build_index, load_index_config, normalize, save_index
+from builders.vector_store import load_vectors, vectors_path
+
+# Rows copied / normalized at a time when finalizing, keeps memory flat
+CHUNK_ROWS = 4096
+
+
+def corpus_path(index_path):
+    """
+    Returns the corpus store directory kept alongside a faiss index
+
+    Parameters:
+    index_path (str): The path to the faiss index, e.g. embeddings/champs.faiss
+
+    Returns:
+    str: The store directory, e.g. embeddings/champs.corpus
+    """
+    return os.path.splitext(index_path)[0] + ".corpus"
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class CorpusStore:
+    """
+    Append-only on-disk store of (name, text, embedding) records
+
+    Records go to records.jsonl and their vectors to vectors.f32, one raw
+    float32 row per record. A record whose name was stored before replaces
+    the older one at finalize time. Opening a store left behind by an
+    interrupted build drops any half-written record, so the build resumes
+    after the last complete one.
+
+    meta.json records the embedding model and dimension. Opening the store
+    with another model or dimension empties it, since its vectors are not
+    comparable with the new ones.
+    """
+
+    def __init__(self, directory, model=None, dimension=None):
+        self.directory = directory
+        self.records_file = os.path.join(directory, "records.jsonl")
+        self.vectors_file = os.path.join(directory, "vectors.f32")
+        self.meta_file = os.path.join(directory, "meta.json")
+        os.makedirs(directory, exist_ok=True)
+
+        self.model = model
+        self.dimension = dimension
+        if os.path.exists(self.meta_file):
+            with open(self.meta_file) as f:
+                meta = json.load(f)
+            stale = (model is not None and meta.get("model") != model) or (
+                dimension is not None and meta.get("dimension") not in (None, dimension)
+            )
+            if stale:
+                print(
+                    f"The store {directory} holds {meta.get('model')} vectors of dimension "
+                    f"{meta.get('dimension')}, re-embedding with {model}."
+                )
+                self._clear()
+            else:
+                self.model = meta.get("model")
+                self.dimension = meta.get("dimension")
+        if not os.path.exists(self.meta_file):
+            self._write_meta()
+
+        # name -> (row, text hash) of the latest record, names only in memory
+        self.latest = {}
+        self.count = 0
+        self._recover()
+
+    def _write_meta(self):
+        with open(self.meta_file, "w") as f:
+            json.dump({"model": self.model, "dimension": self.dimension}, f)
+
+    def _clear(self):
+        for file_name in (self.records_file, self.vectors_file, self.meta_file):
+            if os.path.exists(file_name):
+                os.remove(file_name)
+
+    def _recover(self):
+        """
+        Reads the record index and truncates a partially written tail
+        """
+        offset = 0
+        lines = []
+        if os.path.exists(self.records_file):
+            with open(self.records_file, "rb") as f:
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break
+                    lines.append((offset, line))
+                    offset += len(line)
+
+        rows = 0
+        if self.dimension and os.path.exists(self.vectors_file):
+            rows = os.path.getsize(self.vectors_file) // (4 * self.dimension)
+
+        self.count = min(len(lines), rows)
+        record_bytes = lines[self.count][0] if self.count < len(lines) else offset
+
+        for row, (_, line) in enumerate(lines[: self.count]):
+            record = json.loads(line)
+            self.latest[record["name"]] = (row, record["hash"])
+
+        for file_name, size in (
+            (self.records_file, record_bytes),
+            (self.vectors_file, self.count * 4 * (self.dimension or 0)),
+        ):
+            if os.path.exists(file_name) and os.path.getsize(file_name) != size:
+                with open(file_name, "r+b") as f:
+                    f.truncate(size)
+
+    def has(self, name, text):
+        """
+        Returns True if the name is stored with exactly this text
+        """
+        return self.latest.get(name, (None, None))[1] == text_hash(text)
+
+    def append(self, records):
+        """
+        Appends (name, text, vector) records, vectors first so a crash
+        never leaves a record without its vector
+        """
+        records = list(records)
+        if not records:
+            return
+
+        if self.dimension is None:
+            self.dimension = len(records[0][2])
+            self._write_meta()
+        for name, _, vector in records:
+            if len(vector) != self.dimension:
+                raise ValueError(
+                    f"{name} has a vector of dimension {len(vector)}, the store holds {self.dimension}."
+                )
+
+        with open(self.vectors_file, "ab") as f:
+            for _, _, vector in records:
+                f.write(np.asarray(vector, dtype=np.float32).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+
+        with open(self.records_file, "a") as f:
+            for name, text, _ in records:
+                line = {"name": name, "text": text, "hash": text_hash(text)}
+                f.write(json.dumps(line) + "\n")
+                self.latest[name] = (self.count, line["hash"])
+                self.count += 1
+            f.flush()
+            os.fsync(f.fileno())
+
+    def vectors(self):
+        """
+        Memory-maps the stored vectors as an (n, d) float32 matrix
+        """
+        return np.memmap(
+            self.vectors_file, dtype=np.float32, mode="r", shape=(self.count, self.dimension)
+        )
+
+    def texts(self, names):
+        """
+        Streams {name: text} of the latest records of the given names
+        """
+        wanted = {self.latest[name][0] for name in names}
+        docs = {}
+        with open(self.records_file) as f:
+            for row, line in enumerate(f):
+                if row in wanted:
+                    record = json.loads(line)
+                    docs[record["name"]] = record["text"]
+        return docs
+
+
+def build_corpus(documents, store, embed, batch_size=64):
+    """
+    Embeds a stream of documents into the store, skipping stored ones
+
+    Parameters:
+    documents (iterable): (name, normalized text) pairs, e.g. a generator
+    store (CorpusStore): The store to append to
+    embed (callable): Takes a list of texts and returns one vector per text
+    batch_size (int, optional): Documents embedded and written at a time. Defaults to 64.
+
+    Returns:
+    list: The document names in input order
+    """
+    names = []
+    pending = []
+
+    def flush():
+        vectors = embed([text for _, text in pending])
+        store.append(
+            (name, text, vector) for (name, text), vector in zip(pending, vectors)
+        )
+        pending.clear()
+
+    for name, text in documents:
+        names.append(name)
+        if store.has(name, text):
+            continue
+        pending.append((name, text))
+        if len(pending) >= batch_size:
+            flush()
+
+    if pending:
+        flush()
+    return names
+
+
+def finalize_corpus(store, names, index_path, data_pkl):
+    """
+    Writes the id map, normalized matrix, faiss index and docs from the store
+
+    Parameters:
+    store (CorpusStore): The store holding every name
+    names (list): The names in the order they should get index rows
+    index_path (str): The path to the faiss index to write
+    data_pkl (str): The path to the docs pickle to write
+    """
+    rows = np.array([store.latest[name][0] for name in names], dtype=np.int64)
+    source = store.vectors()
+
+    # Written next to the live matrix and renamed over it, a running engine
+    # keeps reading the old one until it reloads
+    with replacing(vectors_path(index_path)) as temp_name:
+        matrix = np.lib.format.open_memmap(
+            temp_name,
+            mode="w+",
+            dtype=np.float32,
+            shape=(len(rows), store.dimension),
+        )
+        for start in range(0, len(rows), CHUNK_ROWS):
+            chunk = rows[start : start + CHUNK_ROWS]
+            matrix[start : start + len(chunk)] = normalize(source[chunk])
+        matrix.flush()
+        del matrix
+
+    save_id_map(names, id_map_path(index_path))
+    index = build_index(load_vectors(vectors_path(index_path)), **load_index_config())
+    save_index(index, index_path)
+
+    with open(data_pkl, "wb") as f:
+        pickle.dump({"docs": store.texts(names)}, f)
@@ -0,0 +1,202 @@
+#embedding_pipeline.py
+import os
+import hashlib
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import openai
+from dotenv import load_dotenv
+
+from tenacity import (
+    retry,
+    stop_after_attempt,
+    wait_exponential,
+    retry_if_exception_type,
+)
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+
+
+def load_pipeline_config():
+    load_dotenv()
+    return {
+        "provider": os.getenv("EMBEDDING_PROVIDER", "openai"),
+        "cache_path": os.getenv("EMBEDDING_CACHE", "embeddings/cache.sqlite3"),
+        "batch_size": int(os.getenv("EMBEDDING_BATCH_SIZE", 64)),
+        "max_workers": int(os.getenv("EMBEDDING_MAX_WORKERS", 4)),
+    }
+
+
+def normalize_text(text):
+    """
+    Collapses whitespace, so formatting-only changes hit the cache
+    """
+    return " ".join(text.split())
+
+
+def cache_key(model, text):
+    """
+    Returns the cache key of a text embedded with a model
+    """
+    return hashlib.sha256(f"{model}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Persistent embedding cache keyed by hash(model, normalized text)
+    """
+
+    def __init__(self, file_name):
+        self.file_name = file_name
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(file_name, check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB)"
+        )
+
+    def get_many(self, keys):
+        """
+        Returns {key: vector} for the keys already in the cache
+        """
+        found = {}
+        keys = list(keys)
+        with self.lock:
+            # Stay below sqlite's bound parameter limit
+            for start in range(0, len(keys), 500):
+                chunk = keys[start : start + 500]
+                rows = self.connection.execute(
+                    "SELECT key, vector FROM embeddings WHERE key IN (%s)"
+                    % ",".join("?" * len(chunk)),
+                    chunk,
+                )
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def put_many(self, items):
+        """
+        Stores (key, vector) pairs
+        """
+        with self.lock, self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO embeddings VALUES (?, ?)",
+                [
+                    (key, np.asarray(vector, dtype=np.float32).tobytes())
+                    for key, vector in items
+                ],
+            )
+
+    def close(self):
+        self.connection.close()
+
+
+class OpenAIProvider:
+    """
+    Embeds texts through the OpenAI embeddings endpoint, many per request
+
+    api_base can point at any server speaking the same /embeddings
+    protocol, such as a local stub server for offline runs.
+    """
+
+    def __init__(self, model=EMBEDDING_MODEL, api_key=None, api_base=None):
+        self.model = model
+        self.api_key = api_key or os.getenv("OPENAI_API_KEY")
+        self.api_base = api_base or os.getenv("OPENAI_API_BASE")
+
+        if not self.api_key:
+            raise EnvironmentError("OPENAI_API_KEY is required for the openai provider.")
+
+    # using tenacity to throttle openai calls, per batch
+    @retry(
+        stop=stop_after_attempt(10),
+        wait=wait_exponential(multiplier=1, min=2, max=30),
+        retry=retry_if_exception_type(
+            (
+                openai.error.ServiceUnavailableError,
+                openai.error.APIConnectionError,
+                openai.error.RateLimitError,
+                openai.error.Timeout,
+                openai.error.APIError,
+            )
+        ),
+    )
+    def embed(self, texts):
+        kwargs = {"api_base": self.api_base} if self.api_base else {}
+        response = openai.Embedding.create(
+            model=self.model, input=list(texts), api_key=self.api_key, **kwargs
+        )
+        data = sorted(response["data"], key=lambda entry: entry["index"])
+        return [np.array(entry["embedding"], dtype=np.float32) for entry in data]
+
+
+class FakeProvider:
+    """
+    Deterministic offline provider, each text maps to a fixed random unit vector
+    """
+
+    def __init__(self, dimension=1536):
+        self.model = f"fake-{dimension}"
+        self.dimension = dimension
+
+    def embed(self, texts):
+        vectors = []
+        for text in texts:
+            seed = int.from_bytes(
+                hashlib.sha256(normalize_text(text).encode("utf-8")).digest()[:8], "little"
+            )
+            vector = np.random.default_rng(seed).standard_normal(self.dimension)
+            vectors.append((vector / np.linalg.norm(vector)).astype(np.float32))
+        return vectors
+
+
+def get_provider(name):
+    """
+    Returns the embedding provider configured by EMBEDDING_PROVIDER
+    """
+    if name == "openai":
+        return OpenAIProvider()
+    if name == "fake":
+        return FakeProvider()
+    raise ValueError(f"Unknown embedding provider {name!r}, expected openai or fake.")
+
+
+def embed_texts(texts, provider, cache=None, batch_size=64, max_workers=4):
+    """
+    Embeds texts in batches, concurrently, skipping cached ones
+
+    Parameters:
+    texts (list): The texts to embed
+    provider: An object with a model name and an embed(texts) method
+    cache (EmbeddingCache, optional): The persistent cache to read and fill
+    batch_size (int, optional): Texts per request. Defaults to 64.
+    max_workers (int, optional): Requests in flight at once. Defaults to 4.
+
+    Returns:
+    list: One float32 vector per text, in input order
+    """
+    keys = [cache_key(provider.model, text) for text in texts]
+    vectors = cache.get_many(set(keys)) if cache else {}
+
+    # Embed each missing text once, even when it appears several times
+    missing = {}
+    for key, text in zip(keys, texts):
+        if key not in vectors:
+            missing.setdefault(key, normalize_text(text))
+    missing_keys = list(missing)
+    batches = [
+        missing_keys[start : start + batch_size]
+        for start in range(0, len(missing_keys), batch_size)
+    ]
+
+    def embed_batch(batch):
+        return batch, provider.embed([missing[key] for key in batch])
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for batch, embedded in executor.map(embed_batch, batches):
+            new = list(zip(batch, embedded))
+            if cache:
+                cache.put_many(new)
+            vectors.update(new)
+
+    return [vectors[key] for key in keys]
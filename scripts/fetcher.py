@@ -0,0 +1,204 @@
+# fetcher.py
+import os
+import json
+import hashlib
+import tempfile
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from dotenv import load_dotenv
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/74.0.3729.169 Safari/537.36"
+}
+# Statuses retried with backoff by the connection pool
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+def load_fetch_config():
+    load_dotenv()
+    return {
+        "base_url": os.getenv("SCRAPER_BASE_URL", "https://www.mobafire.com/"),
+        "set_name": os.getenv("SCRAPER_SET", "set11"),
+        "max_workers": int(os.getenv("FETCH_MAX_WORKERS", 8)),
+        "timeout": float(os.getenv("FETCH_TIMEOUT", 10)),
+        "retries": int(os.getenv("FETCH_RETRIES", 3)),
+        "manifest_path": os.getenv("FETCH_MANIFEST", "data/fetch_manifest.json"),
+        "parser": os.getenv("SCRAPER_PARSER", "stream"),
+    }
+
+
+def atomic_write(file_name, data):
+    """
+    Writes bytes so readers see the old file or the new one, never a partial one
+
+    Parameters:
+    file_name (str): The destination path
+    data (bytes): The file content
+    """
+    folder = os.path.dirname(file_name) or "."
+    os.makedirs(folder, exist_ok=True)
+    descriptor, temp_name = tempfile.mkstemp(dir=folder, prefix=".fetch-")
+    try:
+        with os.fdopen(descriptor, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_name, file_name)
+    except BaseException:
+        if os.path.exists(temp_name):
+            os.remove(temp_name)
+        raise
+
+
+class Manifest:
+    """
+    The validators (ETag, Last-Modified) of every downloaded file, by URL
+    """
+
+    def __init__(self, file_name=None):
+        self.file_name = file_name
+        self.lock = threading.Lock()
+        self.entries = {}
+        if file_name and os.path.exists(file_name):
+            with open(file_name) as f:
+                self.entries = json.load(f)
+
+    def get(self, url):
+        with self.lock:
+            return self.entries.get(url)
+
+    def put(self, url, entry):
+        with self.lock:
+            self.entries[url] = entry
+
+    def save(self):
+        if not self.file_name:
+            return
+        with self.lock:
+            data = json.dumps(self.entries, indent=4, sort_keys=True)
+        atomic_write(self.file_name, data.encode("utf-8"))
+
+
+class Fetcher:
+    """
+    One pooled HTTP session for the scrapers, with bounded concurrent downloads
+
+    Files are only downloaded again when the server says they changed:
+    every request for a known file carries the ETag / Last-Modified stored
+    in the manifest, and a 304 leaves the local copy alone.
+    """
+
+    def __init__(self, config=None):
+        config = config or load_fetch_config()
+        self.base_url = config["base_url"]
+        self.set_name = config["set_name"]
+        self.max_workers = config["max_workers"]
+        self.timeout = config["timeout"]
+        self.manifest = Manifest(config["manifest_path"])
+
+        retry = Retry(
+            total=config["retries"],
+            backoff_factor=0.5,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=("GET",),
+            raise_on_status=False,
+        )
+        # One connection per worker, kept alive across downloads
+        adapter = HTTPAdapter(pool_maxsize=self.max_workers, max_retries=retry)
+        self.session = requests.Session()
+        self.session.headers.update(HEADERS)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def close(self):
+        self.manifest.save()
+        self.session.close()
+
+    def url(self, path):
+        """
+        Returns the absolute URL of a site path
+        """
+        return self.base_url + path.lstrip("/")
+
+    def get_page(self, path):
+        """
+        Fetches a page of the site
+
+        Parameters:
+        path (str): The page path, relative to the base URL
+
+        Returns:
+        bytes: The page content, or None on a network or HTTP error
+        """
+        try:
+            response = self.session.get(self.url(path), timeout=self.timeout)
+            response.raise_for_status()
+        except (requests.RequestException, ValueError):
+            print("Network or URL error")
+            return None
+        return response.content
+
+    def download(self, url, file_name):
+        """
+        Downloads url to file_name unless the local copy is still current
+
+        Parameters:
+        url (str): The absolute file URL
+        file_name (str): The destination path
+
+        Returns:
+        str: "downloaded", "not_modified" or "failed"
+        """
+        headers = {}
+        entry = self.manifest.get(url)
+        if entry and entry["path"] == file_name and os.path.exists(file_name):
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        try:
+            response = self.session.get(url, headers=headers, timeout=self.timeout)
+            if response.status_code == 304 and headers:
+                return "not_modified"
+            response.raise_for_status()
+        except (requests.RequestException, ValueError):
+            print(f"Network or URL error: {url}")
+            return "failed"
+
+        atomic_write(file_name, response.content)
+        self.manifest.put(
+            url,
+            {
+                "path": file_name,
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "size": len(response.content),
+                "sha256": hashlib.sha256(response.content).hexdigest(),
+            },
+        )
+        return "downloaded"
+
+    def download_all(self, jobs):
+        """
+        Downloads (url, file_name) pairs, max_workers at a time
+
+        Returns:
+        Counter: The number of files per download() result
+        """
+        jobs = list(jobs)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            results = Counter(executor.map(lambda job: self.download(*job), jobs))
+        self.manifest.save()
+        return results
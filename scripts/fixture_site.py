@@ -0,0 +1,169 @@
+# fixture_site.py
+"""
+Renders an offline copy of the scraped pages from the shipped data, with
+the same markup the scrapers select, plus the icons at their site paths.
+Scraping the fixture site gives back data/champ_data.json and
+data/item_data.json, so the scrapers can run against scripts/stub_server.py.
+"""
+import os
+import json
+import shutil
+from html import escape
+from builders.assets import CHAMPION_IMAGE_FOLDER, ITEM_IMAGE_FOLDER, image_name
+from scripts import champ_scraper, item_scraper
+
+# Listed before "Normal" on the item page, and skipped by the item scraper
+COMPONENTS = (
+    "B.F. Sword",
+    "Chain Vest",
+    "Giant's Belt",
+    "Needlessly Large Rod",
+    "Negatron Cloak",
+    "Recurve Bow",
+    "Sparring Gloves",
+    "Tear of the Goddess",
+)
+# The set in the icon paths, like SCRAPER_SET
+SET_NAME = "set11"
+# Repeated navigation and footer blocks, so a page is closer to the real one in size
+CHROME_LINKS = 40
+
+
+def slug(name):
+    return name.replace(" ", "-").replace("'", "").replace("/", "-").lower()
+
+
+def page_chrome(title):
+    links = "".join(
+        f'<li class="nav__item"><a href="/teamfight-tactics/guide/{number}">Guide {number}</a></li>'
+        for number in range(CHROME_LINKS)
+    )
+    header = (
+        f"<!DOCTYPE html>\n<html><head><title>{escape(title)}</title>"
+        '<script type="text/javascript">window.dataLayer = window.dataLayer || [];</script>'
+        f'</head><body><nav class="nav"><ul>{links}</ul></nav><main class="content">'
+    )
+    footer = f'</main><footer class="footer"><ul>{links}</ul></footer></body></html>\n'
+    return header, footer
+
+
+def trait_details(champion_data, kind):
+    details = {}
+    for champion in champion_data.values():
+        details.update(champion[kind])
+    return details
+
+
+def render_champions_page(champion_data, set_name=SET_NAME):
+    """
+    Returns the champions page html for {name: {cost, ability_text, origin_details, class_details}}
+    """
+    header, footer = page_chrome("TFT Champions")
+    parts = [header, '<div class="synergies-wrap">']
+    for div_name, kind in (("origins", "origin_details"), ("classes", "class_details")):
+        parts.append(f'<div class="{div_name}">')
+        for trait, description in sorted(trait_details(champion_data, kind).items()):
+            parts.append(
+                '<div class="details">'
+                f'<div class="details__pic"><img src="/images/tft/{set_name}/trait/icon/{slug(trait)}.png">'
+                f"<span>{escape(trait)}</span></div>"
+                f'<div class="details__description"><span class="description">{escape(description)}</span></div>'
+                "</div>"
+            )
+        parts.append("</div>")
+    parts.append('</div><div class="champions-table">')
+    image_path = champ_scraper.IMAGE_PATH.format(set_name=set_name)
+
+    for name, champion in champion_data.items():
+        traits = list(champion["origin_details"]) + list(champion["class_details"])
+        icons = "".join(
+            f'<img src="/images/tft/{set_name}/trait/icon/{slug(trait)}.png" alt="{escape(trait)}">'
+            for trait in traits
+        )
+        parts.append(
+            '<div class="champions-wrap__details">'
+            f'<img class="champion-icon" src="/{image_path}/{slug(name)}.png">'
+            f'<span class="name">{escape(name)}</span>'
+            f'<span class="cost">{champion["cost"]}G</span>'
+            f'<span class="synergies">{icons}</span>'
+            f'<span class="description">{escape(champion["ability_text"])}</span>'
+            "</div>"
+        )
+    parts.append("</div>")
+    parts.append(footer)
+    return "".join(parts)
+
+
+def render_items_section(title, items, set_name=SET_NAME):
+    image_path = item_scraper.IMAGE_PATH.format(set_name=set_name)
+    parts = [f'<h2 class="title">{escape(title)}</h2><div class="items-wrap__details">']
+    for name, stats in items:
+        parts.append(
+            '<div class="items-wrap__details__item">'
+            f'<img src="/{image_path}/{slug(name)}.png">'
+            '<div class="items-wrap__details__item__description">\n'
+            f'<span class="name">{escape(name)}</span>\n{escape(stats)}'
+            "</div></div>"
+        )
+    parts.append("</div>")
+    return "".join(parts)
+
+
+def render_items_page(item_data, set_name=SET_NAME):
+    """
+    Returns the item cheatsheet html for {name: {item_stats}}
+    """
+    header, footer = page_chrome("TFT Items Cheatsheet")
+    components = [(name, "Component") for name in COMPONENTS]
+    normal = [(name, item["item_stats"]) for name, item in item_data.items()]
+    return "".join(
+        [
+            header,
+            render_items_section("Components", components, set_name),
+            render_items_section("Normal", normal, set_name),
+            footer,
+        ]
+    )
+
+
+def write(root, path, content):
+    file_name = os.path.join(root, path)
+    os.makedirs(os.path.dirname(file_name), exist_ok=True)
+    with open(file_name, "w", encoding="utf-8") as f:
+        f.write(content)
+
+
+def build_site(root, champion_data=None, item_data=None, set_name=SET_NAME):
+    """
+    Writes the fixture site into a folder
+
+    Parameters:
+    root (str): The site folder, served as the base URL
+    champion_data (dict, optional): Defaults to data/champ_data.json
+    item_data (dict, optional): Defaults to data/item_data.json
+    set_name (str, optional): The set in the icon paths. Defaults to "set11".
+
+    Returns:
+    str: The site folder
+    """
+    if champion_data is None:
+        with open(champ_scraper.DATA_FILE) as f:
+            champion_data = json.load(f)
+    if item_data is None:
+        with open(item_scraper.DATA_FILE) as f:
+            item_data = json.load(f)
+
+    write(root, champ_scraper.CHAMPIONS_PAGE, render_champions_page(champion_data, set_name))
+    write(root, item_scraper.ITEMS_PAGE, render_items_page(item_data, set_name))
+
+    for names, folder, image_path, stem in (
+        (champion_data, CHAMPION_IMAGE_FOLDER, champ_scraper.IMAGE_PATH, image_name),
+        (item_data, ITEM_IMAGE_FOLDER, item_scraper.IMAGE_PATH, str),
+    ):
+        image_path = image_path.format(set_name=set_name)
+        os.makedirs(os.path.join(root, image_path), exist_ok=True)
+        for name in names:
+            source = os.path.join(folder, f"{stem(name)}.png")
+            if os.path.exists(source):
+                shutil.copyfile(source, os.path.join(root, image_path, f"{slug(name)}.png"))
+    return root
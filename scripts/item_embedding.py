@@ -1,31 +1,27 @@
 import json
-import numpy as np
-import faiss
-import pickle
-import openai
 from dotenv import load_dotenv
 import os
-
-from tenacity import (
-    retry,
-    stop_after_attempt,
-    wait_exponential,
-    retry_if_exception_type,
+from builders.affinity import affinity_path, get_affinity
+from builders.metadata import build_metadata
+from builders.vector_store import vectors_path
+from scripts.corpus_store import CorpusStore, build_corpus, corpus_path, finalize_corpus
+from scripts.embedding_pipeline import (
+    EmbeddingCache,
+    embed_texts,
+    get_provider,
+    load_pipeline_config,
 )
 
 # Load Environment Variables
 load_dotenv()
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 ITEM_DATA_PKL = os.getenv("ITEM_DATA_PKL")
 ITEM_DATA_JSON = os.getenv("ITEM_DATA_JSON")
 I_EMBEDDINGS_PATH = os.getenv("I_EMBEDDINGS_PATH")
-EMBEDDING_MODEL = "text-embedding-3-small"
+EMBEDDINGS_PATH = os.getenv("EMBEDDINGS_PATH")
 
-if not all([OPENAI_API_KEY, ITEM_DATA_PKL, ITEM_DATA_JSON, I_EMBEDDINGS_PATH]):
+if not all([ITEM_DATA_PKL, ITEM_DATA_JSON, I_EMBEDDINGS_PATH, EMBEDDINGS_PATH]):
     raise EnvironmentError("Some required environment variables are missing.")
 
-openai.api_key = OPENAI_API_KEY
-
 
 def load_data(file_name):
     """
@@ -36,81 +32,27 @@ def load_data(file_name):
     return data
 
 
-def preprocess_data(items):
+def iter_documents(items):
     """
-    Preprocess the item data and extract the embeddings.
+    Yield an (item name, normalized text) pair per item.
     """
-    docs = {}
-    embeddings = {}
     for item_name, spells_dict in items.items():
-        for spell_name, spell_content in spells_dict.items():
-            # Ensure spell_content is a string
-            spell_content = str(spell_content)
-            docs[spell_name] = spell_content
-            embeddings[item_name] = extract_embeddings(spell_content)
-    return docs, embeddings
+        # Ensure spell_content is a string
+        spell_content = "\n".join(str(content) for content in spells_dict.values())
+        yield item_name, clean_description(spell_content)
 
 
-# using tenacity to throttle openai calls
-@retry(
-    stop=stop_after_attempt(10),
-    wait=wait_exponential(multiplier=1, min=2, max=30),
-    retry=retry_if_exception_type(
-        (
-            openai.error.ServiceUnavailableError,
-            openai.error.APIConnectionError,
-            openai.error.RateLimitError,
-            openai.error.Timeout,
-            openai.error.APIError,
-        )
-    ),
-)
-def extract_embeddings(desc):
+def clean_description(desc):
     """
-    Extract embeddings from the description using the OpenAI API.
+    Strip the characters that add noise to the embeddings.
     """
-    desc = (
+    return (
         desc.replace("\n", " ")
         .replace("  ", " ")
         .strip()
         .replace("+", "")
         .replace("%", "")
     )
-    response = openai.Embedding.create(model=EMBEDDING_MODEL, input=[desc])
-    embedding = np.array(response["data"][0]["embedding"])
-    return embedding
-
-
-def build_faiss_index(embeddings):
-    """
-    Build a Faiss index from the embeddings.
-    """
-    # Note: OpenAI dimensions are always 1536 (as of 07.2023)
-    dimension = embeddings[list(embeddings.keys())[0]].shape[0]
-
-    # Initialize the index
-    index = faiss.IndexFlatIP(dimension)
-
-    # Add vectors to the index
-    for i, (title, embedding) in enumerate(embeddings.items()):
-        index.add(np.array([embedding]))
-
-    return index
-
-
-def save_faiss_index(index, file_name):
-    """
-    Save a Faiss index to a file.
-    """
-    faiss.write_index(index, file_name)
-
-
-def save_data(data, file_name):
-    """
-    Save data to a file using pickle.
-    """
-    with open(file_name, "wb") as f:
-        pickle.dump(data, f)
 
 
 def main():
@@ -118,10 +60,40 @@ def main():
     Main execution function.
     """
     tft_item_data = load_data(ITEM_DATA_JSON)
-    docs, embeddings = preprocess_data(tft_item_data)
-    index = build_faiss_index(embeddings)
-    save_faiss_index(index, I_EMBEDDINGS_PATH)
-    save_data({"docs": docs, "embeddings": embeddings}, ITEM_DATA_PKL)
+    pipeline_config = load_pipeline_config()
+    provider = get_provider(pipeline_config["provider"])
+    cache = EmbeddingCache(pipeline_config["cache_path"])
+
+    def embed(texts):
+        return embed_texts(
+            texts,
+            provider,
+            cache,
+            pipeline_config["batch_size"],
+            pipeline_config["max_workers"],
+        )
+
+    # Records are streamed to the store, so an interrupted build resumes
+    store = CorpusStore(
+        corpus_path(I_EMBEDDINGS_PATH), provider.model, getattr(provider, "dimension", None)
+    )
+    names = build_corpus(
+        iter_documents(tft_item_data), store, embed, pipeline_config["batch_size"]
+    )
+    cache.close()
+    finalize_corpus(store, names, I_EMBEDDINGS_PATH, ITEM_DATA_PKL)
+    # The item names and vectors the query path memory-maps
+    build_metadata(I_EMBEDDINGS_PATH)
+
+    # Precompute every champion x item similarity for the item lookups
+    if os.path.exists(vectors_path(EMBEDDINGS_PATH)):
+        get_affinity(
+            affinity_path(I_EMBEDDINGS_PATH),
+            vectors_path(EMBEDDINGS_PATH),
+            vectors_path(I_EMBEDDINGS_PATH),
+        )
+    else:
+        print("Run champ_embedding first to precompute the item affinity.")
 
 
 if __name__ == "__main__":
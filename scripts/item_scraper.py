@@ -1,15 +1,13 @@
 # item_scraper.py
-import requests
 from bs4 import BeautifulSoup
 import json
 import os
+from scripts.fetcher import Fetcher, load_fetch_config
+from scripts.page_parser import PARSERS, parse_page, split_item_description
 
-HEADERS = {
-    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/74.0.3729.169 Safari/537.36"
-}
-
-BASE_URL = "https://www.mobafire.com/"
 ITEMS_PAGE = "teamfight-tactics/items-cheatsheet"
+# Formatted with the scraped set, e.g. images/tft/set11/item/icon
+IMAGE_PATH = "images/tft/{set_name}/item/icon"
 IMAGE_FOLDER = "assets/images/items"
 DATA_FILE = "data/item_data.json"
 ITEM_FILTER_FILE = "data/item_filter.txt"
@@ -19,28 +17,21 @@ if not os.path.exists(IMAGE_FOLDER):
     os.makedirs(IMAGE_FOLDER)
 
 
-def get_page_html(url):
-    try:
-        response = requests.get(url, headers=HEADERS)
-        response.raise_for_status()
-    except (requests.RequestException, ValueError):
-        print("Network or URL error")
-        return None
-    return BeautifulSoup(response.content, "html.parser")
-
-
-def save_image(url, item_name):
-    try:
-        img_data = requests.get(url).content
-    except (requests.RequestException, ValueError):
-        print("Network or URL error")
-        return
-    with open(os.path.join(IMAGE_FOLDER, f"{item_name}.png"), "wb") as handler:
-        handler.write(img_data)
-
-
+def image_jobs(fetcher, item_names, image_folder=IMAGE_FOLDER):
+    """
+    Returns the (url, file name) download of every item icon
+    """
+    jobs = []
+    for item_name in item_names:
+        slug = item_name.replace(" ", "-").replace("'", "").lower()
+        jobs.append(
+            (
+                fetcher.url(f"{IMAGE_PATH.format(set_name=fetcher.set_name)}/{slug}.png"),
+                os.path.join(image_folder, f"{item_name}.png"),
+            )
+        )
+    return jobs
 
-from bs4 import BeautifulSoup
 
 def get_item_data(page):
     # Find the <h2> tag with class "title" and text "Normal"
@@ -67,18 +58,17 @@ def get_item_data(page):
     item_data = {}
     for item_table in current_element.select("div.items-wrap__details__item"):
         item_stats = item_table.select_one("div.items-wrap__details__item__description").text
-        item_name = item_stats.split("\n")[1].strip()  # Added strip() to clean any leading/trailing whitespace
-        item_stats = item_stats.replace(item_name, "").strip()  # Clean up the stats string
+        item_name, item_stats = split_item_description(item_stats)
         item_data[item_name] = {"item_stats": item_stats}
 
     return item_data
 
 
 
-def get_filtered_item_data(item_data):
+def get_filtered_item_data(item_data, item_filter_file=ITEM_FILTER_FILE):
     # Load item names from item_filter.txt
     try:
-        with open(ITEM_FILTER_FILE, "r") as file:
+        with open(item_filter_file, "r") as file:
             items_to_keep = set(line.strip() for line in file)
     except IOError:
         print("Error opening item filter file")
@@ -91,28 +81,45 @@ def get_filtered_item_data(item_data):
         if item_name in items_to_keep
     }
 
-    # Save the image for each filtered item
-    for item_name in filtered_item_data:
-        image_name = item_name.replace(" ", "-").replace("'", "").lower()
-        item_image_url = (
-            f"https://www.mobafire.com/images/tft/set11/item/icon/{image_name}.png"
-        )
-        save_image(item_image_url, item_name)
-
     return filtered_item_data
 
 
-def main():
-    item_page = get_page_html(BASE_URL + ITEMS_PAGE)
-    if not item_page:
-        print("Failed to retrieve HTML content")
-        return
+def parse_items_page(content, parser="stream"):
+    """
+    Reads the "Normal" items of the item cheatsheet
+
+    Parameters:
+    content (bytes): The page html
+    parser (str, optional): "stream" for the single-pass page parser, "soup"
+        for a BeautifulSoup tree. Defaults to "stream".
+
+    Returns:
+    dict: {item name: {"item_stats": str}}
+    """
+    if parser not in PARSERS:
+        raise ValueError(f"parser must be one of {', '.join(PARSERS)}, got {parser}.")
+    if parser == "stream":
+        return parse_page(content, ("items",))["items"]
+    return get_item_data(BeautifulSoup(content, "html.parser"))
+
+
+def main(config=None, image_folder=IMAGE_FOLDER, data_file=DATA_FILE):
+    config = config or load_fetch_config()
+    with Fetcher(config) as fetcher:
+        content = fetcher.get_page(ITEMS_PAGE)
+        if not content:
+            print("Failed to retrieve HTML content")
+            return
+
+        item_data = parse_items_page(content, config["parser"])
+        filtered_item_data = get_filtered_item_data(item_data)
 
-    item_data = get_item_data(item_page)
-    filtered_item_data = get_filtered_item_data(item_data)
+        # Download the item icons concurrently, skipping unchanged ones
+        results = fetcher.download_all(image_jobs(fetcher, filtered_item_data, image_folder))
+        print(f"Item images: {dict(results)}")
 
     # Save the data to a JSON file
-    with open(DATA_FILE, "w") as f:
+    with open(data_file, "w") as f:
         json.dump(filtered_item_data, f, indent=4)
 
 
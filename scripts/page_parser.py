@@ -0,0 +1,306 @@
+# page_parser.py
+"""
+A single-pass event parser for the scraped pages. It reads the champions
+page (traits and champions) and the item cheatsheet with the same selectors
+as the BeautifulSoup code in the scrapers, without building a tree, and
+stops reading once every requested section is complete.
+"""
+from html.parser import HTMLParser
+
+PAGE_KINDS = ("origins", "classes", "champions", "items")
+# "stream" is PageParser, "soup" the BeautifulSoup selectors of the scrapers
+PARSERS = ("stream", "soup")
+# Fed to the parser at a time, so it can stop early between chunks
+CHUNK_SIZE = 1 << 16
+# Elements without an end tag, never pushed on the open element stack
+VOID_TAGS = frozenset(
+    ("area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr")
+)
+# Their text is not part of .text in BeautifulSoup either
+RAW_TEXT_TAGS = frozenset(("script", "style", "template"))
+
+
+def synergy_name(src):
+    """
+    Returns the trait name of a trait icon src, ".../spirit-walker.png" -> "Spirit Walker"
+    """
+    return src.split("/")[-1].split(".")[0].title().replace("-", " ")
+
+
+def split_item_description(text):
+    """
+    Splits the text of an item description div into its name and stats
+
+    Returns:
+    tuple: (item name, item stats)
+    """
+    item_name = text.split("\n")[1].strip()
+    return item_name, text.replace(item_name, "").strip()
+
+
+class Capture:
+    """
+    Collects the text of one element, children included
+    """
+
+    __slots__ = ("depth", "parts", "done")
+
+    def __init__(self, depth, done):
+        self.depth = depth
+        self.parts = []
+        self.done = done
+
+
+class PageParser(HTMLParser):
+    """
+    Extracts the requested sections of a page in one pass
+
+    Only the first div.synergies-wrap div.origins / div.classes, the first
+    div.champions-table and the first div.items-wrap__details after the
+    h2.title "Normal" are read, like select_one and find_next do.
+    """
+
+    def __init__(self, kinds=PAGE_KINDS):
+        super().__init__(convert_charrefs=True)
+        unknown = set(kinds) - set(PAGE_KINDS)
+        if unknown:
+            raise ValueError(f"Unknown page sections: {', '.join(sorted(unknown))}.")
+        self.kinds = set(kinds)
+        self.finished = set()
+        self.results = {"origins": {}, "classes": {}, "champions": [], "items": {}}
+
+        self.stack = []
+        self.captures = []
+        self.raw_depth = None
+        # Depth of the open section elements, None while outside them
+        self.synergies_depth = None
+        self.section = None
+        self.section_depth = None
+        self.detail = None
+        self.champions_depth = None
+        self.champion = None
+        self.synergies_span_depth = None
+        self.normal_header = False
+        self.items_depth = None
+        self.item = None
+
+    @property
+    def done(self):
+        return self.kinds <= self.finished
+
+    def capture(self, done):
+        self.captures.append(Capture(len(self.stack), done))
+
+    def handle_starttag(self, tag, attrs):
+        if self.raw_depth is not None:
+            return
+        classes = ()
+        src = None
+        for key, value in attrs:
+            if key == "class" and value:
+                classes = value.split()
+            elif key == "src":
+                src = value
+
+        if tag in VOID_TAGS:
+            if tag == "img" and src is not None and self.synergies_span_depth is not None:
+                self.champion["synergies"].append(synergy_name(src))
+            return
+
+        self.stack.append(tag)
+        depth = len(self.stack)
+        if tag in RAW_TEXT_TAGS:
+            self.raw_depth = depth
+            return
+
+        if tag == "div":
+            self.start_div(classes, depth)
+        elif tag == "span":
+            self.start_span(classes, depth)
+        elif tag == "h2" and "title" in classes and "items" in self.kinds and not self.normal_header:
+            self.capture(self.end_title)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_TAGS and self.stack and self.stack[-1] == tag:
+            self.handle_endtag(tag)
+
+    def start_div(self, classes, depth):
+        if "synergies-wrap" in classes and self.synergies_depth is None:
+            self.synergies_depth = depth
+        if self.synergies_depth is not None and self.section is None:
+            for kind in ("origins", "classes"):
+                if kind in classes and kind in self.kinds and kind not in self.finished:
+                    self.section, self.section_depth = kind, depth
+                    break
+        if self.section is not None:
+            if "details" in classes and self.detail is None:
+                self.detail = {"depth": depth, "name": None, "description": None}
+            elif self.detail is not None:
+                if "details__pic" in classes:
+                    self.detail["pic_depth"] = depth
+                elif "details__description" in classes:
+                    self.detail["description_depth"] = depth
+
+        if (
+            "champions-table" in classes
+            and "champions" in self.kinds
+            and "champions" not in self.finished
+            and self.champions_depth is None
+        ):
+            self.champions_depth = depth
+        elif "champions-wrap__details" in classes and self.champions_depth is not None:
+            if self.champion is None:
+                self.champion = {"depth": depth, "synergies": []}
+
+        if self.normal_header and self.items_depth is None and "items-wrap__details" in classes:
+            self.items_depth = depth
+        elif self.items_depth is not None:
+            if "items-wrap__details__item" in classes and self.item is None:
+                self.item = {"depth": depth, "description": None}
+            elif (
+                "items-wrap__details__item__description" in classes
+                and self.item is not None
+                and self.item["description"] is None
+            ):
+                self.item["description"] = ""
+                self.capture(self.end_item_description)
+
+    def start_span(self, classes, depth):
+        detail = self.detail
+        if detail is not None:
+            if detail["name"] is None and "pic_depth" in detail:
+                detail["name"] = ""
+                self.capture(lambda text: detail.update(name=text))
+            elif (
+                detail["description"] is None
+                and "description_depth" in detail
+                and "description" in classes
+            ):
+                detail["description"] = ""
+                self.capture(lambda text: detail.update(description=text))
+
+        champion = self.champion
+        if champion is not None:
+            for key in ("name", "cost", "description"):
+                if key in classes and key not in champion:
+                    champion[key] = ""
+                    self.capture(lambda text, key=key: champion.update({key: text}))
+            if "synergies" in classes and self.synergies_span_depth is None:
+                self.synergies_span_depth = depth
+
+    def handle_endtag(self, tag):
+        if tag not in self.stack:
+            return
+        # Unclosed children end with their parent, as in the tree builder
+        while self.stack:
+            depth = len(self.stack)
+            open_tag = self.stack.pop()
+            self.end_element(depth)
+            if open_tag == tag:
+                break
+
+    def end_element(self, depth):
+        if self.raw_depth == depth:
+            self.raw_depth = None
+        while self.captures and self.captures[-1].depth == depth:
+            finished = self.captures.pop()
+            text = "".join(finished.parts)
+            for outer in self.captures:
+                outer.parts.append(text)
+            finished.done(text)
+
+        detail = self.detail
+        if detail is not None:
+            if detail.get("pic_depth") == depth:
+                del detail["pic_depth"]
+            elif detail.get("description_depth") == depth:
+                del detail["description_depth"]
+            elif detail["depth"] == depth:
+                if detail["name"] is not None and detail["description"] is not None:
+                    self.results[self.section][detail["name"]] = detail["description"]
+                self.detail = None
+        if self.section_depth == depth:
+            self.finished.add(self.section)
+            self.section = self.section_depth = None
+        if self.synergies_depth == depth:
+            self.synergies_depth = None
+
+        if self.synergies_span_depth == depth:
+            self.synergies_span_depth = None
+        if self.champion is not None and self.champion["depth"] == depth:
+            self.results["champions"].append(self.champion)
+            self.champion = None
+        if self.champions_depth == depth:
+            self.finished.add("champions")
+            self.champions_depth = None
+
+        if self.item is not None and self.item["depth"] == depth:
+            if self.item["description"]:
+                item_name, item_stats = split_item_description(self.item["description"])
+                self.results["items"][item_name] = {"item_stats": item_stats}
+            self.item = None
+        if self.items_depth == depth:
+            self.finished.add("items")
+            self.items_depth = None
+
+    def end_title(self, text):
+        if text == "Normal":
+            self.normal_header = True
+
+    def end_item_description(self, text):
+        self.item["description"] = text
+
+    def handle_data(self, data):
+        if self.captures and self.raw_depth is None:
+            self.captures[-1].parts.append(data)
+
+
+def parse_page(content, kinds=PAGE_KINDS):
+    """
+    Parses a champions or items page in one pass
+
+    Parameters:
+    content (bytes or str): The page html
+    kinds (tuple, optional): The sections to read, any of PAGE_KINDS.
+        Parsing stops once all of them are complete.
+
+    Returns:
+    dict: origins and classes ({trait: description}), champions (a list of
+    {name, cost, description, synergies}) and items ({name: {item_stats}})
+    """
+    if isinstance(content, bytes):
+        content = content.decode("utf-8", errors="replace")
+    parser = PageParser(kinds)
+    for start in range(0, len(content), CHUNK_SIZE):
+        parser.feed(content[start : start + CHUNK_SIZE])
+        if parser.done:
+            break
+    else:
+        parser.close()
+    return parser.results
+
+
+def champion_data_from(results):
+    """
+    Builds the champ_data.json layout from the parsed champions page
+    """
+    origin_details = results["origins"]
+    class_details = results["classes"]
+    champion_data = {}
+    for champion in results["champions"]:
+        champion_data[champion["name"]] = {
+            "cost": int(champion["cost"].replace("G", "")),
+            "ability_text": champion["description"],
+            "origin_details": {
+                synergy: origin_details[synergy]
+                for synergy in champion["synergies"]
+                if synergy in origin_details
+            },
+            "class_details": {
+                synergy: class_details[synergy]
+                for synergy in champion["synergies"]
+                if synergy in class_details
+            },
+        }
+    return champion_data
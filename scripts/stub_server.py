@@ -0,0 +1,129 @@
+# stub_server.py
+"""
+A local HTTP server for running the scrapers offline. It serves a folder
+(by default the fixture site from scripts/fixture_site.py) with ETag and
+Last-Modified headers, answers conditional requests with 304, and counts
+responses and client connections.
+
+    python -m scripts.stub_server --port 8765
+    SCRAPER_BASE_URL=http://127.0.0.1:8765/ python -m scripts.champ_scraper
+"""
+import os
+import sys
+import time
+import hashlib
+import argparse
+import tempfile
+import mimetypes
+import threading
+from collections import Counter
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlsplit
+from scripts.fixture_site import build_site
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    # Keep-alive, so pooled client connections are reused
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes, which Nagle would delay
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.connections.add(self.client_address)
+        if server.delay:
+            time.sleep(server.delay)
+
+        path = unquote(urlsplit(self.path).path).lstrip("/")
+        file_name = os.path.realpath(os.path.join(server.root, path))
+        if not file_name.startswith(server.root + os.sep) or not os.path.isfile(file_name):
+            self.respond(404)
+            return
+
+        with open(file_name, "rb") as f:
+            body = f.read()
+        mtime = int(os.path.getmtime(file_name))
+        etag = '"%s"' % hashlib.sha1(body).hexdigest()[:16]
+        headers = {"ETag": etag, "Last-Modified": formatdate(mtime, usegmt=True)}
+
+        if_none_match = self.headers.get("If-None-Match")
+        if_modified_since = self.headers.get("If-Modified-Since")
+        if if_none_match is not None:
+            not_modified = etag in [tag.strip() for tag in if_none_match.split(",")]
+        elif if_modified_since is not None:
+            try:
+                not_modified = mtime <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                not_modified = False
+        else:
+            not_modified = False
+
+        if not_modified:
+            self.respond(304, headers=headers)
+            return
+        headers["Content-Type"] = mimetypes.guess_type(file_name)[0] or "text/html; charset=utf-8"
+        self.respond(200, body, headers)
+
+    def respond(self, status, body=b"", headers=None):
+        with self.server.lock:
+            self.server.counts[status] += 1
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(root, host="127.0.0.1", port=0, delay_ms=0):
+    """
+    Serves a folder from a daemon thread
+
+    Parameters:
+    root (str): The folder to serve
+    host (str, optional): Defaults to 127.0.0.1
+    port (int, optional): 0 picks a free port
+    delay_ms (float, optional): Added to every response, like a remote server's latency
+
+    Returns:
+    ThreadingHTTPServer: The running server, with base_url, counts (responses
+    by status) and connections (client addresses seen)
+    """
+    server = ThreadingHTTPServer((host, port), StubHandler)
+    server.daemon_threads = True
+    server.root = os.path.realpath(root)
+    server.base_url = f"http://{host}:{server.server_address[1]}/"
+    server.delay = delay_ms / 1000
+    server.lock = threading.Lock()
+    server.counts = Counter()
+    server.connections = set()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve fixture pages and images over HTTP.")
+    parser.add_argument("--root", help="The folder to serve. Defaults to a fresh fixture site.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--delay-ms", type=float, default=0, help="Latency added to every response.")
+    args = parser.parse_args(argv)
+
+    root = args.root or build_site(tempfile.mkdtemp(prefix="tft-site-"))
+    server = serve(root, args.host, args.port, args.delay_ms)
+    print(f"Serving {root} on {server.base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+        print(f"Responses: {dict(server.counts)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,104 @@
+# test_corpus_store.py
+import json
+import numpy as np
+import pytest
+from scripts.corpus_store import CorpusStore, build_corpus
+from scripts.embedding_pipeline import EmbeddingCache, FakeProvider, embed_texts
+
+DOCUMENTS = [("Ahri", "mage, fox"), ("Garen", "warden, spin"), ("Lux", "mage, light")]
+
+
+class CountingProvider(FakeProvider):
+    def __init__(self, dimension=8, model=None):
+        super().__init__(dimension)
+        if model:
+            self.model = model
+        self.texts = []
+
+    def embed(self, texts):
+        self.texts.extend(texts)
+        return super().embed(texts)
+
+
+def build(directory, provider, documents=DOCUMENTS):
+    store = CorpusStore(directory, provider.model, provider.dimension)
+    names = build_corpus(iter(documents), store, provider.embed, batch_size=2)
+    return store, names
+
+
+def test_reopened_store_reuses_every_record(tmp_path):
+    first = CountingProvider()
+    store, names = build(tmp_path, first)
+    assert names == [name for name, _ in DOCUMENTS]
+    assert len(first.texts) == 3
+
+    second = CountingProvider()
+    store, _ = build(tmp_path, second)
+    assert second.texts == []
+    assert store.count == 3
+    assert store.vectors().shape == (3, 8)
+
+
+def test_changed_text_is_embedded_again(tmp_path):
+    build(tmp_path, CountingProvider())
+    provider = CountingProvider()
+    store, _ = build(tmp_path, provider, DOCUMENTS[:2] + [("Lux", "mage, prismatic")])
+    assert provider.texts == ["mage, prismatic"]
+    assert store.texts(["Lux"]) == {"Lux": "mage, prismatic"}
+
+
+def test_other_model_invalidates_the_store(tmp_path):
+    build(tmp_path, CountingProvider())
+    provider = CountingProvider(model="another-model")
+    store, _ = build(tmp_path, provider)
+    assert len(provider.texts) == 3
+    assert store.count == 3
+    with open(tmp_path / "meta.json") as f:
+        assert json.load(f) == {"model": "another-model", "dimension": 8}
+
+
+def test_other_dimension_invalidates_the_store(tmp_path):
+    build(tmp_path, CountingProvider(dimension=8, model="model"))
+    provider = CountingProvider(dimension=16, model="model")
+    store, _ = build(tmp_path, provider)
+    assert len(provider.texts) == 3
+    assert store.vectors().shape == (3, 16)
+
+
+def test_append_rejects_a_vector_of_another_dimension(tmp_path):
+    store = CorpusStore(tmp_path, "model")
+    store.append([("Ahri", "mage", np.ones(4))])
+    with pytest.raises(ValueError):
+        store.append([("Lux", "mage", np.ones(5))])
+
+
+def test_interrupted_append_is_dropped_on_reopen(tmp_path):
+    store, _ = build(tmp_path, CountingProvider())
+    with open(store.records_file, "a") as f:
+        f.write('{"name": "Half')
+    with open(store.vectors_file, "ab") as f:
+        f.write(np.ones(3, dtype=np.float32).tobytes())
+
+    store = CorpusStore(tmp_path, store.model, store.dimension)
+    assert store.count == 3
+    assert store.vectors().shape == (3, 8)
+
+
+def test_embedding_cache_is_keyed_by_model(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite3"))
+    texts = ["mage, fox", "mage,   fox", "warden"]
+
+    first = CountingProvider()
+    vectors = embed_texts(texts, first, cache, batch_size=2, max_workers=2)
+    # Whitespace-only variants share one embedding
+    assert sorted(first.texts) == ["mage, fox", "warden"]
+    np.testing.assert_array_equal(vectors[0], vectors[1])
+
+    again = CountingProvider()
+    np.testing.assert_array_equal(embed_texts(texts, again, cache), vectors)
+    assert again.texts == []
+
+    other = CountingProvider(model="another-model")
+    embed_texts(texts, other, cache)
+    assert len(other.texts) == 2
+    cache.close()
@@ -0,0 +1,91 @@
+# test_fetcher.py
+import os
+import json
+import pytest
+from scripts.fetcher import Fetcher
+from scripts.stub_server import serve
+
+FILES = 12
+
+
+@pytest.fixture
+def site(tmp_path):
+    root = tmp_path / "site"
+    root.mkdir()
+    for i in range(FILES):
+        (root / f"icon{i}.png").write_bytes(b"icon %d" % i)
+    server = serve(str(root), delay_ms=20)
+    yield server, root
+    server.shutdown()
+    server.server_close()
+
+
+def fetcher(server, tmp_path, max_workers=3):
+    return Fetcher(
+        {
+            "base_url": server.base_url,
+            "set_name": "set11",
+            "max_workers": max_workers,
+            "timeout": 5,
+            "retries": 0,
+            "manifest_path": str(tmp_path / "manifest.json"),
+        }
+    )
+
+
+def jobs(server, folder):
+    return [(f"{server.base_url}icon{i}.png", str(folder / f"icon{i}.png")) for i in range(FILES)]
+
+
+def test_second_run_sends_conditional_requests(site, tmp_path):
+    server, _ = site
+    out = tmp_path / "out"
+    with fetcher(server, tmp_path) as f:
+        assert f.download_all(jobs(server, out)) == {"downloaded": FILES}
+    assert (out / "icon3.png").read_bytes() == b"icon 3"
+    with open(tmp_path / "manifest.json") as manifest:
+        assert all(entry["etag"] for entry in json.load(manifest).values())
+
+    with fetcher(server, tmp_path) as f:
+        assert f.download_all(jobs(server, out)) == {"not_modified": FILES}
+    assert server.counts == {200: FILES, 304: FILES}
+
+
+def test_changed_file_is_downloaded_again(site, tmp_path):
+    server, root = site
+    out = tmp_path / "out"
+    with fetcher(server, tmp_path) as f:
+        f.download_all(jobs(server, out))
+
+    (root / "icon0.png").write_bytes(b"new icon")
+    with fetcher(server, tmp_path) as f:
+        assert f.download_all(jobs(server, out)) == {"downloaded": 1, "not_modified": FILES - 1}
+    assert (out / "icon0.png").read_bytes() == b"new icon"
+
+
+def test_missing_local_copy_is_not_conditional(site, tmp_path):
+    server, _ = site
+    out = tmp_path / "out"
+    with fetcher(server, tmp_path) as f:
+        f.download_all(jobs(server, out))
+
+    os.remove(out / "icon5.png")
+    with fetcher(server, tmp_path) as f:
+        assert f.download(*jobs(server, out)[5]) == "downloaded"
+    assert (out / "icon5.png").exists()
+
+
+def test_failed_download_leaves_no_file(site, tmp_path):
+    server, _ = site
+    with fetcher(server, tmp_path) as f:
+        assert f.download(server.base_url + "missing.png", str(tmp_path / "missing.png")) == "failed"
+    assert not (tmp_path / "missing.png").exists()
+    assert server.counts == {404: 1}
+
+
+def test_downloads_share_at_most_max_workers_connections(site, tmp_path):
+    server, _ = site
+    with fetcher(server, tmp_path, max_workers=3) as f:
+        f.download_all(jobs(server, tmp_path / "out"))
+    # Each worker keeps its pooled connection alive across downloads
+    assert 1 < len(server.connections) <= 3
@@ -0,0 +1,139 @@
+# test_metadata.py
+import struct
+import zlib
+import numpy as np
+import pytest
+from builders.metadata import (
+    HEADER,
+    METADATA_VERSION,
+    SECTION,
+    SECTIONS,
+    Metadata,
+    load_metadata,
+    save_metadata,
+)
+
+NAMES = ["Ahri", "Cho'Gath", "Kai'Sa"]
+TRAIT_NAMES = ["Arcanist", "Bruiser"]
+BREAKPOINTS = [[2, 4], [2, 4, 6]]
+MASKS = np.array([1, 2, 3], dtype=np.uint64)
+SOURCES = bytes(range(32))
+
+
+@pytest.fixture
+def saved(tmp_path):
+    vectors = np.random.default_rng(0).random((len(NAMES), 4), dtype=np.float32)
+    np.save(tmp_path / "champs.npy", vectors)
+    metadata = Metadata(
+        NAMES, vectors, np.array([4, 1, 2], dtype=np.int32), TRAIT_NAMES, BREAKPOINTS, MASKS, SOURCES
+    )
+    file_name = tmp_path / "champs.meta.bin"
+    save_metadata(metadata, str(file_name))
+    return file_name, vectors
+
+
+def section(file_name, name):
+    """
+    Returns the (kind, item size, offset, item count) entry of a section and its position
+    """
+    position = HEADER.size + SECTION.size * [key for key, _ in SECTIONS].index(name)
+    return SECTION.unpack_from(file_name.read_bytes(), position), position
+
+
+def patch(file_name, offset, data, fix_crc=True):
+    """
+    Overwrites bytes of the file, updating the checksum so the later checks are reached
+    """
+    buffer = bytearray(file_name.read_bytes())
+    buffer[offset : offset + len(data)] = data
+    if fix_crc:
+        fields = list(HEADER.unpack_from(buffer))
+        fields[7] = zlib.crc32(bytes(buffer[HEADER.size :]))
+        HEADER.pack_into(buffer, 0, *fields)
+    file_name.write_bytes(bytes(buffer))
+
+
+def test_round_trip(saved):
+    file_name, vectors = saved
+    metadata = load_metadata(str(file_name))
+
+    assert metadata.names == NAMES
+    assert metadata.costs.tolist() == [4, 1, 2]
+    assert metadata.traits.names == TRAIT_NAMES
+    assert metadata.traits.breakpoints == BREAKPOINTS
+    assert metadata.traits.masks.tolist() == MASKS.tolist()
+    assert metadata.sources == SOURCES
+    assert np.array_equal(metadata.vectors, vectors)
+    assert not metadata.costs.flags.writeable
+    assert metadata.champion_data()["Kai'Sa"] == {"cost": 2}
+
+
+def test_round_trip_without_costs_or_traits(tmp_path):
+    vectors = np.ones((2, 3), dtype=np.float32)
+    np.save(tmp_path / "items.npy", vectors)
+    file_name = str(tmp_path / "items.meta.bin")
+    save_metadata(Metadata(["Blue Buff", "Sunfire Cape"], vectors), file_name)
+
+    metadata = load_metadata(file_name)
+    assert metadata.names == ["Blue Buff", "Sunfire Cape"]
+    assert metadata.costs is None
+    assert metadata.traits is None
+
+
+def test_bad_magic(saved):
+    file_name, _ = saved
+    patch(file_name, 0, b"NOTMETA\x00")
+    with pytest.raises(ValueError, match="not a metadata file"):
+        load_metadata(str(file_name))
+
+
+def test_bad_version(saved):
+    file_name, _ = saved
+    patch(file_name, 8, struct.pack("<H", METADATA_VERSION + 1))
+    with pytest.raises(ValueError, match=f"version {METADATA_VERSION + 1}"):
+        load_metadata(str(file_name))
+
+
+def test_truncated_file(saved):
+    file_name, _ = saved
+    file_name.write_bytes(file_name.read_bytes()[:-64])
+    with pytest.raises(ValueError, match="bytes, expected"):
+        load_metadata(str(file_name))
+
+
+def test_checksum_mismatch(saved):
+    file_name, _ = saved
+    (_, _, offset, _), _ = section(file_name, "strings")
+    patch(file_name, offset, b"B", fix_crc=False)
+    with pytest.raises(ValueError, match="checksum"):
+        load_metadata(str(file_name))
+
+
+@pytest.mark.parametrize("shift", [1 << 20, 1], ids=["out_of_bounds", "misaligned"])
+def test_bad_section_offset(saved, shift):
+    file_name, _ = saved
+    (_, _, offset, _), position = section(file_name, "costs")
+    # The offset follows the kind and item size in the entry
+    patch(file_name, position + 8, struct.pack("<Q", offset + shift))
+    with pytest.raises(ValueError, match="costs section out of bounds"):
+        load_metadata(str(file_name))
+
+
+@pytest.mark.parametrize(
+    "offsets_name, data_name",
+    [("string_offsets", "strings"), ("breakpoint_offsets", "breakpoints")],
+)
+def test_bad_offsets(saved, offsets_name, data_name):
+    file_name, _ = saved
+    (_, itemsize, offset, _), _ = section(file_name, offsets_name)
+    # The second offset points past the end of the data
+    patch(file_name, offset + itemsize, struct.pack("<I", 1000))
+    with pytest.raises(ValueError, match=f"invalid {data_name} offsets"):
+        load_metadata(str(file_name))
+
+
+def test_vectors_shape_mismatch(saved):
+    file_name, _ = saved
+    np.save(file_name.parent / "champs.npy", np.zeros((len(NAMES), 5), dtype=np.float32))
+    with pytest.raises(ValueError, match=r"has shape \(3, 5\).*expects \(3, 4\)"):
+        load_metadata(str(file_name))
@@ -0,0 +1,128 @@
+# test_name_resolver.py
+import random
+import pytest
+from builders.name_resolver import NameResolver, edit_similarity, normalize_name, split_names
+
+NAMES = ["Ahri", "Cho'Gath", "Kai'Sa", "Kog'Maw", "Lee Sin", "Jarvan IV", "Teemo", "Tahm Kench"]
+
+
+def osa_distance(a, b):
+    """
+    The optimal string alignment distance from the plain len(a) x len(b) table
+    """
+    table = [[i + j if i == 0 or j == 0 else 0 for j in range(len(b) + 1)] for i in range(len(a) + 1)]
+    for i in range(1, len(a) + 1):
+        for j in range(1, len(b) + 1):
+            table[i][j] = min(
+                table[i - 1][j] + 1,
+                table[i][j - 1] + 1,
+                table[i - 1][j - 1] + (a[i - 1] != b[j - 1]),
+            )
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                table[i][j] = min(table[i][j], table[i - 2][j - 2] + 1)
+    return table[-1][-1]
+
+
+def distance(a, b):
+    """
+    The distance edit_similarity scored, recovered from the similarity
+    """
+    return round((1 - edit_similarity(a, b)) * max(len(a), len(b), 1))
+
+
+def test_edit_distance_matches_the_table_on_random_strings():
+    rng = random.Random(0)
+    for _ in range(2000):
+        # A small alphabet makes repeats and swaps common; lengths pass the 64 bit word
+        a = "".join(rng.choices("abcd", k=rng.randint(0, 80)))
+        b = "".join(rng.choices("abcd", k=rng.randint(0, 80)))
+        assert distance(a, b) == osa_distance(a, b), (a, b)
+
+
+@pytest.mark.parametrize(
+    "a, b",
+    [
+        ("ahri", "ahir"),
+        ("ahri", "hari"),
+        ("kaisa", "kiasa"),
+        ("abcd", "badc"),
+        # Not 2 as with unrestricted transpositions, OSA never edits a swapped pair again
+        ("ca", "abc"),
+        ("teemo", "temeo"),
+        ("abab", "baba"),
+    ],
+)
+def test_edit_distance_matches_the_table_on_transpositions(a, b):
+    assert distance(a, b) == osa_distance(a, b)
+    assert distance(b, a) == osa_distance(b, a)
+
+
+def test_one_swap_is_one_edit():
+    assert edit_similarity("ahri", "ahir") == 0.75
+    assert edit_similarity("ahri", "ahri") == 1.0
+    assert edit_similarity("", "ahri") == 0.0
+
+
+def test_normalize_name_drops_case_accents_and_punctuation():
+    assert normalize_name("Kai'Sa") == normalize_name("kaisa") == normalize_name("KAI SA") == "kaisa"
+    assert normalize_name("Chö'Gath") == "chogath"
+    assert normalize_name("K/DA Akali") == "kdaakali"
+
+
+@pytest.mark.parametrize(
+    "token, name",
+    [
+        ("ahri", "Ahri"),
+        ("AHRI", "Ahri"),
+        ("chogath", "Cho'Gath"),
+        ("Cho Gath", "Cho'Gath"),
+        ("kai'sa", "Kai'Sa"),
+        ("KaiSa", "Kai'Sa"),
+        ("lee sin", "Lee Sin"),
+        ("jarvan", "Jarvan IV"),
+    ],
+)
+def test_exact_ignores_case_and_apostrophes(token, name):
+    assert NameResolver(NAMES).exact(token) == name
+
+
+def test_exact_never_matches_fuzzily():
+    resolver = NameResolver(NAMES)
+    assert resolver.exact("ahir") is None
+    assert resolver.exact("") is None
+
+
+def test_aliases_resolve_to_known_names_only():
+    resolver = NameResolver(NAMES, {"cho": "Cho'Gath", "gone": "Nobody"})
+    assert resolver.exact("Cho") == "Cho'Gath"
+    assert resolver.exact("gone") is None
+
+
+@pytest.mark.parametrize(
+    "token, name",
+    [("ahir", "Ahri"), ("teemoo", "Teemo"), ("chogat", "Cho'Gath"), ("kaisaa", "Kai'Sa")],
+)
+def test_typos_resolve_to_the_closest_name(token, name):
+    resolver = NameResolver(NAMES)
+    assert resolver.best(token) == name
+    assert resolver.suggest(token)[0][0] == name
+
+
+def test_unrelated_text_does_not_resolve():
+    assert NameResolver(NAMES).best("zzzz") is None
+
+
+def test_parse_splits_and_reports_unresolved_tokens():
+    resolver = NameResolver(NAMES)
+    matches, unresolved = resolver.parse("ahri teemoo, lee sin; qqqq")
+    assert [name for _, name, _ in matches] == ["Ahri", "Teemo", "Lee Sin"]
+    assert [token for token, _ in unresolved] == ["qqqq"]
+
+
+def test_resolve_all_keeps_unresolved_words():
+    resolver = NameResolver(NAMES)
+    assert resolver.resolve_all(["kai'sa", "Ahri Teemo", "qqqq"]) == ["Kai'Sa", "Ahri", "Teemo", "qqqq"]
+
+
+def test_split_names_keeps_slashes():
+    assert split_names("Ahri,teemo ; K/DA Akali and Lee Sin") == ["Ahri", "teemo", "K/DA Akali", "Lee Sin"]